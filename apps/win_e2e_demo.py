@@ -3,6 +3,7 @@ import argparse
 
 from monibox_kb.config import settings
 from monibox_kb.audio.recorder import record
+from monibox_kb.audio.stream_capture import record_utterance
 from monibox_kb.asr.faster_whisper_asr import FasterWhisperASR, WhisperASRConfig
 from monibox_kb.runtime.session import MoniSession, SessionConfig
 
@@ -14,6 +15,7 @@ def main():
     ap.add_argument("--events", default="", help="逗号分隔，如 imu_strong_shake")
     ap.add_argument("--auto_top_tags", type=int, default=2)
     ap.add_argument("--no_tts", action="store_true", help="只在控制台输出，不播放语音")
+    ap.add_argument("--extractive", action="store_true", help="不加载 LLM，直接用检索要点抽取式回复（省电）")
     args = ap.parse_args()
 
     events = [e.strip() for e in args.events.split(",") if e.strip()]
@@ -29,8 +31,9 @@ def main():
 
     # --- Session: Protocol + RAG + LLM(stream) + Safety + TTS ---
     llm_path = os.getenv("LLM_GGUF_PATH", "")
-    if not llm_path:
-        raise RuntimeError("请在 .env 中设置 LLM_GGUF_PATH")
+    extractive = args.extractive or os.getenv("ANSWER_MODE", "llm").strip().lower() == "extractive"
+    if not llm_path and not extractive:
+        raise RuntimeError("请在 .env 中设置 LLM_GGUF_PATH（或用 --extractive 不加载 LLM）")
 
     sess_cfg = SessionConfig(
         llm_path=llm_path,
@@ -38,6 +41,7 @@ def main():
         llm_threads=int(os.getenv("LLM_THREADS", "6")),
         llm_gpu_layers=int(os.getenv("LLM_GPU_LAYERS", "0")),
         tts_enabled=(not args.no_tts),
+        extractive=extractive,
     )
     session = MoniSession(settings.rag_db_path, sess_cfg)
 
@@ -49,22 +53,38 @@ def main():
         session.handle(user_text, events=events, auto_top_tags=args.auto_top_tags)
         return
 
-    # mic mode
+    # mic mode：事件不等录音/ASR，先走快速通道；events 仍随识别文本交给 handle_asr（事件 + 文本 / 标签的协议）
+    pre = session.fire_event(events) if events else None
+
     sec = float(os.getenv("REC_SECONDS", "4"))
     sr = int(os.getenv("REC_SAMPLE_RATE", "16000"))
 
-    print(f"按回车开始录音 {sec}s ...")
-    input()
-    audio = record(seconds=sec, sample_rate=sr)
+    if os.getenv("REC_MODE", "vad") == "fixed":
+        print(f"按回车开始录音 {sec}s ...")
+        input()
+        audio = record(seconds=sec, sample_rate=sr)
+    else:
+        # VAD 断句：说完（停顿 REC_END_SILENCE_MS）立即结束，最长 REC_MAX_SECONDS
+        print("按回车后开始说话（说完自动结束）...")
+        input()
+        utt = record_utterance(
+            sample_rate=sr,
+            max_seconds=float(os.getenv("REC_MAX_SECONDS", "15")),
+            wait_seconds=float(os.getenv("REC_WAIT_SECONDS", "10")),
+            vad_mode=os.getenv("VAD_MODE", "energy"),
+            end_silence_ms=int(os.getenv("REC_END_SILENCE_MS", "500")),
+        )
+        if utt is None:
+            print("没有检测到说话")
+            return
+        print(f"[REC] {utt.seconds:.1f}s")
+        audio = utt.audio
     print("识别中...")
-    user_text = asr.transcribe(audio)
-    print("[ASR]", user_text)
-
-    if not user_text:
+    # 流式识别：每解出一段先跑协议匹配（关键词在句首时提前下发），整段文本再走路由 / RAG
+    # 录音前已下发的事件协议作为 fired 传入：整段文本再命中同一协议时不重复下发
+    segments = asr.transcribe_stream(audio, probe_s=float(os.getenv("ASR_PROBE_S", "0")))
+    if not session.handle_asr(segments, events=events, auto_top_tags=args.auto_top_tags, fired=pre):
         print("未识别到内容")
-        return
-
-    session.handle(user_text, events=events, auto_top_tags=args.auto_top_tags)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,22 @@
+"""
+monibox_kb/asr/faster_whisper_asr.py
+
+faster-whisper 本地识别：
+- transcribe(audio)：整段识别，返回拼好的文本
+- transcribe_stream(audio, probe_s)：边解码边 yield AsrSegment，会话可以对每段（部分结果）先跑协议匹配，
+  “余震”这类关键词喊在句首时不必等整段识别完
+  probe_s > 0：先用贪心解码快速识别开头 probe_s 秒，作为临时假设（partial=True，不计入最终文本）。
+  探测与整段识别串行，完整文本会晚到一次短解码的时间，所以默认关闭（ASR_PROBE_S=0）；
+  音频不到 probe_s 的 1.5 倍时跳过探测（整段识别本身就够快）
+基准：python -m scripts.bench_asr_early <wav...>
+"""
+
 from __future__ import annotations
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterator
 from pathlib import Path
 
-from faster_whisper import WhisperModel
-
 
 @dataclass
 class WhisperASRConfig:
@@ -14,15 +26,52 @@ class WhisperASRConfig:
     language: str = "zh"
 
 
+@dataclass
+class AsrSegment:
+    text: str
+    start: float                        # 秒（音频内时间）
+    end: float
+    partial: bool = False               # 开头探测的临时假设（不计入最终文本）
+    elapsed_ms: float = 0.0             # 从开始识别到得到本段的耗时
+
+
 class FasterWhisperASR:
+    SAMPLE_RATE = 16000
+
     def __init__(self, cfg: WhisperASRConfig):
         p = Path(cfg.model_dir).resolve()
         if not p.exists():
             raise FileNotFoundError(f"找不到 whisper 模型目录：{p}")
         self.cfg = cfg
+        # faster_whisper（连带 ctranslate2）在加载模型时才导入：只用 AsrSegment 等类型时不付它的开销
+        from faster_whisper import WhisperModel
         # 关键：传入本地目录
         self.model = WhisperModel(str(p), device=cfg.device, compute_type=cfg.compute_type)
 
     def transcribe(self, audio) -> str:
+        return "".join(seg.text for seg in self.transcribe_stream(audio) if not seg.partial).strip()
+
+    def transcribe_stream(self, audio, probe_s: float = 0.0) -> Iterator[AsrSegment]:
+        """
+        faster-whisper 的 segments 是惰性生成器：每解出一段就 yield 一段，不等整段结束。
+        """
+        t0 = time.perf_counter()
+        n_probe = int(probe_s * self.SAMPLE_RATE)
+        if n_probe > 0 and len(audio) > n_probe * 1.5:
+            segs, _ = self.model.transcribe(
+                audio[:n_probe],
+                language=self.cfg.language,
+                beam_size=1,
+                vad_filter=False,
+                without_timestamps=True,
+                condition_on_previous_text=False,
+            )
+            text = "".join(s.text for s in segs).strip()
+            if text:
+                yield AsrSegment(text=text, start=0.0, end=probe_s, partial=True,
+                                 elapsed_ms=(time.perf_counter() - t0) * 1000.0)
+
         segments, info = self.model.transcribe(audio, language=self.cfg.language, vad_filter=True)
-        return "".join([seg.text for seg in segments]).strip()
\ No newline at end of file
+        for seg in segments:
+            yield AsrSegment(text=seg.text, start=float(seg.start), end=float(seg.end),
+                             elapsed_ms=(time.perf_counter() - t0) * 1000.0)
@@ -0,0 +1,366 @@
+"""
+monibox_kb/audio/stream_capture.py
+
+用途
+-----
+流式录音 + VAD 断句：替代 recorder.record 的固定时长录音（短句白等几秒、长句被截断）。
+
+  音频源（麦克风回调 / 数组 / wav 文件）-> 预分配的环形缓冲 -> 逐帧 VAD -> 说完即交出一段 Utterance
+
+- RingBuffer：预分配 float32 数组，采用“镜像”布局（容量 cap 的数据写两份），
+  任意不超过 cap 的窗口都是连续内存，view() 直接返回切片，交给 ASR 不拷贝
+- EnergyVAD：帧能量（RMS）+ 自适应底噪；WebRtcVAD：webrtcvad 模型（可选依赖）
+- StreamCapture.next_utterance()：语音开始（连续 start_ms 判为语音）-> 静音 end_silence_ms 即结束；
+  带 pre_roll（开头前一小段，避免吞字）与 tail；超过 max_utterance_s 强制结束
+- 音频源：MicSource（sounddevice.InputStream 回调）、ArraySource / WavSource（无麦克风测试用，可按实时速度推送）
+
+说明
+----
+- Utterance.audio 是环形缓冲的视图：缓冲再写满一圈（ring_seconds）之前有效；需要长期保存时调用方自己 copy()
+- 回调里只做一次 numpy 写入和计数，VAD 在 next_utterance 的调用线程里跑
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Union
+
+import numpy as np
+
+
+BlockCallback = Callable[[np.ndarray], None]
+
+
+# -----------------------------
+# 环形缓冲
+# -----------------------------
+class RingBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(2 * self.capacity, dtype=np.float32)
+        self.total = 0          # 累计写入的样本数（绝对位置）
+
+    def write(self, x: np.ndarray):
+        x = np.asarray(x, dtype=np.float32).reshape(-1)
+        cap = self.capacity
+        if len(x) > cap:        # 一次写入超过容量：只保留最后 cap 个
+            self.total += len(x) - cap
+            x = x[-cap:]
+        pos = self.total % cap
+        first = min(len(x), cap - pos)
+        self._buf[pos:pos + first] = x[:first]
+        self._buf[pos + cap:pos + cap + first] = x[:first]
+        rest = len(x) - first
+        if rest:
+            self._buf[:rest] = x[first:]
+            self._buf[cap:cap + rest] = x[first:]
+        self.total += len(x)
+
+    def oldest(self) -> int:
+        return max(0, self.total - self.capacity)
+
+    def view(self, start: int, end: int) -> np.ndarray:
+        """绝对位置 [start, end) 的连续视图（不拷贝）；要求仍在缓冲内。"""
+        if start < self.oldest() or end > self.total or end - start > self.capacity:
+            raise IndexError(f"窗口 [{start}, {end}) 已不在环形缓冲内（oldest={self.oldest()} total={self.total}）")
+        s = start % self.capacity
+        return self._buf[s:s + (end - start)]
+
+
+# -----------------------------
+# VAD
+# -----------------------------
+class EnergyVAD:
+    """
+    帧能量 VAD：rms > max(threshold, 底噪 * noise_ratio) 判为语音。
+    底噪在非语音帧上做指数滑动平均，环境噪声（风扇、粉尘环境的呼吸声）变化时自动跟随。
+    """
+
+    def __init__(self, threshold: float = 0.01, noise_ratio: float = 3.0, noise_alpha: float = 0.05):
+        self.threshold = threshold
+        self.noise_ratio = noise_ratio
+        self.noise_alpha = noise_alpha
+        self.noise = threshold / noise_ratio
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(np.square(frame, dtype=np.float32)))) if len(frame) else 0.0
+        speech = rms > max(self.threshold, self.noise * self.noise_ratio)
+        if not speech:
+            self.noise += self.noise_alpha * (rms - self.noise)
+        return speech
+
+
+class WebRtcVAD:
+    """webrtcvad 模型 VAD（pip install webrtcvad）；帧长须为 10/20/30ms。"""
+
+    def __init__(self, sample_rate: int = 16000, aggressiveness: int = 2):
+        import webrtcvad
+
+        self.sample_rate = sample_rate
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        return self.vad.is_speech(pcm, self.sample_rate)
+
+
+# -----------------------------
+# 音频源
+# -----------------------------
+class MicSource:
+    """麦克风：sounddevice.InputStream 回调，每个 block 直接交给 StreamCapture。"""
+
+    def __init__(self, sample_rate: int = 16000, block_ms: int = 20, device=None):
+        self.sample_rate = sample_rate
+        self.block = int(sample_rate * block_ms / 1000)
+        self.device = device
+        self.overflows = 0
+        self._stream = None
+
+    def start(self, on_block: BlockCallback, on_end: Callable[[], None]):
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            if status and status.input_overflow:
+                self.overflows += 1
+            on_block(indata[:, 0])
+
+        self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype="float32",
+                                      blocksize=self.block, device=self.device, callback=callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class ArraySource:
+    """
+    数组音频源：按 block 推送，speed=1 按实时速度（模拟麦克风），speed=0 尽快推完。
+    推完后调用 on_end（StreamCapture 据此结束最后一段）。
+    """
+
+    def __init__(self, audio: np.ndarray, sample_rate: int = 16000, block_ms: int = 20, speed: float = 1.0):
+        self.audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        self.sample_rate = sample_rate
+        self.block = int(sample_rate * block_ms / 1000)
+        self.speed = speed
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, on_block: BlockCallback, on_end: Callable[[], None]):
+        def run():
+            t0 = time.perf_counter()
+            for i in range(0, len(self.audio), self.block):
+                if self._stop.is_set():
+                    break
+                on_block(self.audio[i:i + self.block])
+                if self.speed > 0:
+                    due = t0 + (i + self.block) / self.sample_rate / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+            on_end()
+
+        self._thread = threading.Thread(target=run, name="array-source", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+
+def load_wav(path: Union[str, BinaryIO], sample_rate: int = 16000) -> np.ndarray:
+    """读取 16-bit PCM wav（路径或文件对象）为 float32 单声道；采样率不同时线性插值重采样。"""
+    with wave.open(path if hasattr(path, "read") else str(Path(path)), "rb") as w:
+        sr = w.getframerate()
+        ch = w.getnchannels()
+        if w.getsampwidth() != 2:
+            raise ValueError(f"只支持 16-bit PCM wav：{path}")
+        data = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2").astype(np.float32) / 32768.0
+    if ch > 1:
+        data = data.reshape(-1, ch).mean(axis=1)
+    if sr != sample_rate and len(data):
+        n = int(round(len(data) * sample_rate / sr))
+        data = np.interp(np.linspace(0, len(data) - 1, n), np.arange(len(data)), data).astype(np.float32)
+    return data
+
+
+class WavSource(ArraySource):
+    def __init__(self, path: str, sample_rate: int = 16000, block_ms: int = 20, speed: float = 1.0):
+        super().__init__(load_wav(path, sample_rate), sample_rate=sample_rate, block_ms=block_ms, speed=speed)
+
+
+# -----------------------------
+# 断句
+# -----------------------------
+@dataclass
+class Utterance:
+    audio: np.ndarray           # 环形缓冲视图（float32，不拷贝）
+    start: int                  # 绝对样本位置
+    end: int
+    sample_rate: int
+    speech_end_at: float        # 检测到语音结束（交出本段）的时刻，perf_counter
+    truncated: bool = False     # 达到 max_utterance_s 被强制结束
+
+    @property
+    def seconds(self) -> float:
+        return (self.end - self.start) / float(self.sample_rate)
+
+
+class StreamCapture:
+    def __init__(self,
+                 source,
+                 vad=None,
+                 sample_rate: int = 16000,
+                 frame_ms: int = 30,
+                 start_ms: int = 90,
+                 end_silence_ms: int = 500,
+                 pre_roll_ms: int = 300,
+                 tail_ms: int = 100,
+                 min_speech_ms: int = 200,
+                 max_utterance_s: float = 15.0,
+                 ring_seconds: float = 30.0):
+        self.source = source
+        self.vad = vad or EnergyVAD()
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.pre_roll = int(sample_rate * pre_roll_ms / 1000)
+        self.tail = int(sample_rate * tail_ms / 1000)
+        self.max_len = int(sample_rate * max_utterance_s)
+        self.ring = RingBuffer(int(sample_rate * max(ring_seconds, max_utterance_s * 2)))
+        self.dropped = 0        # 消费太慢、被覆盖而跳过的样本数
+
+        self._cv = threading.Condition()
+        self._ended = False
+        self._running = False
+        self._reset_state(0)
+
+    def _reset_state(self, pos: int):
+        self._pos = pos                 # 下一个待 VAD 的帧起点（绝对位置）
+        self._in_speech = False
+        self._run = 0                   # 连续语音帧数（未进入语音时）
+        self._silence = 0               # 连续静音帧数（语音中）
+        self._speech_frames = 0
+        self._seg_start = 0
+        self._last_voice_end = 0
+
+    # -----------------------------
+    # 音频源回调
+    # -----------------------------
+    def _on_block(self, block: np.ndarray):
+        with self._cv:
+            self.ring.write(block)
+            self._cv.notify_all()
+
+    def _on_end(self):
+        with self._cv:
+            self._ended = True
+            self._cv.notify_all()
+
+    def start(self):
+        self._ended = False
+        self._running = True
+        self.source.start(self._on_block, self._on_end)
+
+    def stop(self):
+        self._running = False
+        self.source.stop()
+        self._on_end()
+
+    # -----------------------------
+    # 断句
+    # -----------------------------
+    def _emit(self, end: int, truncated: bool = False) -> Optional[Utterance]:
+        start = max(self._seg_start, self.ring.oldest())
+        end = min(end, self.ring.total)
+        enough = self._speech_frames >= self.min_speech_frames
+        self._reset_state(self._pos)
+        if not enough or end <= start:
+            return None
+        return Utterance(audio=self.ring.view(start, end), start=start, end=end, sample_rate=self.sample_rate,
+                         speech_end_at=time.perf_counter(), truncated=truncated)
+
+    def _step(self, frame: np.ndarray, f_start: int) -> Optional[Utterance]:
+        f_end = f_start + self.frame
+        speech = self.vad.is_speech(frame)
+        if not self._in_speech:
+            self._run = self._run + 1 if speech else 0
+            if self._run >= self.start_frames:
+                self._in_speech = True
+                first = f_end - self._run * self.frame
+                self._seg_start = max(0, first - self.pre_roll)
+                self._speech_frames = self._run
+                self._last_voice_end = f_end
+                self._silence = 0
+            return None
+
+        if speech:
+            self._speech_frames += 1
+            self._silence = 0
+            self._last_voice_end = f_end
+        else:
+            self._silence += 1
+        if self._silence >= self.end_frames:
+            return self._emit(self._last_voice_end + self.tail)
+        if f_end - self._seg_start >= self.max_len:
+            return self._emit(f_end, truncated=True)
+        return None
+
+    def next_utterance(self, timeout: Optional[float] = None) -> Optional[Utterance]:
+        """
+        阻塞到下一段话说完（或音频源结束 / 超时）返回；没有话语时返回 None。
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cv:
+            while True:
+                # 消费太慢：未处理的部分已被覆盖，跳到缓冲里最老的位置
+                oldest = self.ring.oldest()
+                if self._pos < oldest:
+                    self.dropped += oldest - self._pos
+                    self._reset_state(oldest)
+                while self._pos + self.frame <= self.ring.total:
+                    f_start = self._pos
+                    frame = self.ring.view(f_start, f_start + self.frame)
+                    self._pos += self.frame
+                    utt = self._step(frame, f_start)
+                    if utt is not None:
+                        return utt
+                if self._ended:
+                    return self._emit(self.ring.total) if self._in_speech else None
+                left = None if deadline is None else deadline - time.perf_counter()
+                if left is not None and left <= 0:
+                    return None
+                self._cv.wait(left)
+
+
+def make_vad(mode: str = "energy", sample_rate: int = 16000):
+    """VAD_MODE：energy（默认，无依赖）/ webrtc（需要 webrtcvad）。"""
+    if (mode or "energy").strip().lower() == "webrtc":
+        return WebRtcVAD(sample_rate)
+    return EnergyVAD()
+
+
+def record_utterance(sample_rate: int = 16000,
+                     max_seconds: float = 15.0,
+                     wait_seconds: Optional[float] = None,
+                     vad_mode: str = "energy",
+                     end_silence_ms: int = 500) -> Optional[Utterance]:
+    """从麦克风录一句话：开口后开始，停顿 end_silence_ms 即结束（替代 recorder.record 的定长录音）。"""
+    cap = StreamCapture(MicSource(sample_rate), vad=make_vad(vad_mode, sample_rate), sample_rate=sample_rate,
+                        end_silence_ms=end_silence_ms, max_utterance_s=max_seconds)
+    cap.start()
+    try:
+        return cap.next_utterance(timeout=wait_seconds)
+    finally:
+        cap.stop()
@@ -0,0 +1,254 @@
+"""
+monibox_kb/compile_pack.py
+
+用途
+-----
+把端侧启动需要的“路由/标签体系”编译成一个二进制产物（build/router_pack.bin），
+设备上一次读取即可还原，不再依赖 knowledge_src/generated 下的生成中间产物。
+
+产物内容
+--------
+- registry    : TagRegistry 的 allowed_ids / name_to_id / alias_map（alias 解析表）
+- tags        : [{tag_id, dimension, recall[]}]（标准化后的标签记录，保持 taxonomy 原顺序）
+- tag_dims    : tag_id -> 所属维度
+- matcher     : 召回词 + overrides patterns 编译出的 TermMatcher（一次扫描得到全部命中词）
+- term_index  : 召回词 -> [(tag序号, 召回词序号), ...]（用于还原与逐词匹配完全一致的打分/证据顺序）
+- overrides   : 已 canonicalize 的 overrides 规则（boost/force 只保留 taxonomy 中存在的标签）
+- sources     : 源文件相对路径 -> mtime（PC 上源文件更新后自动判定产物过期）
+- centroids   : （可选）标签质心向量 {tag_ids, dim, data(float32 bytes)}，
+                由“标签名 + 召回词”描述文本与该标签下 chunks 的向量求得，
+                供召回词全部未命中时按 query 向量做余弦兜底路由
+
+格式：pickle（只含 dict/list/str/float 与 TermMatcher），文件头带 format/version 校验。
+"""
+
+from __future__ import annotations
+
+import json
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from monibox_kb.paths import GENERATED_DIR, KNOWLEDGE_SRC, PROJECT_ROOT
+from monibox_kb.tags.registry import TagRegistry
+from monibox_kb.text_match import TermMatcher
+
+
+ROUTER_PACK_FORMAT = "monibox-router-pack"
+ROUTER_PACK_VERSION = 1
+
+
+def _rel(p: Path) -> str:
+    try:
+        return str(Path(p).resolve().relative_to(PROJECT_ROOT))
+    except ValueError:
+        return str(Path(p).resolve())
+
+
+def _source_mtimes(paths: List[Path]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for p in paths:
+        if p.exists():
+            out[_rel(p)] = p.stat().st_mtime
+    return out
+
+
+def _load_tag_records(normalized_path: Path) -> List[Dict[str, Any]]:
+    if not normalized_path.exists():
+        raise FileNotFoundError(f"缺少 {normalized_path}，请先生成并 normalize taxonomy")
+
+    obj = json.loads(normalized_path.read_text(encoding="utf-8"))
+    items = obj.get("标签体系", [])
+    if not isinstance(items, list):
+        raise ValueError("normalized taxonomy 结构不对：标签体系不是数组")
+
+    recs = []
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        tid = str(it.get("标签ID", "")).strip()
+        dim = str(it.get("所属维度", "")).strip()
+        recall = it.get("建议召回词", [])
+        if not tid or not dim:
+            continue
+        if not isinstance(recall, list):
+            recall = []
+        recall = [str(x).strip() for x in recall if str(x).strip()]
+        recs.append({
+            "tag_id": tid,
+            "dimension": dim,
+            "name": str(it.get("名称", "") or "").strip(),
+            "recall": recall,
+        })
+    return recs
+
+
+def _load_override_rules(overrides_path: Path) -> List[Dict[str, Any]]:
+    if not overrides_path.exists():
+        return []
+    obj = json.loads(overrides_path.read_text(encoding="utf-8"))
+    rules = obj.get("rules", [])
+    return rules if isinstance(rules, list) else []
+
+
+def _compile_overrides(rules: List[Dict[str, Any]],
+                       reg: TagRegistry,
+                       tag_dims: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    预先 canonicalize overrides：
+    运行期只剩“patterns 是否命中 -> 给哪些标签加多少分”，不再逐条走 TagRegistry。
+    单条规则解析出错时，与原逻辑一致：丢弃该规则剩余部分。
+    """
+    out = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            continue
+        patterns = rule.get("patterns", [])
+        if not isinstance(patterns, list):
+            continue
+
+        compiled = {
+            "name": str(rule.get("name", "")),
+            "patterns": [p for p in patterns if isinstance(p, str) and p],
+            "boost": [],   # [(tag_id, weight)]
+            "force": [],   # [tag_id]
+        }
+        try:
+            boost = rule.get("boost_tags", {})
+            if isinstance(boost, dict):
+                for raw_tid, w in boost.items():
+                    canon = reg.canonicalize(str(raw_tid))
+                    if not canon or canon not in tag_dims:
+                        continue
+                    compiled["boost"].append((canon, float(w)))
+
+            force = rule.get("force_tags", [])
+            if isinstance(force, list):
+                for raw_tid in force:
+                    canon = reg.canonicalize(str(raw_tid))
+                    if not canon or canon not in tag_dims:
+                        continue
+                    compiled["force"].append(canon)
+        except Exception:
+            pass
+
+        out.append(compiled)
+    return out
+
+
+def compile_router_pack(meta_path: Optional[Path] = None,
+                        normalized_path: Optional[Path] = None,
+                        alias_path: Optional[Path] = None,
+                        overrides_path: Optional[Path] = None) -> Dict[str, Any]:
+    """从 knowledge_src 源文件编译路由产物（PC 构建期调用；开发期 AutoRouter 也可在内存中编译）。"""
+    meta_path = meta_path or (KNOWLEDGE_SRC / "00_meta.json")
+    normalized_path = normalized_path or (GENERATED_DIR / "02_meta_candidates.normalized.json")
+    alias_path = alias_path or (KNOWLEDGE_SRC / "tag_alias.json")
+    overrides_path = overrides_path or (KNOWLEDGE_SRC / "router_overrides.json")
+
+    reg = TagRegistry.load(meta_path=meta_path, normalized_path=normalized_path, alias_path=alias_path)
+    recs = _load_tag_records(normalized_path)
+
+    tag_dims: Dict[str, str] = {}
+    term_index: Dict[str, List[Tuple[int, int]]] = {}
+    for ti, rec in enumerate(recs):
+        tag_dims[rec["tag_id"]] = rec["dimension"]
+        for pi, term in enumerate(rec["recall"]):
+            term_index.setdefault(term, []).append((ti, pi))
+
+    overrides = _compile_overrides(_load_override_rules(overrides_path), reg, tag_dims)
+
+    all_terms = list(term_index.keys())
+    for rule in overrides:
+        all_terms.extend(rule["patterns"])
+
+    return {
+        "format": ROUTER_PACK_FORMAT,
+        "version": ROUTER_PACK_VERSION,
+        "sources": _source_mtimes([meta_path, normalized_path, alias_path, overrides_path]),
+        "registry": reg.to_dict(),
+        "tags": recs,
+        "tag_dims": tag_dims,
+        "matcher": TermMatcher(all_terms),
+        "term_index": term_index,
+        "overrides": overrides,
+    }
+
+
+def compute_tag_centroids(tags: List[Dict[str, Any]],
+                          chunks: List[Dict[str, Any]],
+                          chunk_vectors: List[List[float]],
+                          embed_fn: Callable[[List[str]], List[List[float]]]) -> Dict[str, Any]:
+    """
+    计算标签质心（构建期）：
+    - 描述向量：embed("名称：召回词1、召回词2...")
+    - 成员向量：带该标签的 chunks 的向量均值（复用 build_pack 已算好的 chunk 向量）
+    - 质心 = normalize(0.5 * 描述向量 + 0.5 * 成员均值)；没有成员时只用描述向量
+
+    返回 {"tag_ids": [...], "dim": d, "data": float32 bytes(row-major)}。
+    """
+    import numpy as np
+
+    if not tags:
+        return {"tag_ids": [], "dim": 0, "data": b""}
+
+    descs = []
+    for rec in tags:
+        name = rec.get("name") or rec["tag_id"]
+        recall = "、".join(rec.get("recall") or [])
+        descs.append(f"{name}：{recall}" if recall else name)
+    desc_vecs = np.asarray(embed_fn(descs), dtype=np.float32)
+
+    vecs = np.asarray(chunk_vectors, dtype=np.float32)
+    members: Dict[str, List[int]] = {}
+    for i, c in enumerate(chunks):
+        for t in c.get("标签") or []:
+            members.setdefault(str(t), []).append(i)
+
+    out = np.zeros_like(desc_vecs)
+    for ti, rec in enumerate(tags):
+        v = desc_vecs[ti]
+        idx = members.get(rec["tag_id"])
+        if idx and len(vecs):
+            v = 0.5 * v + 0.5 * vecs[idx].mean(axis=0)
+        n = float(np.linalg.norm(v))
+        out[ti] = v / n if n > 0 else v
+
+    return {
+        "tag_ids": [rec["tag_id"] for rec in tags],
+        "dim": int(out.shape[1]),
+        "data": out.astype("<f4").tobytes(),
+    }
+
+
+def save_router_pack(pack: Dict[str, Any], path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(pickle.dumps(pack, protocol=pickle.HIGHEST_PROTOCOL))
+    tmp.replace(path)
+
+
+def load_router_pack(path: Path) -> Dict[str, Any]:
+    """一次读取 + 反序列化；格式或版本不对直接报错（请重新运行 build_pack）。"""
+    pack = pickle.loads(Path(path).read_bytes())
+    if not isinstance(pack, dict) or pack.get("format") != ROUTER_PACK_FORMAT:
+        raise ValueError(f"不是有效的路由产物：{path}")
+    if pack.get("version") != ROUTER_PACK_VERSION:
+        raise ValueError(f"路由产物版本不匹配：{pack.get('version')} != {ROUTER_PACK_VERSION}，请重新运行 build_pack")
+    return pack
+
+
+def router_pack_is_fresh(pack: Dict[str, Any]) -> bool:
+    """
+    产物是否仍然有效：
+    - 设备上源文件不存在 -> 视为有效（只靠产物运行）
+    - PC 上源文件存在且比产物记录的更新 -> 过期（改了 taxonomy/overrides 还没重新 build）
+    """
+    for rel, mtime in (pack.get("sources") or {}).items():
+        p = Path(rel)
+        if not p.is_absolute():
+            p = PROJECT_ROOT / p
+        if p.exists() and p.stat().st_mtime > float(mtime):
+            return False
+    return True
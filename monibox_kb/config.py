@@ -3,16 +3,57 @@ config.py
 统一读取 .env 配置，并把关键路径（rag.db / runtime_pack）解析成“项目根目录下的绝对路径”。
 
 这样就不会受到 PyCharm 当前工作目录（cwd）影响。
+
+.env 用内置的 load_env_file 读取（不导入 python-dotenv）：几乎每个脚本都经由本模块启动，
+dotenv 的导入开销比读一个几十行的 .env 还大。只支持本项目 .env 用到的写法：
+KEY=VALUE、# 注释、export 前缀、单/双引号、未加引号值后的 " #" 行尾注释；不做 ${VAR} 展开。
+已存在的环境变量不覆盖（与 load_dotenv 默认一致）。
 """
 from dataclasses import dataclass
 from pathlib import Path
 import os
-from dotenv import load_dotenv
 
 from monibox_kb.paths import PROJECT_ROOT
 
+
+def _parse_env_value(v: str) -> str:
+    v = v.strip()
+    if v[:1] in ("'", '"'):
+        # 引号值：取到配对的引号为止，之后的（行尾注释）忽略
+        end = v.find(v[0], 1)
+        if end > 0:
+            inner = v[1:end]
+            return inner.replace("\\n", "\n") if v[0] == '"' else inner
+    # 未加引号：" #" 之后是行尾注释
+    i = v.find(" #")
+    return (v[:i] if i >= 0 else v).strip()
+
+
+def load_env_file(path: Path, override: bool = False) -> int:
+    """读取 .env 写入 os.environ；返回写入的变量数。文件不存在时什么都不做。"""
+    try:
+        lines = Path(path).read_text(encoding="utf-8-sig").splitlines()
+    except OSError:
+        return 0
+    n = 0
+    for line in lines:
+        s = line.strip()
+        if not s or s.startswith("#"):
+            continue
+        if s.startswith("export "):
+            s = s[len("export "):].lstrip()
+        key, sep, value = s.partition("=")
+        key = key.strip()
+        if not sep or not key:
+            continue
+        if override or key not in os.environ:
+            os.environ[key] = _parse_env_value(value)
+            n += 1
+    return n
+
+
 # 显式从项目根目录加载 .env
-load_dotenv(PROJECT_ROOT / ".env")
+load_env_file(PROJECT_ROOT / ".env")
 
 
 def resolve_project_path(p: str) -> str:
@@ -48,6 +89,7 @@ class Settings:
     # Build output（关键：解析为绝对路径）
     rag_db_path: str = resolve_project_path(os.getenv("RAG_DB_PATH", "build/rag.db"))
     runtime_pack_path: str = resolve_project_path(os.getenv("RUNTIME_PACK_PATH", "build/runtime_pack.json"))
+    router_pack_path: str = resolve_project_path(os.getenv("ROUTER_PACK_PATH", "build/router_pack.bin"))
 
 
 settings = Settings()
\ No newline at end of file
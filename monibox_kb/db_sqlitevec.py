@@ -4,6 +4,7 @@ db_sqlitevec.py（写入 display_id / group_id 版）
 - 启用 sqlite-vec 扩展加载
 - 写 chunks 元数据（包含 display_id/group_id）
 - 写 vec_chunks 向量（float32 BLOB）
+- 可选写每个 chunk 上下文行的 token 数（n_tokens）与构建元数据（pack_meta）
 """
 
 import sqlite3
@@ -50,13 +51,17 @@ class RagDB:
         with self.connect() as conn:
             conn.executescript(sql)
 
-    def insert_chunks(self, records: List[Dict[str, Any]], vectors: List[List[float]]):
+    def insert_chunks(self, records: List[Dict[str, Any]], vectors: List[List[float]],
+                      n_tokens: Optional[List[int]] = None):
         assert len(records) == len(vectors), "records 与 vectors 数量必须一致"
+        if n_tokens is None:
+            n_tokens = [0] * len(records)
+        assert len(records) == len(n_tokens), "records 与 n_tokens 数量必须一致"
 
         with self.connect() as conn:
             cur = conn.cursor()
 
-            for r, v in zip(records, vectors):
+            for r, v, nt in zip(records, vectors, n_tokens):
                 # 注意：display_id / group_id 可能缺失，允许为 None
                 cur.execute(
                     """
@@ -65,8 +70,8 @@ class RagDB:
                       text, dimension, topic, risk,
                       source_id, status, quality_score, fingerprint,
                       tts_ok, tts_style,
-                      tags_flat, populations_flat
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                      tags_flat, populations_flat, n_tokens
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """,
                     (
                         r["片段ID"],
@@ -88,6 +93,7 @@ class RagDB:
 
                         flat_pipe(r.get("标签", [])),
                         flat_pipe(r.get("适用人群", [])),
+                        int(nt),
                     )
                 )
 
@@ -99,4 +105,13 @@ class RagDB:
                     (rowid, blob)
                 )
 
+            conn.commit()
+
+    def set_meta(self, meta: Dict[str, str]):
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT INTO pack_meta(key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                [(k, str(v)) for k, v in meta.items()],
+            )
             conn.commit()
\ No newline at end of file
@@ -4,6 +4,8 @@ monibox_kb/embedding.py
 作用：
 - 在构建期（PC）为文本生成 embedding 向量，用于写入 sqlite-vec（rag.db）
 - 支持使用“本地模型目录”，避免重复下载
+- numpy / sentence_transformers（连带 torch）在第一次 get_model / embed_texts 时才导入：
+  只 import 本模块（例如经 rag_engine 导入会话）不付 torch 的加载开销
 
 你现在已把模型放在：
 D:\\代码项目\\MoniBox-KB\\models\\embedding\\bge-small-zh-v1.5
@@ -17,16 +19,18 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import List
-
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import threading
+from typing import TYPE_CHECKING, List, Optional
 
 from monibox_kb.config import settings
 from monibox_kb.paths import PROJECT_ROOT
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 
-_model: SentenceTransformer | None = None
+_model: Optional["SentenceTransformer"] = None
+_model_lock = threading.Lock()     # 会话启动时在后台线程预热，与第一次查询并发时只加载一次
 
 
 def _resolve_model_ref(model_id_or_path: str) -> str:
@@ -60,7 +64,11 @@ def get_model() -> SentenceTransformer:
     单例加载 embedding 模型，避免重复加载占内存。
     """
     global _model
-    if _model is None:
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is not None:
+            return _model
         model_ref = _resolve_model_ref(settings.embedding_model)
 
         # 强制离线（可选）：如果你担心它去联网，可以打开下面两行
@@ -68,6 +76,8 @@ def get_model() -> SentenceTransformer:
         # 但开启离线更保险。
         os.environ.setdefault("HF_HUB_OFFLINE", "1")
         os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        # 放在离线开关之后导入：huggingface_hub 在导入时读取 HF_HUB_OFFLINE
+        from sentence_transformers import SentenceTransformer
 
         # 给出明确提示，方便你确认它在用本地路径
         print(f"[embedding] loading model from: {model_ref}")
@@ -94,5 +104,7 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
         normalize_embeddings=True,
         show_progress_bar=True
     )
+    import numpy as np
+
     emb = np.asarray(emb, dtype=np.float32)
     return emb.tolist()
\ No newline at end of file
@@ -4,7 +4,6 @@ import os
 from dataclasses import dataclass
 from typing import List, Dict, Optional
 
-from llama_cpp import Llama
 from monibox_kb.paths import PROJECT_ROOT
 
 @dataclass
@@ -25,6 +24,7 @@ class LlamaCppChat:
         if not os.path.isabs(path):
             path = str((PROJECT_ROOT / path).resolve())
 
+        from llama_cpp import Llama
         self.llm = Llama(
             model_path=path,
             n_ctx=cfg.n_ctx,
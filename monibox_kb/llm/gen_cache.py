@@ -0,0 +1,155 @@
+"""
+monibox_kb/llm/gen_cache.py
+
+用途
+-----
+LLM 生成结果的持久缓存（sqlite）：同一句话 + 同一组检索要点 + 同样的采样参数，回复基本不变，没必要每次重新生成。
+
+键 = sha256(模型指纹, 构建版本, prompt 模板哈希, 归一化的用户话语, 按顺序的 (chunk id, 文本指纹), 采样参数)
+值 = 解析后的 payload {"text", "used_ids", "ask"}（护栏之前的原始回复；回放时照常逐句过护栏）
+
+- 淘汰：最多 max_rows 行，按最近使用时间 LRU 删除
+- 失效：打开时删掉模型指纹 / 构建版本（pack_meta.pack_version）与当前不一致的行；两者也在键里
+- 回放：replay_tokens(payload, cps) 把 payload 按 JSON 流吐出来，走与真实生成相同的流式播报路径；
+  第一句立即给出，之后每句按播报速度（字/秒）间隔，句子大约在上一句播完时到达
+
+说明
+----
+- 连接开了 check_same_thread=False，所有访问都在锁内（会话可能在不同线程里 handle）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from monibox_kb.paths import PROJECT_ROOT
+from monibox_kb.text_clean import SENTENCE_END, clean_text
+
+
+GEN_CACHE_DDL = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+  key TEXT PRIMARY KEY,
+  model TEXT NOT NULL,               -- GGUF 指纹（tokens.model_fingerprint）
+  pack_version TEXT NOT NULL,        -- rag.db pack_meta.pack_version
+  payload TEXT NOT NULL,             -- JSON：{"text", "used_ids", "ask"}
+  created REAL NOT NULL,
+  last_used REAL NOT NULL,
+  hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used);
+"""
+
+_QUERY_STRIP = re.compile(r"[\s，,。.！!？?；;：:、~～…\"'“”‘’（）()]+")
+
+
+def normalize_query(text: str) -> str:
+    """用户话语归一化：空白与常见标点不影响命中。"""
+    return _QUERY_STRIP.sub("", clean_text(text or "").casefold())
+
+
+def _sha(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, path: str, model: str, pack_version: str, max_rows: int = 2000):
+        p = Path(path)
+        self.path = p if p.is_absolute() else (PROJECT_ROOT / p).resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.pack_version = pack_version
+        self.max_rows = max(1, int(max_rows))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(GEN_CACHE_DDL)
+            cur = self._conn.execute(
+                "DELETE FROM llm_cache WHERE model <> ? OR pack_version <> ?", (model, pack_version))
+            self.purged = cur.rowcount
+            self._conn.commit()
+
+    def key(self, template_hash: str, user_text: str,
+            items: Sequence[Tuple[str, str]], params: Dict[str, Any]) -> str:
+        """items：按顺序的 (chunk id, text)。"""
+        chunks = [[cid, hashlib.sha256(clean_text(text).encode("utf-8")).hexdigest()[:16]] for cid, text in items]
+        return _sha([self.model, self.pack_version, template_hash, normalize_query(user_text), chunks, params])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, payload: Dict[str, Any]):
+        now = time.time()
+        value = json.dumps({
+            "text": str(payload.get("text") or ""),
+            "used_ids": list(payload.get("used_ids") or []),
+            "ask": str(payload.get("ask") or ""),
+        }, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO llm_cache(key, model, pack_version, payload, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET payload = excluded.payload, last_used = excluded.last_used
+                """,
+                (key, self.model, self.pack_version, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _sentences(text: str) -> Sequence[str]:
+    out, buf = [], ""
+    for ch in text:
+        buf += ch
+        if ch in SENTENCE_END:
+            out.append(buf)
+            buf = ""
+    if buf:
+        out.append(buf)
+    return out
+
+
+def replay_tokens(payload: Dict[str, Any], cps: float = 0.0) -> Iterator[str]:
+    """
+    把缓存的 payload 按生成时的 JSON 形式流式吐出（text 最先，按句切片）。
+    cps > 0：每句之后等 len(句)/cps 秒再给下一句（按播报速度）；0 不等待。最后一句之后不等，直接给 used_ids / ask。
+    """
+    text = str(payload.get("text") or "")
+    sentences = _sentences(text)
+    yield '{"text": "'
+    for i, s in enumerate(sentences):
+        yield json.dumps(s, ensure_ascii=False)[1:-1]
+        if cps > 0 and i + 1 < len(sentences):
+            time.sleep(len(s) / cps)
+    yield ('", "used_ids": ' + json.dumps(list(payload.get("used_ids") or []), ensure_ascii=False)
+           + ', "ask": ' + json.dumps(str(payload.get("ask") or ""), ensure_ascii=False) + "}")
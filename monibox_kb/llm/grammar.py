@@ -0,0 +1,67 @@
+"""
+monibox_kb/llm/grammar.py
+
+用途
+-----
+会话回复 JSON 的 GBNF 语法（llama.cpp 语法约束解码）：
+  {"text": "...", "used_ids": ["<本轮检索到的 id>", ...], "ask": "..."}
+
+- 键顺序固定为 text / used_ids / ask（与 system prompt 一致，text 最先出来便于流式播报）
+- used_ids 只能取本轮真正检索到的 id（枚举），模型无法编造引用
+- 字符串不允许裸控制字符（换行等必须转义），对象闭合后语法结束，生成随之结束：
+  不会再有第二个 JSON，也不会有围栏/解释文字
+
+用法：
+  g = build_reply_grammar(["k_01", "k_02"])
+  for tok in llm.stream_chat(system, user, grammar=g): ...
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List
+
+
+_REPLY_GRAMMAR_BASE = r'''
+root   ::= "{" ws "\"text\"" ws ":" ws string ws "," ws "\"used_ids\"" ws ":" ws ids ws "," ws "\"ask\"" ws ":" ws string ws "}"
+string ::= "\"" char* "\""
+char   ::= [^"\\\x00-\x1F\x7F] | "\\" (["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F])
+ws     ::= " "?
+'''
+
+
+def _gbnf_literal(s: str) -> str:
+    """把任意字符串写成 GBNF 字面量（JSON 字符串本身带引号，再整体转义一层）。"""
+    js = json.dumps(s, ensure_ascii=False)
+    return '"' + js.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def build_reply_grammar(used_ids: Iterable[str]) -> str:
+    ids: List[str] = [str(x) for x in dict.fromkeys(used_ids) if str(x).strip()]
+    if ids:
+        alts = " | ".join(_gbnf_literal(x) for x in ids)
+        ids_rule = (
+            'ids    ::= "[" ws ( id ( ws "," ws id )* )? ws "]"\n'
+            f"id     ::= {alts}\n"
+        )
+    else:
+        ids_rule = 'ids    ::= "[" ws "]"\n'
+    return _REPLY_GRAMMAR_BASE.strip() + "\n" + ids_rule
+
+
+def build_reply_schema(used_ids: Iterable[str]) -> Dict[str, Any]:
+    """同一结构的 JSON Schema（给支持 json_schema 的后端用；llama.cpp 会转成 GBNF）。"""
+    ids = [str(x) for x in dict.fromkeys(used_ids) if str(x).strip()]
+    used: Dict[str, Any] = {"type": "array", "maxItems": len(ids)}
+    if ids:
+        used["items"] = {"type": "string", "enum": ids}
+    return {
+        "type": "object",
+        "properties": {
+            "text": {"type": "string"},
+            "used_ids": used,
+            "ask": {"type": "string"},
+        },
+        "required": ["text", "used_ids", "ask"],
+        "additionalProperties": False,
+    }
@@ -0,0 +1,243 @@
+"""
+monibox_kb/llm/json_stream.py
+
+用途
+-----
+LLM 流式输出的增量 JSON 字段解析：token 边到边解出指定字段（如 text / ask）的字符串值，
+不必等整段输出结束再 extract_first_json。
+
+用于“边生成边检查”：流式安全护栏只需要看会被播报的字段，而 token 边界可能切在
+转义序列（\\n、\\u6ce8）或词语中间，这里按字符推进状态机，调用方拿到的始终是已解码的文本。
+
+说明
+----
+- 只跟踪第一个顶层对象的字符串字段；嵌套的数组/对象（如 used_ids）跳过
+- 第一个 '{' 之前的内容记为 prelude（去掉 ``` 围栏）：模型没按 JSON 输出时，
+  parse_llm_payload 会把原文当 text，流式检查也看 prelude
+- 第一个对象闭合后的内容忽略（与 extract_first_json 只取第一个对象一致）
+- closing()：当前位置能否“就地收尾”，能则给出补齐用的后缀（闭合字符串、补缺失的键、闭合对象）；
+  BudgetTerminator 用它在播报字数预算用完时提前结束生成
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from monibox_kb.text_clean import normalize_for_tts
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStream:
+    """
+    增量解析器：
+    - feed(chunk) -> [(field, 新解出的文本片段), ...]
+    - values[field]：到目前为止该字段已解出的完整文本
+    - prelude：第一个 '{' 之前的原文
+    - started / done：第一个对象是否已开始 / 已闭合
+    """
+
+    def __init__(self, fields: Iterable[str] = ("text", "ask")):
+        self.fields = set(fields)
+        self.values: Dict[str, str] = {f: "" for f in self.fields}
+        self.prelude = ""
+        self.started = False
+        self.done = False
+        self.keys: List[str] = []       # 顶层已出现的 key（按顺序）
+
+        self._depth = 0
+        self._expect = "key"        # 顶层：下一个字符串是 key 还是 value
+        self._in_str = False
+        self._str_role = ""         # "key" | "value" | ""（嵌套内的字符串，跳过）
+        self._key = ""
+        self._cur_key = ""
+        self._escape = False
+        self._uhex = None           # 正在读取的 \uXXXX 十六进制位
+        self._high = ""             # 待配对的高位代理
+        self._value_end = False     # 顶层刚结束一个完整的值（此时可直接补 '}'）
+
+    # -----------------------------
+    # 对外接口
+    # -----------------------------
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        out: List[Tuple[str, str]] = []
+        for ch in chunk or "":
+            if self.done:
+                break
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                    self._expect = "key"
+                else:
+                    self.prelude += ch
+                continue
+            piece = self._step(ch)
+            if piece:
+                if out and out[-1][0] == self._cur_key:
+                    out[-1] = (self._cur_key, out[-1][1] + piece)
+                else:
+                    out.append((self._cur_key, piece))
+                self.values[self._cur_key] += piece
+        return out
+
+    def prelude_text(self) -> str:
+        """第一个 '{' 之前的原文（去掉 ``` / ```json 围栏）。"""
+        t = self.prelude.strip()
+        if t.startswith("```"):
+            t = t[3:]
+            if t[:4].lower() == "json":
+                t = t[4:]
+        return t.strip()
+
+    # -----------------------------
+    # 状态机
+    # -----------------------------
+    def _emit(self, s: str) -> str:
+        if self._str_role == "key":
+            self._key += s
+            return ""
+        if self._str_role == "value" and self._cur_key in self.fields:
+            return s
+        return ""
+
+    def _decode_unicode(self, code: int) -> str:
+        if 0xD800 <= code <= 0xDBFF:
+            self._high = chr(code)
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._high:
+            s = (self._high + chr(code)).encode("utf-16", "surrogatepass").decode("utf-16")
+            self._high = ""
+            return s
+        self._high = ""
+        return chr(code)
+
+    def _step(self, ch: str) -> str:
+        if self._in_str:
+            if self._uhex is not None:
+                self._uhex += ch
+                if len(self._uhex) < 4:
+                    return ""
+                try:
+                    s = self._decode_unicode(int(self._uhex, 16))
+                except ValueError:
+                    s = ""
+                self._uhex = None
+                return self._emit(s)
+            if self._escape:
+                self._escape = False
+                if ch == "u":
+                    self._uhex = ""
+                    return ""
+                return self._emit(_ESCAPES.get(ch, ch))
+            if ch == "\\":
+                self._escape = True
+                return ""
+            if ch == '"':
+                self._in_str = False
+                if self._str_role == "key":
+                    self._cur_key = self._key
+                    self.keys.append(self._key)
+                elif self._str_role == "value":
+                    self._value_end = True
+                return ""
+            return self._emit(ch)
+
+        if ch in " \t\r\n":
+            return ""
+        self._value_end = False
+
+        if ch == '"':
+            self._in_str = True
+            if self._depth == 1 and self._expect == "key":
+                self._str_role = "key"
+                self._key = ""
+            elif self._depth == 1 and self._expect == "value":
+                self._str_role = "value"
+            else:
+                self._str_role = ""
+            return ""
+        if ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth <= 0:
+                self.done = True
+            elif self._depth == 1:
+                self._value_end = True
+        elif self._depth == 1:
+            if ch == ":":
+                self._expect = "value"
+            elif ch == ",":
+                self._expect = "key"
+                self._cur_key = ""
+        return ""
+
+    def closing(self, defaults: Dict[str, Any]) -> Optional[str]:
+        """
+        就地收尾需要追加的后缀；当前位置不能安全收尾时返回 None（等下一个 token 再试）。
+        可收尾的位置：顶层字符串值内部（不在转义中间），或顶层一个值刚结束。
+        defaults：必需的 key -> 缺失时补的空值（按 dict 顺序补在后面）。
+        """
+        if not self.started or self.done:
+            return None
+        if self._depth != 1:
+            return None
+
+        if self._in_str:
+            if self._str_role != "value" or self._escape or self._uhex is not None or self._high:
+                return None
+            tail = '"'
+        elif self._value_end:
+            tail = ""
+        else:
+            return None
+
+        for k, v in defaults.items():
+            if k not in self.keys:
+                tail += "," + json.dumps(k, ensure_ascii=False) + ":" + json.dumps(v, ensure_ascii=False)
+        return tail + "}"
+
+
+class BudgetTerminator:
+    """
+    播报字数预算终止器（传给 LlamaCppChat.stream_chat 的 controller）：
+    - 跟踪增量解码的 text / ask，按会话的合成方式 "text ask" 计算将被播报的字数
+    - 字数达到 max_chars 且当前位置可收尾时 feed 返回 True：调用方停止生成，
+      并把 closing() 补到输出末尾（闭合字符串、补 used_ids/ask 等缺失键、闭合对象），输出仍是合法 JSON
+    超出 max_chars 的内容本来就会被 limit_chars 截掉，不必再生成。
+    """
+
+    DEFAULTS: Dict[str, Any] = {"text": "", "used_ids": [], "ask": ""}
+
+    def __init__(self, max_chars: int = 60, defaults: Optional[Dict[str, Any]] = None):
+        self.max_chars = max_chars
+        self.defaults = dict(defaults or self.DEFAULTS)
+        self.fields = JsonFieldStream(("text", "ask"))
+        self.tokens = 0
+        self.stopped = False
+        self._tail: Optional[str] = None
+
+    def spoken_len(self) -> int:
+        text = self.fields.values["text"].strip()
+        ask = self.fields.values["ask"].strip()
+        merged = (text + " " + ask).strip() if ask else text
+        return len(normalize_for_tts(merged))
+
+    def feed(self, tok: str) -> bool:
+        if self.stopped:
+            return True
+        self.tokens += 1
+        self.fields.feed(tok)
+        if self.spoken_len() < self.max_chars:
+            return False
+        tail = self.fields.closing(self.defaults)
+        if tail is None:
+            return False
+        self._tail = tail
+        self.stopped = True
+        return True
+
+    def closing(self) -> str:
+        return self._tail or ""
@@ -22,20 +22,49 @@ monibox_kb/llm/llama_cpp_chat.py
    user = "用户：... 已检索要点：..."
    for tok in llm.stream_chat(system, user):
        print(tok, end="", flush=True)
+
+system prompt 前缀 KV 复用
+-------------------------
+system prompt 每轮不变（几百个中文 token），在 4 核 ARM 上 prefill 是首 token 延迟（TTFT）的大头。
+warmup_prefix(system) 在启动时把 “<|im_start|>system ... <|im_start|>user\n” 这段前缀 eval 一次，
+用 save_state() 存下 KV 快照；之后 system 相同的每一轮：
+- KV 里已经是这段前缀（上一轮的前缀没被覆盖）：直接续上
+- 否则 load_state() 恢复快照
+然后把“前缀 token + 本轮 user 后缀 token”交给 create_completion，llama.cpp 的前缀匹配只 prefill 后缀。
+只支持 chatml 模板（Qwen 系）；其它模板自动退回 create_chat_completion。
+基准：python -m scripts.bench_llm_ttft
+
+语法约束解码
+------------
+stream_chat / generate_chat 可传 grammar（GBNF 字符串）或 json_schema（dict），
+由 llama.cpp 在采样时约束输出（见 monibox_kb/llm/grammar.py 的会话回复语法）。
+编译后的 LlamaGrammar 按文本缓存。
+
+Prompt-lookup 解码（无草稿模型的投机解码）
+----------------------------------------
+LLMConfig.prompt_lookup > 0 时给 Llama 挂 LlamaPromptLookupDecoding：
+从 prompt（检索要点）里按 n-gram 匹配出后续 token 作为草稿，一次 eval 批量验证。
+回复基本是对检索要点的改写/摘抄，命中率高；贪心解码下输出与普通解码一致。
+prompt_lookup 为草稿长度（CPU 建议 2~4，GPU 可到 10），prompt_lookup_ngram 为匹配的最大 n-gram。
+基准：python -m scripts.bench_llm_prompt_lookup（回放 LLM_RECORD_PATH 录下的会话）
 """
 
 from __future__ import annotations
 
 import inspect
+import json
 import os
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator, List, Dict, Optional
-
-from llama_cpp import Llama
+from typing import TYPE_CHECKING, Any, Iterator, List, Dict, Optional
 
 from monibox_kb.paths import PROJECT_ROOT
 
+if TYPE_CHECKING:
+    from llama_cpp import LlamaGrammar
+
 
 @dataclass
 class LLMConfig:
@@ -45,6 +74,13 @@ class LLMConfig:
     n_threads: int = 6
     n_gpu_layers: int = 0
     chat_format: str = "chatml"  # Qwen1.5-Chat 通常用 chatml
+    prompt_lookup: int = 0       # prompt-lookup 解码的草稿 token 数；0 关闭
+    prompt_lookup_ngram: int = 2  # 在 prompt 里匹配的最大 n-gram
+
+
+_PREFIX_FORMATS = ("chatml", "qwen")
+_CHATML_END = "<|im_end|>"
+_GRAMMAR_CACHE_SIZE = 32
 
 
 class LlamaCppChat:
@@ -62,15 +98,37 @@ class LlamaCppChat:
         # 允许环境变量覆盖（便于快速切换模板）
         chat_format = (os.getenv("LLM_CHAT_FORMAT", cfg.chat_format) or "").strip() or cfg.chat_format
 
+        # llama_cpp 在这里才导入：只 import 本模块（LLMConfig / 会话编排）不付 llama.cpp 的加载开销
+        from llama_cpp import Llama
+
+        draft_model = None
+        if cfg.prompt_lookup > 0:
+            from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+            draft_model = LlamaPromptLookupDecoding(
+                max_ngram_size=cfg.prompt_lookup_ngram,
+                num_pred_tokens=cfg.prompt_lookup,
+            )
+
         self.llm = Llama(
             model_path=str(p),
             n_ctx=cfg.n_ctx,
             n_threads=cfg.n_threads,
             n_gpu_layers=cfg.n_gpu_layers,
             chat_format=chat_format,
+            draft_model=draft_model,
             verbose=False,
         )
         self.chat_format = chat_format
+        self.prompt_lookup = cfg.prompt_lookup if draft_model is not None else 0
+
+        # system prompt 前缀快照（warmup_prefix 之后有效）
+        self._prefix_system: Optional[str] = None
+        self._prefix_tokens: List[int] = []
+        self._prefix_state = None
+        self.last_prefill_tokens = 0    # 最近一轮实际需要 prefill 的 token 数（调试/基准用）
+
+        # 编译后的语法（used_ids 枚举每轮不同，但同一批 chunk 经常重复出现）
+        self._grammars: "OrderedDict[str, LlamaGrammar]" = OrderedDict()
 
     @staticmethod
     def _messages(system: str, user: str) -> List[Dict[str, str]]:
@@ -80,6 +138,118 @@ class LlamaCppChat:
         msgs.append({"role": "user", "content": (user or "").strip()})
         return msgs
 
+    # -----------------------------
+    # system prompt 前缀 KV 复用
+    # -----------------------------
+    @staticmethod
+    def _chatml_prefix(system: str) -> str:
+        return f"<|im_start|>system\n{system.strip()}<|im_end|>\n<|im_start|>user\n"
+
+    @staticmethod
+    def _chatml_suffix(user: str) -> str:
+        return f"{(user or '').strip()}<|im_end|>\n<|im_start|>assistant\n"
+
+    def _tokenize(self, text: str, add_bos: bool) -> List[int]:
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=add_bos, special=True)
+
+    def warmup_prefix(self, system: str) -> Optional[float]:
+        """
+        预填充 system 前缀并保存 KV 快照（启动时调用一次）。
+        返回耗时 ms；模板不支持或 system 为空时返回 None（之后按原方式整段 prefill）。
+        """
+        if self.chat_format not in _PREFIX_FORMATS or not (system or "").strip():
+            return None
+
+        t0 = time.perf_counter()
+        tokens = self._tokenize(self._chatml_prefix(system), add_bos=True)
+        self.llm.reset()
+        self.llm.eval(tokens)
+        self._prefix_state = self.llm.save_state()
+        self._prefix_tokens = tokens
+        self._prefix_system = system
+        return (time.perf_counter() - t0) * 1000.0
+
+    @property
+    def prefix_ready(self) -> bool:
+        return self._prefix_state is not None
+
+    @property
+    def prefix_len(self) -> int:
+        return len(self._prefix_tokens)
+
+    def _prefixed_prompt(self, system: str) -> Optional[List[int]]:
+        """system 与快照一致时：保证 KV 里是前缀（必要时恢复快照），返回前缀 token；否则 None。"""
+        if self._prefix_state is None or system != self._prefix_system:
+            return None
+        n = len(self._prefix_tokens)
+        if self.llm.n_tokens < n or list(self.llm.input_ids[:n]) != self._prefix_tokens:
+            self.llm.load_state(self._prefix_state)
+        return self._prefix_tokens
+
+    # -----------------------------
+    # 语法约束
+    # -----------------------------
+    def _grammar(self, grammar: Optional[str], json_schema: Optional[Dict[str, Any]]) -> Optional[LlamaGrammar]:
+        if grammar is None and json_schema is None:
+            return None
+        key = grammar if grammar is not None else "schema:" + json.dumps(json_schema, sort_keys=True, ensure_ascii=False)
+        g = self._grammars.get(key)
+        if g is not None:
+            self._grammars.move_to_end(key)
+            return g
+        from llama_cpp import LlamaGrammar
+        if grammar is not None:
+            g = LlamaGrammar.from_string(grammar, verbose=False)
+        else:
+            g = LlamaGrammar.from_json_schema(json.dumps(json_schema, ensure_ascii=False), verbose=False)
+        self._grammars[key] = g
+        if len(self._grammars) > _GRAMMAR_CACHE_SIZE:
+            self._grammars.popitem(last=False)
+        return g
+
+    def _completion_kwargs(self, system: str, user: str, max_tokens: int, temperature: float,
+                           top_p: float, stop: List[str], stream: bool, use_prefix: bool,
+                           grammar: Optional[LlamaGrammar] = None):
+        """
+        返回 (方法, kwargs)：
+        - 有前缀快照：create_completion(prompt=前缀 token + 后缀 token)，只 prefill 后缀
+        - 否则：create_chat_completion(messages=...)，整段 prefill
+        """
+        prefix = self._prefixed_prompt(system) if use_prefix else None
+        if prefix is not None:
+            suffix = self._tokenize(self._chatml_suffix(user), add_bos=False)
+            self.last_prefill_tokens = len(suffix)
+            # create_completion 不经 chatml chat handler，需自己补上轮次结束符，否则会续写出下一个 <|im_start|> 轮次
+            stop = list(stop or [])
+            if _CHATML_END not in stop:
+                stop.append(_CHATML_END)
+            kwargs = dict(
+                prompt=prefix + suffix,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stop=stop,
+                stream=stream,
+            )
+            if grammar is not None:
+                kwargs["grammar"] = grammar
+            return self.llm.create_completion, kwargs
+
+        self.last_prefill_tokens = -1   # 未知：由 chat handler 整段处理
+        sig = inspect.signature(self.llm.create_chat_completion)
+        kwargs = dict(
+            messages=self._messages(system, user),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stream=stream,
+        )
+        if "stop" in sig.parameters:
+            kwargs["stop"] = stop
+        if grammar is not None:
+            kwargs["grammar"] = grammar
+        return self.llm.create_chat_completion, kwargs
+
     def stream_chat(
         self,
         system: str,
@@ -88,35 +258,47 @@ class LlamaCppChat:
         temperature: float = 0.4,
         top_p: float = 0.9,
         stop: Optional[List[str]] = None,
+        use_prefix: bool = True,
+        grammar: Optional[str] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
+        controller: Optional[Any] = None,
     ) -> Iterator[str]:
         """
         Chat 流式输出：逐段 yield token(string)
+        use_prefix：system 与 warmup_prefix 的一致时复用前缀 KV（基准对比时可关掉）
+        grammar / json_schema：约束输出结构（二选一）
+        controller：终止控制器（如 json_stream.BudgetTerminator）。每个 token 调 controller.feed(tok)，
+                    返回 True 时停止解码，并把 controller.closing() 作为最后一段 yield（补齐 JSON）
         """
-        messages = self._messages(system, user)
         stop = stop or ["</s>", "<|endoftext|>"]
+        create, kwargs = self._completion_kwargs(system, user, max_tokens, temperature, top_p, stop,
+                                                 stream=True, use_prefix=use_prefix,
+                                                 grammar=self._grammar(grammar, json_schema))
 
-        sig = inspect.signature(self.llm.create_chat_completion)
-        kwargs = dict(
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p,
-            stream=True,
-        )
-        if "stop" in sig.parameters:
-            kwargs["stop"] = stop
-
-        for chunk in self.llm.create_chat_completion(**kwargs):
-            # 更鲁棒的 token 提取：兼容 delta/content 或 text
-            choice = (chunk.get("choices") or [{}])[0]
-            tok = ""
-            if isinstance(choice, dict):
-                if "delta" in choice and isinstance(choice["delta"], dict):
-                    tok = choice["delta"].get("content", "") or ""
+        it = create(**kwargs)
+        try:
+            for chunk in it:
+                # 更鲁棒的 token 提取：兼容 delta/content 或 text
+                choice = (chunk.get("choices") or [{}])[0]
+                tok = ""
+                if isinstance(choice, dict):
+                    if "delta" in choice and isinstance(choice["delta"], dict):
+                        tok = choice["delta"].get("content", "") or ""
+                    if not tok:
+                        tok = choice.get("text", "") or ""
                 if not tok:
-                    tok = choice.get("text", "") or ""
-            if tok:
+                    continue
                 yield tok
+                if controller is not None and controller.feed(tok):
+                    tail = controller.closing()
+                    if tail:
+                        yield tail
+                    break
+        finally:
+            # 提前结束（controller 终止 / 调用方 break）时关闭底层生成器，llama.cpp 不再继续解码
+            close = getattr(it, "close", None)
+            if callable(close):
+                close()
 
     def generate_chat(
         self,
@@ -126,26 +308,23 @@ class LlamaCppChat:
         temperature: float = 0.4,
         top_p: float = 0.9,
         stop: Optional[List[str]] = None,
+        use_prefix: bool = True,
+        grammar: Optional[str] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
     ) -> str:
         """
         Chat 非流式输出：一次性返回完整文本
         """
-        messages = self._messages(system, user)
         stop = stop or ["</s>", "<|endoftext|>"]
+        create, kwargs = self._completion_kwargs(system, user, max_tokens, temperature, top_p, stop,
+                                                 stream=False, use_prefix=use_prefix,
+                                                 grammar=self._grammar(grammar, json_schema))
 
-        sig = inspect.signature(self.llm.create_chat_completion)
-        kwargs = dict(
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p,
-            stream=False,
-        )
-        if "stop" in sig.parameters:
-            kwargs["stop"] = stop
-
-        out = self.llm.create_chat_completion(**kwargs)
+        out = create(**kwargs)
         try:
-            return (out["choices"][0]["message"]["content"] or "").strip()
+            choice = out["choices"][0]
+            if "message" in choice:
+                return (choice["message"]["content"] or "").strip()
+            return (choice.get("text") or "").strip()
         except Exception:
             return str(out).strip()
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+monibox_kb/llm/llm_worker.py
+
+用途
+-----
+LLM 独立进程：子进程持有 Llama 实例，会话线程经本地队列提交请求、逐 token 收流，可随时取消。
+LlamaCppChat 直接跑在会话线程里时，生成期间新的话语 / 协议事件只能干等；
+放到子进程后，会话侧 cancel() 一下，生成在下一个 token 边界就停（毫秒级），KV 与模型都留在子进程里复用。
+
+用法（与 LlamaCppChat 同一接口）：
+  llm = LLMWorker(LLMConfig(gguf_path=...))
+  llm.warmup_prefix(system)
+  for tok in llm.stream_chat(system, user, grammar=g, controller=budget):
+      ...
+  llm.cancel()      # 任意线程调用：取消所有已提交、未结束的生成
+  llm.close()
+
+说明
+----
+- 请求按提交顺序排队执行（子进程里只有一个 Llama）；已取消的请求出队时直接跳过
+- 取消粒度是 token：prefill 阶段（一次 eval）无法打断，之后每个 token 前检查一次取消标记
+- 生成器被 close()（调用方 break / 异常）时自动取消对应请求，子进程不会继续白白解码
+- controller（如 BudgetTerminator）在会话侧执行，语义与 LlamaCppChat.stream_chat 一致；
+  其余参数原样转发给子进程里的 LlamaCppChat.stream_chat
+- 子进程用 spawn 启动（Windows / Linux 一致），入口脚本需要 if __name__ == "__main__" 保护
+"""
+
+from __future__ import annotations
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from monibox_kb.llm.llama_cpp_chat import LLMConfig
+
+
+_POLL_S = 0.5       # 等待子进程消息时，隔多久确认一次子进程还活着
+
+
+class LLMWorkerError(RuntimeError):
+    pass
+
+
+class LLMWorker:
+    def __init__(self, cfg: LLMConfig, start_timeout: float = 300.0):
+        ctx = mp.get_context("spawn")
+        self._req = ctx.Queue()
+        self._out = ctx.Queue()
+        self._cancel = ctx.Value("q", 0)      # 编号 <= 该值的请求视为已取消
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._inbox: Dict[int, "queue.Queue[Tuple[str, Any]]"] = {0: queue.Queue()}
+
+        self.chat_format = cfg.chat_format
+        self.prompt_lookup = 0
+        self.prefix_len = 0
+        self.last_prefill_tokens = 0
+        self.last_cancelled = False
+
+        self._proc = ctx.Process(target=_worker_main, args=(cfg, self._req, self._out, self._cancel),
+                                 name="llm-worker", daemon=True)
+        self._proc.start()
+        self._reader = threading.Thread(target=self._dispatch, name="llm-worker-reader", daemon=True)
+        self._reader.start()
+
+        info = self._wait(0, timeout=start_timeout)
+        self.chat_format = info.get("chat_format", self.chat_format)
+        self.prompt_lookup = info.get("prompt_lookup", 0)
+
+    # -----------------------------
+    # 消息分发
+    # -----------------------------
+    def _dispatch(self):
+        while True:
+            kind, rid, payload = self._out.get()
+            if kind == "closed":
+                return
+            with self._lock:
+                box = self._inbox.get(rid)
+            if box is not None:     # 已放弃的请求（调用方提前退出）：丢弃剩余消息
+                box.put((kind, payload))
+
+    def _submit(self, kind: str, kwargs: Dict[str, Any]) -> int:
+        with self._lock:
+            rid = next(self._ids)
+            self._last_id = rid
+            self._inbox[rid] = queue.Queue()
+        self._req.put((rid, kind, kwargs))
+        return rid
+
+    def _drop(self, rid: int):
+        with self._lock:
+            self._inbox.pop(rid, None)
+
+    def _next(self, rid: int, timeout: Optional[float] = None) -> Tuple[str, Any]:
+        with self._lock:
+            box = self._inbox[rid]
+        waited = 0.0
+        while True:
+            try:
+                return box.get(timeout=_POLL_S)
+            except queue.Empty:
+                if not self._proc.is_alive():
+                    raise LLMWorkerError(f"LLM 子进程已退出（exitcode={self._proc.exitcode}）")
+                waited += _POLL_S
+                if timeout is not None and waited >= timeout:
+                    raise LLMWorkerError(f"等待 LLM 子进程超时（{timeout:.0f}s）")
+
+    def _wait(self, rid: int, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待一个非流式请求结束，返回子进程回报的信息。"""
+        try:
+            while True:
+                kind, payload = self._next(rid, timeout=timeout)
+                if kind == "error":
+                    raise LLMWorkerError(payload)
+                if kind in ("ready", "end"):
+                    return payload or {}
+        finally:
+            self._drop(rid)
+
+    # -----------------------------
+    # 对外接口（与 LlamaCppChat 对齐）
+    # -----------------------------
+    def cancel(self, rid: Optional[int] = None):
+        """取消编号 <= rid 的请求；不传则取消所有已提交的请求。"""
+        with self._lock:
+            rid = self._last_id if rid is None else rid
+        with self._cancel.get_lock():
+            if self._cancel.value < rid:
+                self._cancel.value = rid
+
+    def warmup_prefix(self, system: str) -> Optional[float]:
+        info = self._wait(self._submit("warmup", {"system": system}))
+        self.prefix_len = int(info.get("prefix_len") or 0)
+        return info.get("ms")
+
+    @property
+    def prefix_ready(self) -> bool:
+        return self.prefix_len > 0
+
+    def stream_chat(self, system: str, user: str, controller: Optional[Any] = None, **kwargs) -> Iterator[str]:
+        """
+        流式生成：参数同 LlamaCppChat.stream_chat。
+        被 cancel() 取消时生成器正常结束，last_cancelled=True。
+        """
+        kwargs.update(system=system, user=user)
+        rid = self._submit("stream", kwargs)
+        finished = False
+        try:
+            while True:
+                kind, payload = self._next(rid)
+                if kind == "tok":
+                    yield payload
+                    if controller is not None and controller.feed(payload):
+                        tail = controller.closing()
+                        if tail:
+                            yield tail
+                        break
+                elif kind == "end":
+                    finished = True
+                    self.last_cancelled = bool(payload.get("cancelled"))
+                    self.last_prefill_tokens = payload.get("prefill_tokens", 0)
+                    return
+                elif kind == "error":
+                    finished = True
+                    raise LLMWorkerError(payload)
+        finally:
+            if not finished:
+                self.cancel(rid)
+            self._drop(rid)
+
+    def generate_chat(self, system: str, user: str, **kwargs) -> str:
+        return "".join(self.stream_chat(system, user, **kwargs)).strip()
+
+    def close(self, timeout: float = 5.0):
+        self.cancel()
+        self._req.put(None)
+        self._proc.join(timeout=timeout)
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(timeout=timeout)
+        self._out.put(("closed", -1, None))
+        self._reader.join(timeout=timeout)
+
+
+# -----------------------------
+# 子进程入口
+# -----------------------------
+def _worker_main(cfg: LLMConfig, req_q, out_q, cancel):
+    from monibox_kb.llm.llama_cpp_chat import LlamaCppChat
+
+    try:
+        llm = LlamaCppChat(cfg)
+    except Exception as e:
+        out_q.put(("error", 0, f"{type(e).__name__}: {e}"))
+        return
+    out_q.put(("ready", 0, {"chat_format": llm.chat_format, "prompt_lookup": llm.prompt_lookup}))
+
+    while True:
+        req = req_q.get()
+        if req is None:
+            return
+        rid, kind, kwargs = req
+        if cancel.value >= rid:
+            out_q.put(("end", rid, {"cancelled": True}))
+            continue
+        try:
+            if kind == "warmup":
+                ms = llm.warmup_prefix(**kwargs)
+                out_q.put(("end", rid, {"ms": ms, "prefix_len": llm.prefix_len}))
+            elif kind == "stream":
+                cancelled = False
+                stream = llm.stream_chat(**kwargs)
+                try:
+                    for tok in stream:
+                        if cancel.value >= rid:
+                            cancelled = True
+                            break
+                        out_q.put(("tok", rid, tok))
+                finally:
+                    stream.close()
+                out_q.put(("end", rid, {"cancelled": cancelled, "prefill_tokens": llm.last_prefill_tokens}))
+            else:
+                out_q.put(("error", rid, f"未知请求类型：{kind}"))
+        except Exception as e:
+            out_q.put(("error", rid, f"{type(e).__name__}: {e}"))
@@ -0,0 +1,68 @@
+"""
+monibox_kb/llm/recorder.py
+
+用途
+-----
+把会话里真实发生的 LLM 调用录成 JSONL（一行一轮），供离线基准回放：
+  {"ts": ..., "system": ..., "user": ..., "grammar": ..., "max_tokens": ..., "stop": [...],
+   "temperature": ..., "output": ..., "gen_ms": ...}
+
+- MoniSession 在设置了 LLM_RECORD_PATH 时每轮追加一行（默认不录）
+- load_records(path) 读回（跳过坏行），scripts/bench_llm_prompt_lookup.py 用它回放
+
+说明
+----
+- 录的是完整 prompt（含检索要点），回放时不依赖 rag.db / embedding 模型
+- 只追加写，不做轮转；需要时手动删除文件
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from monibox_kb.paths import PROJECT_ROOT
+
+
+def _resolve(path: Union[str, Path]) -> Path:
+    p = Path(path)
+    if not p.is_absolute():
+        p = (PROJECT_ROOT / p).resolve()
+    return p
+
+
+class LLMRecorder:
+    def __init__(self, path: Union[str, Path]):
+        self.path = _resolve(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, **fields: Any):
+        rec = {"ts": round(time.time(), 3)}
+        rec.update(fields)
+        line = json.dumps(rec, ensure_ascii=False)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def load_records(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    p = _resolve(path)
+    out: List[Dict[str, Any]] = []
+    if not p.exists():
+        return out
+    with p.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict) and rec.get("user"):
+                out.append(rec)
+    return out
@@ -0,0 +1,74 @@
+"""
+monibox_kb/llm/scripted_llm.py
+
+用途
+-----
+假 LLM 后端（不加载模型）：按设定的首 token 延迟 / 每 token 延迟，逐段吐出一个固定的 JSON 回复。
+用于在没有 GGUF 的环境里测会话编排：降级阶梯（慢板子 / 降频）、打断、流式播报。
+接口与 LlamaCppChat / LLMWorker 一致（stream_chat / generate_chat / warmup_prefix / cancel），
+MoniSession(llm=ScriptedLLM(...)) 注入使用。
+
+- first_token_ms：模拟 prefill（从调用到第一个 token）
+- token_ms：模拟每个 token 的解码耗时
+- cancel()：任意线程调用，正在等待的延迟立即结束并停止吐 token
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+
+DEFAULT_REPLY = {"text": "先慢慢呼吸，护住头部。我在这里陪你。", "used_ids": [], "ask": "你现在能动吗？"}
+
+
+def split_tokens(s: str, size: int = 2) -> List[str]:
+    return [s[i:i + size] for i in range(0, len(s), size)]
+
+
+class ScriptedLLM:
+    def __init__(self, reply: Optional[Dict[str, Any]] = None, first_token_ms: float = 200.0,
+                 token_ms: float = 30.0):
+        self.reply = reply or DEFAULT_REPLY
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.prefix_len = 0
+        self.prompt_lookup = 0
+        self.calls = 0
+        self._cancel = threading.Event()
+
+    def warmup_prefix(self, system: str) -> Optional[float]:
+        return None
+
+    @property
+    def prefix_ready(self) -> bool:
+        return False
+
+    def cancel(self, rid: Optional[int] = None):
+        self._cancel.set()
+
+    def stream_chat(self, system: str, user: str, controller: Optional[Any] = None, **kwargs: Any) -> Iterator[str]:
+        # 在返回生成器之前清掉取消标记：第一次 next() 之前到达的 cancel() 不能被吞
+        self.calls += 1
+        self._cancel.clear()
+        return self._stream(controller)
+
+    def _stream(self, controller: Optional[Any]) -> Iterator[str]:
+        if self._cancel.wait(self.first_token_ms / 1000.0):
+            return
+        for i, tok in enumerate(split_tokens(json.dumps(self.reply, ensure_ascii=False))):
+            if i and self._cancel.wait(self.token_ms / 1000.0):
+                return
+            yield tok
+            if controller is not None and controller.feed(tok):
+                tail = controller.closing()
+                if tail:
+                    yield tail
+                return
+
+    def generate_chat(self, system: str, user: str, **kwargs: Any) -> str:
+        return "".join(self.stream_chat(system, user))
+
+    def close(self):
+        self.cancel()
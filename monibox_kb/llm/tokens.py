@@ -0,0 +1,98 @@
+"""
+monibox_kb/llm/tokens.py
+
+用途
+-----
+上下文 token 预算相关的小工具：
+- context_line(cid, text)：检索要点在 user prompt 里的一行（build_user_prompt 与 build 期计数共用同一格式）
+- estimate_tokens(text)：不加载分词器时的保守估算
+- model_fingerprint(path)：GGUF 文件指纹（文件名 + 大小 + 首尾 1MB 的 sha256），
+  用来判断 build 期的 token 计数是否属于当前模型的分词器
+- count_chunk_tokens(chunks, gguf_path)：build_pack 用，按配置的 GGUF 分词器给每个 chunk 的上下文行计数
+
+说明
+----
+- 分词器用 llama_cpp 的 vocab_only 加载，不加载权重，几百毫秒级
+- 没配 LLM_GGUF_PATH / 没装 llama_cpp 时退回估算，分词器记为 "estimate"，运行期同样按估算处理
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from monibox_kb.paths import PROJECT_ROOT
+
+
+ESTIMATE = "estimate"
+_FP_BLOCK = 1 << 20
+
+
+def context_line(cid: str, text: str) -> str:
+    return f'- id="{cid}" text="{text}"'
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    保守估算：非 ASCII 字符（中文、全角标点）按 1 个 token，ASCII 按 3 个字符 1 个 token。
+    Qwen 系分词器对常见中文词会合并，实际一般更少，用来做预算只会偏紧不会溢出。
+    """
+    if not text:
+        return 0
+    ascii_n = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_n) + (ascii_n + 2) // 3
+
+
+def _resolve(path: str) -> Path:
+    p = Path(path)
+    if not p.is_absolute():
+        p = (PROJECT_ROOT / p).resolve()
+    return p
+
+
+def model_fingerprint(path: str) -> str:
+    """GGUF 文件指纹：name:sha256[:16]；文件不存在返回空串。"""
+    p = _resolve(path) if path else None
+    if p is None or not p.exists():
+        return ""
+    size = p.stat().st_size
+    h = hashlib.sha256(str(size).encode("ascii"))
+    with p.open("rb") as f:
+        h.update(f.read(_FP_BLOCK))
+        if size > _FP_BLOCK:
+            f.seek(max(_FP_BLOCK, size - _FP_BLOCK))
+            h.update(f.read(_FP_BLOCK))
+    return f"{p.name}:{h.hexdigest()[:16]}"
+
+
+class GGUFTokenCounter:
+    """只加载词表的 llama.cpp 分词器。"""
+
+    def __init__(self, gguf_path: str):
+        from llama_cpp import Llama
+
+        self.path = _resolve(gguf_path)
+        self.llm = Llama(model_path=str(self.path), vocab_only=True, verbose=False)
+        self.fingerprint = model_fingerprint(str(self.path))
+
+    def count(self, text: str) -> int:
+        return len(self.llm.tokenize((text or "").encode("utf-8"), add_bos=False, special=True))
+
+
+def count_chunk_tokens(chunks: Sequence[Dict[str, Any]], gguf_path: Optional[str]) -> Tuple[List[int], str]:
+    """
+    每个 chunk 的上下文行（context_line）的 token 数 + 分词器标识。
+    分词器不可用时返回估算值与 "estimate"。
+    """
+    lines = [context_line(str(c.get("显示ID") or c.get("片段ID") or ""), str(c.get("文本") or "").strip())
+             for c in chunks]
+    counter = None
+    if gguf_path and _resolve(gguf_path).exists():
+        try:
+            counter = GGUFTokenCounter(gguf_path)
+        except ImportError:
+            counter = None
+    if counter is None:
+        return [estimate_tokens(x) for x in lines], ESTIMATE
+    return [counter.count(x) for x in lines], counter.fingerprint
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-import json
+import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from monibox_kb.compile_pack import compile_router_pack, load_router_pack, router_pack_is_fresh
+from monibox_kb.config import settings
 from monibox_kb.paths import GENERATED_DIR, KNOWLEDGE_SRC
 from monibox_kb.tags.registry import TagRegistry
 
@@ -15,6 +18,7 @@ class RouteResult:
     tag_dims: Dict[str, str]         # tag_id -> 所属维度
     evidence: Dict[str, List[str]]   # tag_id -> 命中的召回词/规则词（可解释）
     cross_dimension: bool            # 是否跨维度（用于 query_demo 解锁维度过滤）
+    source: str = "recall"           # recall（召回词/规则命中）| embedding（质心余弦兜底）| default（无命中）
 
 
 class AutoRouter:
@@ -23,102 +27,122 @@ class AutoRouter:
     - 基于 normalized taxonomy 的“建议召回词”做匹配
     - 支持 router_overrides.json 对特定症状/关键词加权（不用改taxonomy）
     - 输出：tags + tag_dims + cross_dimension
+    - 召回词全部未命中时：若调用方传入 query 向量（检索本来就要算），按标签质心余弦相似度兜底，不再额外跑一次模型
+
+    启动：
+    - 优先加载 build_pack 生成的 router_pack.bin（一次读取，端侧不需要 generated/ 中间产物）
+    - 产物不存在/已过期（PC 上改了 taxonomy/overrides 未重新 build）/显式传入源文件路径：从源文件在内存中编译
     """
     def __init__(self,
                  normalized_path=None,
-                 overrides_path=None):
+                 overrides_path=None,
+                 pack_path=None):
         self.normalized_path = normalized_path or (GENERATED_DIR / "02_meta_candidates.normalized.json")
         self.overrides_path = overrides_path or (KNOWLEDGE_SRC / "router_overrides.json")
+        self.pack_path = Path(pack_path or settings.router_pack_path)
 
         self.tag_records = []            # [{tag_id, dim, recall[]}]
         self.tag_dim_map: Dict[str, str] = {}
-        self.overrides = []              # rules
-        self.reg = TagRegistry.load()    # 含 alias + allowed_ids
-
-        self._load_taxonomy()
-        self._load_overrides()
-
-    def _load_taxonomy(self):
-        if not self.normalized_path.exists():
-            raise FileNotFoundError(f"缺少 {self.normalized_path}，请先生成并 normalize taxonomy")
-
-        obj = json.loads(self.normalized_path.read_text(encoding="utf-8"))
-        items = obj.get("标签体系", [])
-        if not isinstance(items, list):
-            raise ValueError("normalized taxonomy 结构不对：标签体系不是数组")
+        self.overrides = []              # compiled rules
+        self.loaded_from = ""
+        self.emb_min_sim = float(os.getenv("ROUTER_EMB_MIN_SIM", "0.55"))
+
+        explicit_src = normalized_path is not None or overrides_path is not None
+        pack = None
+        stale = None
+        if not explicit_src and self.pack_path.exists():
+            pack = load_router_pack(self.pack_path)
+            if router_pack_is_fresh(pack):
+                self.loaded_from = str(self.pack_path)
+            else:
+                stale, pack = pack, None
+
+        if pack is None:
+            pack = compile_router_pack(normalized_path=self.normalized_path,
+                                       overrides_path=self.overrides_path)
+            self.loaded_from = str(self.normalized_path)
+            # 质心只能在 build_pack 时算（需要 embedding 模型）；源文件改动后沿用旧产物里的质心
+            if stale is not None and stale.get("centroids"):
+                pack["centroids"] = stale["centroids"]
+
+        self._apply_pack(pack)
+
+    def _apply_pack(self, pack: Dict[str, Any]):
+        self.reg = TagRegistry.from_dict(pack["registry"])    # 含 alias + allowed_ids
+        self.tag_records = pack["tags"]
+        self.tag_dim_map = dict(pack["tag_dims"])
+        self.overrides = pack["overrides"]
+        self._matcher = pack["matcher"]
+        self._term_index: Dict[str, List[Tuple[int, int]]] = pack["term_index"]
+
+        self._centroid_ids: List[str] = []
+        self._centroids = None
+        cent = pack.get("centroids")
+        if cent and cent.get("tag_ids"):
+            import numpy as np
+            mat = np.frombuffer(cent["data"], dtype="<f4").reshape(len(cent["tag_ids"]), int(cent["dim"]))
+            keep = [i for i, tid in enumerate(cent["tag_ids"]) if tid in self.tag_dim_map]
+            self._centroid_ids = [cent["tag_ids"][i] for i in keep]
+            self._centroids = mat[keep]
+
+    @property
+    def has_centroids(self) -> bool:
+        return self._centroids is not None and len(self._centroid_ids) > 0
+
+    def _route_by_embedding(self, query_vec, top_tags: int) -> Optional[RouteResult]:
+        """
+        质心余弦兜底：query 向量与 chunk 向量一样是单位向量，点积即余弦。
+        低于 ROUTER_EMB_MIN_SIM 的标签不采用（宁可不过滤，也不要错过滤）。
+        """
+        import numpy as np
+
+        q = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self._centroids.shape[1]:
+            return None
+        sims = self._centroids @ q
+        order = np.argsort(-sims)[:max(1, int(top_tags))]
+        picked = [(self._centroid_ids[i], float(sims[i])) for i in order if float(sims[i]) >= self.emb_min_sim]
+        if not picked:
+            return None
+
+        tags = [tid for tid, _ in picked]
+        tag_dims = {tid: self.tag_dim_map.get(tid, "") for tid in tags}
+        return RouteResult(
+            dimension=tag_dims[tags[0]] or "动态心理认知状态",
+            tags=tags,
+            tag_dims=tag_dims,
+            evidence={tid: [f"emb:{sim:.3f}"] for tid, sim in picked},
+            cross_dimension=len({d for d in tag_dims.values() if d}) >= 2,
+            source="embedding",
+        )
 
-        recs = []
-        for it in items:
-            if not isinstance(it, dict):
-                continue
-            tid = str(it.get("标签ID", "")).strip()
-            dim = str(it.get("所属维度", "")).strip()
-            recall = it.get("建议召回词", [])
-            if not tid or not dim:
-                continue
-            if not isinstance(recall, list):
-                recall = []
-            recall = [str(x).strip() for x in recall if str(x).strip()]
-            recs.append({"tag_id": tid, "dimension": dim, "recall": recall})
-            self.tag_dim_map[tid] = dim
-
-        self.tag_records = recs
-
-    def _load_overrides(self):
-        if not self.overrides_path.exists():
-            self.overrides = []
-            return
-        obj = json.loads(self.overrides_path.read_text(encoding="utf-8"))
-        rules = obj.get("rules", [])
-        if isinstance(rules, list):
-            self.overrides = rules
-        else:
-            self.overrides = []
-
-    def _apply_overrides(self, q: str,
+    def _apply_overrides(self, found: Set[str],
                          tag_score: Dict[str, float],
                          tag_hits: Dict[str, List[str]]):
         """
         对匹配到 patterns 的规则，给 boost_tags 加分；
-        force_tags 则给一个大分确保进入 top_tags（仍会走 canonicalize）。
+        force_tags 则给一个大分确保进入 top_tags（构建期已 canonicalize）。
         """
         for rule in self.overrides:
-            try:
-                patterns = rule.get("patterns", [])
-                if not isinstance(patterns, list):
-                    continue
-                hit_terms = [p for p in patterns if isinstance(p, str) and p and (p in q)]
-                if not hit_terms:
-                    continue
-
-                # boost tags
-                boost = rule.get("boost_tags", {})
-                if isinstance(boost, dict):
-                    for raw_tid, w in boost.items():
-                        canon = self.reg.canonicalize(str(raw_tid))
-                        if not canon:
-                            continue
-                        if canon not in self.tag_dim_map:
-                            continue
-                        tag_score[canon] = tag_score.get(canon, 0.0) + float(w)
-                        tag_hits.setdefault(canon, []).extend(hit_terms)
-
-                # force tags
-                force = rule.get("force_tags", [])
-                if isinstance(force, list):
-                    for raw_tid in force:
-                        canon = self.reg.canonicalize(str(raw_tid))
-                        if not canon:
-                            continue
-                        if canon not in self.tag_dim_map:
-                            continue
-                        tag_score[canon] = tag_score.get(canon, 0.0) + 99.0
-                        tag_hits.setdefault(canon, []).extend(hit_terms)
-
-            except Exception:
+            hit_terms = [p for p in rule["patterns"] if p in found]
+            if not hit_terms:
                 continue
 
-    def route(self, query: str, top_tags: int = 1) -> RouteResult:
+            # boost tags
+            for canon, w in rule["boost"]:
+                tag_score[canon] = tag_score.get(canon, 0.0) + w
+                tag_hits.setdefault(canon, []).extend(hit_terms)
+
+            # force tags
+            for canon in rule["force"]:
+                tag_score[canon] = tag_score.get(canon, 0.0) + 99.0
+                tag_hits.setdefault(canon, []).extend(hit_terms)
+
+    def route(self, query: str, top_tags: int = 1, query_vec=None) -> RouteResult:
+        """
+        query_vec：可选，query 的 embedding（与 RagEngine.search 共用同一个向量）。
+        只在召回词/规则全部未命中时使用。
+        """
         q = (query or "").strip()
         if not q:
             return RouteResult(
@@ -126,40 +150,45 @@ class AutoRouter:
                 tags=[],
                 tag_dims={},
                 evidence={},
-                cross_dimension=False
+                cross_dimension=False,
+                source="default",
             )
 
         tag_score: Dict[str, float] = {}
         tag_hits: Dict[str, List[str]] = {}
 
-        # 1) 召回词匹配
-        for rec in self.tag_records:
-            tid = rec["tag_id"]
-            dim = rec["dimension"]
+        # 0) 一次扫描拿到全部命中词（召回词 + overrides patterns）
+        found = self._matcher.find_all(q)
 
-            score = 0.0
-            hits = []
-            for term in rec["recall"]:
-                if term and term in q:
-                    hits.append(term)
-                    # 命中一次 + 长词加权（避免“黑/痛”过泛）
-                    score += 1.0 + min(len(term), 8) * 0.08
+        # 1) 召回词匹配：按 (tag顺序, 召回词顺序) 还原，保证打分/证据顺序与逐词匹配一致
+        slots: List[Tuple[int, int, str]] = []
+        for term in found:
+            for ti, pi in self._term_index.get(term, ()):
+                slots.append((ti, pi, term))
+        slots.sort()
 
-            if score > 0:
-                tag_score[tid] = tag_score.get(tid, 0.0) + score
-                tag_hits.setdefault(tid, []).extend(hits)
+        for ti, _, term in slots:
+            tid = self.tag_records[ti]["tag_id"]
+            # 命中一次 + 长词加权（避免“黑/痛”过泛）
+            tag_score[tid] = tag_score.get(tid, 0.0) + 1.0 + min(len(term), 8) * 0.08
+            tag_hits.setdefault(tid, []).append(term)
 
         # 2) overrides 加权（关键：不用改 taxonomy）
-        self._apply_overrides(q, tag_score, tag_hits)
+        self._apply_overrides(found, tag_score, tag_hits)
 
-        # 3) 若完全无命中：默认心理维度，不加 tag 过滤
+        # 3) 若完全无命中：有 query 向量则按标签质心兜底；否则默认心理维度，不加 tag 过滤
         if not tag_score:
+            if query_vec is not None and self.has_centroids:
+                rr = self._route_by_embedding(query_vec, top_tags)
+                if rr is not None:
+                    return rr
             return RouteResult(
                 dimension="动态心理认知状态",
                 tags=[],
                 tag_dims={},
                 evidence={},
-                cross_dimension=False
+                cross_dimension=False,
+                source="default",
             )
 
         # 4) 选 top_tags
@@ -0,0 +1,283 @@
+"""
+monibox_kb/runtime/action_scheduler.py
+
+用途
+-----
+协议动作调度器（asyncio）：在 HardwareIface 之上并发执行一个协议的 tts / led / screen 动作。
+
+- 同一协议的动作同时启动：LED 呼吸灯不再等语音播完才亮
+- 时长：led 按 pattern.ms 或 (inhale_ms + exhale_ms) * cycles，screen 按 ms；到期调用 led_off / screen_clear
+- 定时：任意动作可带 delay_ms（相对协议开始的启动偏移）
+- 抢占：新协议 priority >= 正在执行的协议时，取消旧协议（stop_tts / led_off / screen_clear）；
+        更低优先级的协议排队等待当前协议结束，且排在所有更高优先级的等待者之后；
+        线程池里还没调到硬件的调用在协议被取消后不再执行
+- 报告：每个动作的计划偏移、实际启动延迟（硬件调用真正开始执行的时刻）、持续时间、是否被抢占
+- 调用方只需等语音：ScheduledRun.wait_tts() 在本协议的 tts 动作结束时返回，led / screen 的持续时间由调度器自己收尾
+
+事件循环跑在后台线程里：任意线程（传感器、会话）都可以 submit()，不阻塞调用方。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from monibox_kb.runtime.hardware_iface import HardwareIface
+
+
+@dataclass
+class ActionReport:
+    protocol_id: str
+    index: int
+    type: str
+    delay_ms: float               # 计划启动偏移（delay_ms 字段）
+    start_latency_ms: float       # 实际启动时刻 - (提交时刻 + delay_ms)
+    duration_ms: float = 0.0
+    cancelled: bool = False
+
+
+@dataclass
+class ScheduledRun:
+    protocol_id: str
+    priority: float
+    t0: float
+    started: threading.Event = field(default_factory=threading.Event)
+    decided: threading.Event = field(default_factory=threading.Event)   # 第一个动作已启动 / 已排队 / 已结束
+    tts_done: threading.Event = field(default_factory=threading.Event)  # 本协议的 tts 动作全部结束（或被抢占）
+    queued: bool = False                       # 排在更高优先级的协议之后等待
+    cancelled: threading.Event = field(default_factory=threading.Event)  # 被抢占：线程池里还没调到硬件的调用跳过
+    first_start_ms: Optional[float] = None     # 提交 -> 第一个动作启动
+    reports: List[ActionReport] = field(default_factory=list)
+    future: Optional[Future] = None
+    task: Optional[asyncio.Task] = None
+
+    def wait(self, timeout: Optional[float] = None) -> List[ActionReport]:
+        """等待整个协议执行完（或被抢占）。"""
+        if self.future is not None:
+            self.future.result(timeout=timeout)
+        return self.reports
+
+    def wait_tts(self, timeout: Optional[float] = None) -> bool:
+        """只等本协议的语音播完；led / screen 仍在后台按各自时长执行。"""
+        return self.tts_done.wait(timeout)
+
+
+def action_duration_ms(a: Dict[str, Any]) -> float:
+    """led/screen 的持续时间；tts 的时长由硬件播报决定（返回 0）。"""
+    t = a.get("type")
+    if t == "screen":
+        return float(a.get("ms", 2000))
+    if t == "led":
+        p = a.get("pattern", {}) or {}
+        if "ms" in p:
+            return float(p["ms"])
+        if "inhale_ms" in p or "exhale_ms" in p:
+            cycle = float(p.get("inhale_ms", 0)) + float(p.get("exhale_ms", 0))
+            return cycle * float(p.get("cycles", 1))
+        return float(a.get("ms", 0))
+    return 0.0
+
+
+class ActionScheduler:
+    def __init__(self, hw: HardwareIface, max_workers: int = 4):
+        self.hw = hw
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hw")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[ScheduledRun] = None
+        self._waiting: List[ScheduledRun] = []      # 等待当前协议结束的协议（只在事件循环线程里读写）
+        self._start_lock = threading.Lock()
+        self._mark_lock = threading.Lock()
+
+    # -----------------------------
+    # 后台事件循环
+    # -----------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def runner():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=runner, name="action-scheduler", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def close(self):
+        if self._loop is not None:
+            # 还在后台执行的 led / screen：取消（走抢占收尾：led_off / screen_clear）后再停循环
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result(timeout=2.0)
+            except Exception:
+                pass
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2.0)
+            self._loop = None
+        self._pool.shutdown(wait=False)
+
+    @staticmethod
+    async def _cancel_all():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -----------------------------
+    # 对外接口
+    # -----------------------------
+    def submit(self, protocol: Dict[str, Any], t0: Optional[float] = None) -> ScheduledRun:
+        """提交一个协议（线程安全、立即返回）。t0：事件到达时刻（perf_counter），用于计算启动延迟。"""
+        run = ScheduledRun(
+            protocol_id=str(protocol.get("protocol_id", "")),
+            priority=float(protocol.get("priority", 0)),
+            t0=time.perf_counter() if t0 is None else t0,
+        )
+        loop = self._ensure_loop()
+        run.future = asyncio.run_coroutine_threadsafe(self.play(protocol, run), loop)
+        return run
+
+    def run(self, protocol: Dict[str, Any], t0: Optional[float] = None) -> List[ActionReport]:
+        """同步执行：提交并等待协议结束。"""
+        return self.submit(protocol, t0=t0).wait()
+
+    async def play(self, protocol: Dict[str, Any], run: ScheduledRun) -> List[ActionReport]:
+        run.task = asyncio.current_task()
+        tasks: List[asyncio.Future] = []
+        try:
+            # 抢占 / 排队：每次醒来都重新判断，同时等待的更高优先级协议先执行
+            self._waiting.append(run)
+            while True:
+                cur = self._current
+                if cur is not None and cur is not run and not cur.task.done():
+                    if run.priority >= cur.priority:
+                        cur.task.cancel()
+                    else:
+                        run.queued = True
+                        run.decided.set()
+                    await asyncio.wait({cur.task})
+                    continue
+                ahead = [w for w in self._waiting if w.priority > run.priority]
+                if not ahead:
+                    break
+                run.queued = True
+                run.decided.set()
+                await asyncio.wait({w.task for w in ahead})
+            self._waiting.remove(run)
+            self._current = run
+
+            actions = [a for a in protocol.get("actions", []) if isinstance(a, dict)]
+            tasks = [asyncio.ensure_future(self._run_action(run, i, a)) for i, a in enumerate(actions)]
+            tts_tasks = [t for t, a in zip(tasks, actions) if a.get("type") == "tts"]
+            if tts_tasks:
+                asyncio.ensure_future(self._signal_tts_done(run, tts_tasks))
+            else:
+                run.tts_done.set()
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # 被更高优先级协议抢占：取消本协议所有动作，正常返回报告
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if run in self._waiting:
+                self._waiting.remove(run)
+            if self._current is run:
+                self._current = None
+            run.started.set()
+            run.decided.set()
+            run.tts_done.set()
+        return run.reports
+
+    @staticmethod
+    async def _signal_tts_done(run: ScheduledRun, tts_tasks: List[asyncio.Future]):
+        await asyncio.wait(tts_tasks)
+        run.tts_done.set()
+
+    # -----------------------------
+    # 单个动作
+    # -----------------------------
+    async def _call(self, fn, *args, on_start=None, cancelled: Optional[threading.Event] = None, **kwargs):
+        """
+        在线程池里执行硬件调用；on_start(now) 在调用真正开始执行时（而不是提交给线程池时）回调。
+        cancelled 已置位时不再调用硬件：线程已经取走、还没调到硬件的任务，协程被取消后撤不回来。
+        """
+        def job():
+            if on_start is not None:
+                on_start(time.perf_counter())
+            if cancelled is not None and cancelled.is_set():
+                return None
+            return fn(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, job)
+
+    def _mark_start(self, run: ScheduledRun, report: ActionReport, now: float):
+        # 在线程池线程里调用：同一协议的多个动作可能同时开始
+        with self._mark_lock:
+            report.start_latency_ms = (now - run.t0) * 1000.0 - report.delay_ms
+            if run.first_start_ms is None:
+                run.first_start_ms = (now - run.t0) * 1000.0
+                run.started.set()
+                run.decided.set()
+
+    async def _run_action(self, run: ScheduledRun, index: int, a: Dict[str, Any]):
+        t = a.get("type")
+        if t not in ("tts", "led", "screen"):
+            return
+
+        delay_ms = float(a.get("delay_ms", 0) or 0)
+        report = ActionReport(protocol_id=run.protocol_id, index=index, type=t,
+                              delay_ms=delay_ms, start_latency_ms=0.0)
+        run.reports.append(report)
+
+        if delay_ms > 0:
+            wait_s = run.t0 + delay_ms / 1000.0 - time.perf_counter()
+            try:
+                if wait_s > 0:
+                    await asyncio.sleep(wait_s)
+            except asyncio.CancelledError:
+                report.cancelled = True
+                raise
+
+        started = time.perf_counter()
+
+        def on_start(now: float):
+            self._mark_start(run, report, now)
+
+        try:
+            if t == "tts":
+                await self._call(self.hw.tts, a.get("text", ""), style=a.get("style"), on_start=on_start,
+                                 cancelled=run.cancelled)
+            elif t == "led":
+                await self._call(self.hw.led, a.get("pattern", {}), on_start=on_start, cancelled=run.cancelled)
+                await asyncio.sleep(action_duration_ms(a) / 1000.0)
+                await self._call(self.hw.led_off)
+            elif t == "screen":
+                ms = int(a.get("ms", 2000))
+                await self._call(self.hw.screen, a.get("text", ""), ms=ms, on_start=on_start,
+                                 cancelled=run.cancelled)
+                await asyncio.sleep(action_duration_ms(a) / 1000.0)
+                await self._call(self.hw.screen_clear)
+        except asyncio.CancelledError:
+            report.cancelled = True
+            run.cancelled.set()
+            # 被抢占：立即收尾（不等 executor 线程里的旧调用结束）
+            if t == "tts":
+                self.hw.stop_tts()
+            elif t == "led":
+                self.hw.led_off()
+            elif t == "screen":
+                self.hw.screen_clear()
+            raise
+        finally:
+            report.duration_ms = (time.perf_counter() - started) * 1000.0
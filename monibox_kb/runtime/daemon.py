@@ -0,0 +1,296 @@
+"""
+monibox_kb/runtime/daemon.py
+
+用途
+-----
+常驻运行时守护进程：启动时加载一次 Whisper / embedding / GGUF / rag.db，之后每轮只付处理时间。
+demo 每次运行都从头加载全部模型（加载耗时远大于处理一句话），处理一句就退出；常驻后每轮延迟不再包含加载。
+
+接口（本机 HTTP，默认 127.0.0.1:8765，只监听回环地址）
+- GET  /health                                        -> {"ok", "startup", "turns", "busy", "asr", "metrics"}
+- POST /handle  {"text", "events", "auto_top_tags", "interrupt"}   -> NDJSON 流
+- POST /event   {"events"}                            -> NDJSON 流（事件快速通道，不排队）
+- POST /asr?auto_top_tags=2&interrupt=1  body = 16-bit PCM wav  -> NDJSON 流（流式识别 + 提前协议）
+
+NDJSON 每行一个对象（按发生顺序，边处理边推送）：
+  {"type": "start", "wait_ms"}                       排到本轮（wait_ms = 排队时间）
+  {"type": "protocol", "protocol_id", "text", ...}   协议下发
+  {"type": "sentence", "text"}                       回复的一句（已过护栏，与播报一致）
+  {"type": "fallback", "step", "at_ms"}              降级阶梯触发（见 runtime/deadline.py）
+  {"type": "done", "reply", "queue_ms", "turn_ms"}   本轮结束
+  {"type": "error", "error"}
+
+说明
+----
+- 只有一个扬声器、一个 LLM：话语请求串行处理（排队）；事件请求不排队（handle_event 线程安全，会打断正在生成的回复）
+- interrupt=true：先作废正在进行的 LLM 轮次再排队（本机麦克风的新话语用）；压测客户端不带，彼此不打断
+- 客户端：python -m monibox_kb.runtime.daemon_client；并发压测：python -m scripts.bench_daemon_load
+- /health 的 startup 是冷启动分解（ms）：import_ms（导入会话编排代码）、session（MoniSession 各阶段：
+  rag / guard / tts / llm / prefix / cache）、embed_load_ms（导入 sentence_transformers + 加载模型）、
+  embed_warmup_ms（第一次推理）、asr_ms、total_ms。重量级库都在这些阶段里才导入，import 阶段不含
+
+运行：
+  python -m monibox_kb.runtime.daemon
+  python -m monibox_kb.runtime.daemon --port 8765 --no_tts --no_asr
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from monibox_kb.config import settings
+
+if TYPE_CHECKING:
+    from monibox_kb.runtime.session import MoniSession
+
+
+Emit = Callable[[Dict[str, Any]], None]
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class MoniDaemon:
+    """持有常驻的会话 / ASR；HTTP 层之外也可直接调用（测试、嵌入其它进程）。"""
+
+    def __init__(self, session: MoniSession, asr: Any = None, startup: Optional[Dict[str, Any]] = None):
+        self.session = session
+        self.asr = asr
+        self.startup = startup or {}
+        self.turns = 0
+        self.busy = False
+        self._lock = threading.Lock()
+
+    def health(self) -> Dict[str, Any]:
+        return {"ok": True, "startup": self.startup, "turns": self.turns, "busy": self.busy,
+                "asr": self.asr is not None, "metrics": self.session.metrics.snapshot()}
+
+    def _run_turn(self, fn: Callable[[], str], emit: Emit, interrupt: bool = False):
+        t_arrive = time.perf_counter()
+        if interrupt and self.session.interrupt():
+            print("\n[LLM] interrupted by new request")
+        with self._lock:
+            t_start = time.perf_counter()
+            self.busy = True
+            emit({"type": "start", "wait_ms": round((t_start - t_arrive) * 1000.0, 1)})
+            try:
+                with self.session.listen(emit):
+                    reply = fn()
+            except Exception as e:
+                emit({"type": "error", "error": f"{type(e).__name__}: {e}"})
+                return
+            finally:
+                self.turns += 1
+                self.busy = False
+        t_end = time.perf_counter()
+        emit({"type": "done", "reply": reply,
+              "queue_ms": round((t_start - t_arrive) * 1000.0, 1),
+              "turn_ms": round((t_end - t_start) * 1000.0, 1)})
+
+    def handle(self, text: str, events: List[str], emit: Emit, auto_top_tags: int = 2, interrupt: bool = False):
+        self._run_turn(lambda: self.session.handle(text, events=events, auto_top_tags=auto_top_tags),
+                       emit, interrupt)
+
+    def handle_wav(self, wav: bytes, emit: Emit, auto_top_tags: int = 2, interrupt: bool = False):
+        if self.asr is None:
+            emit({"type": "error", "error": "ASR 未加载（守护进程以 --no_asr 启动或找不到 WHISPER_MODEL_DIR）"})
+            return
+        from monibox_kb.audio.stream_capture import load_wav
+        audio = load_wav(io.BytesIO(wav), sample_rate=self.asr.SAMPLE_RATE)
+        probe_s = float(os.getenv("ASR_PROBE_S", "0"))
+        self._run_turn(lambda: self.session.handle_asr(self.asr.transcribe_stream(audio, probe_s=probe_s),
+                                                       auto_top_tags=auto_top_tags),
+                       emit, interrupt)
+
+    def handle_event(self, events: List[str], emit: Emit):
+        t0 = time.perf_counter()
+        with self.session.listen(emit):
+            reply = self.session.handle_event(events, t0=t0)
+        emit({"type": "done", "reply": reply, "queue_ms": 0.0,
+              "turn_ms": round((time.perf_counter() - t0) * 1000.0, 1)})
+
+    def close(self):
+        self.session.close()
+
+
+# -----------------------------
+# HTTP
+# -----------------------------
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, moni: MoniDaemon):
+        super().__init__(addr, _Handler)
+        self.moni = moni
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _Server
+
+    def log_message(self, fmt: str, *args: Any):
+        pass
+
+    def _send_json(self, code: int, obj: Dict[str, Any]):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n > 0 else b""
+
+    def _stream(self) -> Emit:
+        """开始 NDJSON 响应（HTTP/1.0，写完即关连接，不需要 Content-Length）。客户端断开后静默丢弃。"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        gone = []
+
+        def emit(obj: Dict[str, Any]):
+            if gone:
+                return
+            try:
+                self.wfile.write((json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionError):
+                gone.append(True)
+        return emit
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, self.server.moni.health())
+        else:
+            self._send_json(404, {"ok": False, "error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        moni = self.server.moni
+        if url.path not in ("/asr", "/handle", "/event"):
+            self._send_json(404, {"ok": False, "error": "not found"})
+            return
+        # 先解析、校验全部参数（开始推送 NDJSON 之前），格式不对回 400，不让处理线程抛异常断连
+        try:
+            if url.path == "/asr":
+                q = parse_qs(url.query)
+                auto_top_tags = int(q.get("auto_top_tags", ["2"])[0])
+                interrupt = q.get("interrupt", ["0"])[0] in ("1", "true")
+                wav = self._body()
+            else:
+                req = json.loads(self._body() or b"{}")
+                if not isinstance(req, dict):
+                    raise ValueError("body must be a JSON object")
+                events = req.get("events") or []
+                if not isinstance(events, list):
+                    raise ValueError("events must be a list")
+                events = [str(e) for e in events]
+                text = str(req.get("text") or "")
+                auto_top_tags = int(req.get("auto_top_tags", 2))
+                interrupt = bool(req.get("interrupt", False))
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"ok": False, "error": f"bad request: {e}"})
+            return
+
+        if url.path == "/asr":
+            moni.handle_wav(wav, self._stream(), auto_top_tags=auto_top_tags, interrupt=interrupt)
+        elif url.path == "/handle":
+            moni.handle(text, events, self._stream(), auto_top_tags=auto_top_tags, interrupt=interrupt)
+        else:
+            moni.handle_event(events, self._stream())
+
+
+# -----------------------------
+# 启动
+# -----------------------------
+def build_daemon(tts_enabled: bool = True, with_asr: bool = True, extractive: bool = False) -> MoniDaemon:
+    """加载全部常驻资源并记录各部分冷启动耗时（ms）。extractive=True 时不加载 LLM。"""
+    startup: Dict[str, Any] = {}
+    t_start = time.perf_counter()
+    llm_path = os.getenv("LLM_GGUF_PATH", "")
+    extractive = extractive or os.getenv("ANSWER_MODE", "llm").strip().lower() == "extractive"
+    if not llm_path and not extractive:
+        raise RuntimeError("请在 .env 中设置 LLM_GGUF_PATH（或用 --extractive 不加载 LLM）")
+
+    # 会话编排代码在这里才导入，单独计时（重量级三方库不在其中，见 scripts/bench_import_time）
+    t = time.perf_counter()
+    from monibox_kb.runtime.session import MoniSession, SessionConfig
+    startup["import_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+
+    t = time.perf_counter()
+    session = MoniSession(settings.rag_db_path, SessionConfig(
+        llm_path=llm_path,
+        llm_ctx=int(os.getenv("LLM_CTX", "2048")),
+        llm_threads=int(os.getenv("LLM_THREADS", "6")),
+        llm_gpu_layers=int(os.getenv("LLM_GPU_LAYERS", "0")),
+        tts_enabled=tts_enabled,
+        extractive=extractive,
+    ))
+    startup["session_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+    startup["session"] = dict(session.startup)
+
+    # embedding 模型（连带 torch）第一次用到时才加载；第一次推理还有额外初始化开销：启动时都先做掉
+    from monibox_kb.embedding import get_model
+    t = time.perf_counter()
+    get_model()
+    startup["embed_load_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+    t = time.perf_counter()
+    session.rag.embed_query("你好")
+    startup["embed_warmup_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+
+    asr = None
+    model_dir = os.getenv("WHISPER_MODEL_DIR", "models/asr/faster-whisper-small")
+    if with_asr and Path(model_dir).exists():
+        from monibox_kb.asr.faster_whisper_asr import FasterWhisperASR, WhisperASRConfig
+        t = time.perf_counter()
+        asr = FasterWhisperASR(WhisperASRConfig(
+            model_dir=model_dir,
+            device=os.getenv("WHISPER_DEVICE", "cpu"),
+            compute_type=os.getenv("WHISPER_COMPUTE_TYPE", "int8"),
+            language=os.getenv("WHISPER_LANGUAGE", "zh"),
+        ))
+        startup["asr_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+    elif with_asr:
+        print(f"[DAEMON] 找不到 ASR 模型目录 {model_dir}：/asr 不可用")
+    startup["total_ms"] = round((time.perf_counter() - t_start) * 1000.0, 1)
+    return MoniDaemon(session, asr, startup)
+
+
+def serve(moni: MoniDaemon, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    srv = _Server((host, port), moni)
+    print(f"[DAEMON] listening on http://{host}:{port}  startup={moni.startup}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        moni.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=os.getenv("DAEMON_HOST", DEFAULT_HOST))
+    ap.add_argument("--port", type=int, default=int(os.getenv("DAEMON_PORT", str(DEFAULT_PORT))))
+    ap.add_argument("--no_tts", action="store_true", help="只推送文本，不播放语音")
+    ap.add_argument("--no_asr", action="store_true", help="不加载 Whisper（只接文本 / 事件）")
+    ap.add_argument("--extractive", action="store_true", help="不加载 LLM，抽取式回复（省电）")
+    args = ap.parse_args()
+
+    serve(build_daemon(tts_enabled=not args.no_tts, with_asr=not args.no_asr, extractive=args.extractive),
+          args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
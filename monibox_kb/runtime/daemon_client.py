@@ -0,0 +1,114 @@
+"""
+monibox_kb/runtime/daemon_client.py
+
+用途
+-----
+守护进程（runtime/daemon.py）的轻量客户端：只用标准库，不加载任何模型，启动即可发请求。
+
+- DaemonClient.handle(text, events) / event(events) / asr(wav_path)：逐行 yield 守护进程推送的 NDJSON 对象
+- DaemonClient.health()：启动耗时、已处理轮数
+
+运行：
+  python -m monibox_kb.runtime.daemon_client --text "我腿被压住了"
+  python -m monibox_kb.runtime.daemon_client --events imu_strong_shake
+  python -m monibox_kb.runtime.daemon_client --wav fixtures/asr/余震_01.wav
+  python -m monibox_kb.runtime.daemon_client --health
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class DaemonClient:
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, timeout: float = 120.0):
+        self.host = host or os.getenv("DAEMON_HOST", DEFAULT_HOST)
+        self.port = port or int(os.getenv("DAEMON_PORT", str(DEFAULT_PORT)))
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: bytes = b"", content_type: str = "application/json"):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        conn.request(method, path, body=body or None, headers={"Content-Type": content_type})
+        return conn, conn.getresponse()
+
+    def _lines(self, path: str, body: bytes, content_type: str = "application/json") -> Iterator[Dict[str, Any]]:
+        conn, resp = self._request("POST", path, body, content_type)
+        try:
+            if resp.status != 200:
+                raise RuntimeError(f"daemon {path} -> HTTP {resp.status}: {resp.read().decode('utf-8', 'replace')}")
+            for line in resp:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def health(self) -> Dict[str, Any]:
+        conn, resp = self._request("GET", "/health")
+        try:
+            return json.loads(resp.read())
+        finally:
+            conn.close()
+
+    def handle(self, text: str, events: Optional[List[str]] = None, auto_top_tags: int = 2,
+               interrupt: bool = False) -> Iterator[Dict[str, Any]]:
+        req = {"text": text, "events": events or [], "auto_top_tags": auto_top_tags, "interrupt": interrupt}
+        return self._lines("/handle", json.dumps(req, ensure_ascii=False).encode("utf-8"))
+
+    def event(self, events: List[str]) -> Iterator[Dict[str, Any]]:
+        return self._lines("/event", json.dumps({"events": events}).encode("utf-8"))
+
+    def asr(self, wav_path: str, auto_top_tags: int = 2, interrupt: bool = False) -> Iterator[Dict[str, Any]]:
+        path = f"/asr?auto_top_tags={auto_top_tags}&interrupt={int(interrupt)}"
+        return self._lines(path, Path(wav_path).read_bytes(), "audio/wav")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--text", default="")
+    ap.add_argument("--events", default="", help="逗号分隔，如 imu_strong_shake")
+    ap.add_argument("--wav", default="", help="16-bit PCM wav，交给守护进程流式识别")
+    ap.add_argument("--auto_top_tags", type=int, default=2)
+    ap.add_argument("--interrupt", action="store_true", help="打断正在进行的回复")
+    ap.add_argument("--health", action="store_true")
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--port", type=int, default=None)
+    args = ap.parse_args()
+
+    client = DaemonClient(args.host, args.port)
+    if args.health:
+        print(json.dumps(client.health(), ensure_ascii=False, indent=2))
+        return
+
+    events = [e.strip() for e in args.events.split(",") if e.strip()]
+    if args.wav:
+        stream = client.asr(args.wav, args.auto_top_tags, args.interrupt)
+    elif args.text.strip():
+        stream = client.handle(args.text.strip(), events, args.auto_top_tags, args.interrupt)
+    elif events:
+        stream = client.event(events)
+    else:
+        raise RuntimeError("需要 --text / --events / --wav 之一")
+
+    for msg in stream:
+        kind = msg.get("type")
+        if kind == "protocol":
+            print(f"[PROTOCOL] {msg.get('protocol_id')} {msg.get('text')}")
+        elif kind == "sentence":
+            print(f"[SAY] {msg.get('text')}")
+        elif kind == "done":
+            print(f"[DONE] queue={msg.get('queue_ms')}ms turn={msg.get('turn_ms')}ms")
+        elif kind == "error":
+            print(f"[ERROR] {msg.get('error')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+monibox_kb/runtime/deadline.py
+
+用途
+-----
+每轮延迟预算的降级阶梯：板子慢 / 降频时 LLM 可能远超可接受的响应时间，受困者不能一直等。
+
+  t0 ────── ttft 档（budget * ttft_share）────── total 档（budget * total_share）────── budget
+            还没播出第一句：放弃 LLM，改播         还在生成：停止生成；已播过句子就到此为止，
+            检索要点拼成的抽取式回复               一句都没播则改播抽取式回复
+
+- 两档都在预算到期之前触发，留出余量给抽取式回复的播报启动
+- 阈值可配置：TURN_BUDGET_MS（0 关闭）、LADDER_TTFT_SHARE、LADDER_TOTAL_SHARE；handle(budget_ms=) 可逐轮覆盖
+- 每次降级记入 SessionMetrics.fallback(step, ...)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+STEP_TTFT = "ttft"
+STEP_TOTAL = "total"
+
+
+@dataclass
+class DeadlineLadder:
+    budget_ms: float = 8000.0
+    ttft_share: float = 0.5
+    total_share: float = 0.85
+
+    @classmethod
+    def from_env(cls) -> "DeadlineLadder":
+        return cls(
+            budget_ms=float(os.getenv("TURN_BUDGET_MS", "8000")),
+            ttft_share=float(os.getenv("LADDER_TTFT_SHARE", "0.5")),
+            total_share=float(os.getenv("LADDER_TOTAL_SHARE", "0.85")),
+        )
+
+    def steps(self, budget_ms: Optional[float] = None) -> List[Tuple[str, float]]:
+        """[(档位, 相对 t0 的触发时刻（秒）)]；预算 <= 0 时不降级。"""
+        b = self.budget_ms if budget_ms is None else budget_ms
+        if b <= 0:
+            return []
+        return [(STEP_TTFT, b * self.ttft_share / 1000.0), (STEP_TOTAL, b * self.total_share / 1000.0)]
@@ -0,0 +1,125 @@
+"""
+monibox_kb/runtime/event_path.py
+
+用途
+-----
+事件快速通道：传感器事件（如 imu_strong_shake）直接进 ProtocolEngine，命中即下发动作，
+不等待 ASR / 路由 / RAG / LLM。
+
+- 没有用户文本的事件：直接匹配（routed_tags 为空）
+- ASR 或 LLM 运行中到达的事件：由其它线程调用 fire()，不经过会话主流程
+- 每次命中都记录“事件到达 -> 第一个动作下发”的耗时（目标 < EVENT_BUDGET_MS，默认 50ms）
+- 动作经 ActionScheduler 并发执行；更高优先级的协议可以抢占正在执行的协议
+- run(wait=True) 只等协议的语音播完（会话据此保证协议句在回复之前说完），led / screen 的时长由调度器收尾；
+  排在更高优先级协议之后的协议立即返回，不等前一个协议结束
+- guard 可以是 GuardVerdicts：协议 tts 文本直接用 build 期预计算的判定
+
+用 MockHardware 度量：python -m scripts.bench_event_latency
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from monibox_kb.runtime.action_scheduler import ActionReport, ActionScheduler
+from monibox_kb.runtime.guard_verdicts import GuardVerdicts
+from monibox_kb.runtime.hardware_iface import HardwareIface
+from monibox_kb.runtime.protocol_engine import ProtocolEngine
+from monibox_kb.runtime.safety_guard import SafetyGuard
+from monibox_kb.text_clean import normalize_for_tts, limit_chars
+
+
+@dataclass
+class FastPathHit:
+    protocol_id: str
+    name: str
+    text: str                 # 实际播报的文本（已过护栏，<= max_chars）
+    first_action_ms: float    # 事件到达 -> 第一个动作下发
+    over_budget: bool
+    reports: List[ActionReport] = field(default_factory=list)
+
+
+class EventFastPath:
+    def __init__(self,
+                 prot: ProtocolEngine,
+                 guard: Union[SafetyGuard, GuardVerdicts],
+                 hw: HardwareIface,
+                 max_chars: int = 60,
+                 budget_ms: Optional[float] = None,
+                 scheduler: Optional[ActionScheduler] = None):
+        self.prot = prot
+        self.guard = guard
+        self.hw = hw
+        self.scheduler = scheduler or ActionScheduler(hw)
+        self.max_chars = max_chars
+        self.budget_ms = float(budget_ms if budget_ms is not None else os.getenv("EVENT_BUDGET_MS", "50"))
+        self.last: Optional[FastPathHit] = None
+
+    def fire(self,
+             events: List[str],
+             text: str = "",
+             tags: Optional[List[str]] = None,
+             t0: Optional[float] = None,
+             wait: bool = True) -> Optional[FastPathHit]:
+        """匹配并下发；t0 为事件到达时刻（perf_counter），缺省为调用时刻。"""
+        t0 = time.perf_counter() if t0 is None else t0
+        hit = self.prot.match(text or "", tags or [], events or [])
+        if not hit:
+            return None
+        return self.run(hit, t0, wait=wait)
+
+    def compose_tts(self, hit: Dict[str, Any]) -> str:
+        """协议内所有 tts 动作逐条过护栏，合并为一句（<= max_chars）。"""
+        out_lines = []
+        for a in hit.get("actions", []):
+            if a.get("type") == "tts":
+                gr = self.guard.check(a.get("text", ""))
+                out_lines.append(gr.safe_text)
+        final = normalize_for_tts("\n".join([x for x in out_lines if x]).strip())
+        return limit_chars(final, self.max_chars)
+
+    def prepare(self, hit: Dict[str, Any]) -> Dict[str, Any]:
+        """把协议转成可下发的动作序列：多条 tts 合并为一句、过护栏，放在第一条 tts 的位置。"""
+        final = self.compose_tts(hit)
+        actions = []
+        spoke = False
+        for a in hit.get("actions", []):
+            if a.get("type") == "tts":
+                if spoke or not final:
+                    continue
+                actions.append(dict(a, text=final))
+                spoke = True
+            else:
+                actions.append(a)
+        return dict(hit, actions=actions)
+
+    def run(self, hit: Dict[str, Any], t0: float, wait: bool = True) -> FastPathHit:
+        """
+        下发协议动作（ActionScheduler 并发执行 tts/led/screen）。
+        wait=True：等本协议的语音播完（不等 led / screen 的持续时间）；wait=False：第一个动作启动即返回。
+        """
+        prepared = self.prepare(hit)
+        tts = [a["text"] for a in prepared["actions"] if a.get("type") == "tts"]
+
+        run = self.scheduler.submit(prepared, t0=t0)
+        # 第一个动作开始执行，或确定要排在正在执行的更高优先级协议之后（排队时不等）
+        run.decided.wait(timeout=1.0)
+        if wait and not run.queued:
+            run.wait_tts()
+
+        first_ms = run.first_start_ms
+        if first_ms is None:
+            first_ms = (time.perf_counter() - t0) * 1000.0
+        res = FastPathHit(
+            protocol_id=str(hit.get("protocol_id", "")),
+            name=str(hit.get("name", "")),
+            text=tts[0] if tts else "",
+            first_action_ms=first_ms,
+            over_budget=first_ms > self.budget_ms,
+            reports=run.reports,
+        )
+        self.last = res
+        return res
@@ -0,0 +1,109 @@
+"""
+monibox_kb/runtime/extractive.py
+
+用途
+-----
+不经 LLM 的抽取式回复：直接用 rerank 后的检索要点原文拼出播报文本，逐条过护栏，<= 60 字。
+
+- compose_reply(results, guard, group_texts)：最佳 chunk + 一句澄清问题
+  澄清问题优先取最佳 chunk 所在 QA 组（同一条 QA 切出的片段）里的问句，其次取其它命中片段里的问句；
+  放不下问句时改为接第二条要点（extractive_reply）
+- extractive_reply(texts, guard)：按 rerank 顺序取要点原文，整句拼接到 60 字以内
+- 检索为空 / 全部被护栏拦下时给一句通用安全动作（GENERIC_REPLY）
+- 拼好的整句最后再整体过一次护栏（跨句规则，如一条的剂量单位 + 另一条的用药语境），用其 safe_text，再截到 60 字
+
+用在两处：
+1) 抽取式模式（ANSWER_MODE=extractive）：完全不加载 GGUF，长时间待机时省下 LLM 的内存与 CPU；
+   也是端到端延迟的参考下限
+2) 降级阶梯（runtime/deadline.py）：LLM 超时时兜底
+"""
+
+from __future__ import annotations
+
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from monibox_kb.runtime.safety_guard import SafetyGuard
+from monibox_kb.text_clean import limit_chars, normalize_for_tts
+
+
+GENERIC_REPLY = "我在这里陪你。先护住头部，慢慢呼吸，节省体力，等待救援。"
+
+QUESTION_END = ("？", "?")
+
+
+def is_question(text: str) -> bool:
+    return normalize_for_tts(text).endswith(QUESTION_END)
+
+
+def _safe(guard: SafetyGuard, text: str) -> Optional[str]:
+    """过护栏：block 返回 None，rewrite 返回改写后的文本。"""
+    s = normalize_for_tts(text)
+    if not s:
+        return None
+    gr = guard.check(s)
+    if gr.level == "block":
+        return None
+    return normalize_for_tts(gr.safe_text) or None
+
+
+def _final(guard: SafetyGuard, text: str, max_chars: int) -> str:
+    """拼接后的整句再过一次护栏：逐条通过不代表拼起来也通过。"""
+    gr = guard.check(normalize_for_tts(text))
+    return limit_chars(normalize_for_tts(gr.safe_text), max_chars)
+
+
+def extractive_reply(texts: Sequence[str], guard: SafetyGuard, max_chars: int = 60, max_items: int = 2) -> str:
+    """
+    texts：检索要点原文（rerank 顺序）。block 的跳过；第一条放不下时截断，之后的只在整条放得下时追加。
+    """
+    out = ""
+    used = 0
+    for t in texts:
+        if used >= max_items:
+            break
+        s = _safe(guard, t)
+        if s is None:
+            continue
+        if not out:
+            out = limit_chars(s, max_chars)
+        elif len(out) + len(s) <= max_chars:
+            out += s
+        else:
+            continue
+        used += 1
+    return _final(guard, out or GENERIC_REPLY, max_chars)
+
+
+def compose_reply(results: Sequence, guard: SafetyGuard,
+                  group_texts: Optional[Callable[[str], List[str]]] = None,
+                  max_chars: int = 60) -> Tuple[str, str]:
+    """
+    results：SearchResult（有 text / group_id / final_distance）。
+    返回 (播报文本, 澄清问句)；问句已包含在播报文本里（" " 分隔，与 LLM 路径 text + ask 的拼法一致），单独返回便于调试。
+    """
+    ranked = sorted(results, key=lambda r: r.final_distance)
+    best = None
+    text = ""
+    for r in ranked:
+        if is_question(r.text):
+            continue
+        s = _safe(guard, r.text)
+        if s is not None:
+            best, text = r, limit_chars(s, max_chars)
+            break
+    if best is None:
+        return extractive_reply([r.text for r in ranked], guard, max_chars), ""
+
+    cands: List[str] = []
+    if group_texts is not None and best.group_id:
+        cands += [t for t in group_texts(best.group_id) if is_question(t)]
+    cands += [r.text for r in ranked if r is not best and is_question(r.text)]
+
+    for q in dict.fromkeys(normalize_for_tts(c) for c in cands):
+        ask = _safe(guard, q)
+        if ask and ask not in text and len(text) + 1 + len(ask) <= max_chars:
+            final = _final(guard, f"{text} {ask}", max_chars)
+            return final, (ask if final.endswith(ask) else "")
+
+    rest = [r.text for r in ranked if r is not best and not is_question(r.text)]
+    return extractive_reply([text] + rest, guard, max_chars), ""
@@ -0,0 +1,161 @@
+"""
+monibox_kb/runtime/guard_verdicts.py
+
+用途
+-----
+预计算的安全护栏判定：build_pack 对每个 chunk 与协议 tts 文本跑一次 SafetyGuard，
+把 level / reasons / safe_text 连同规则版本（SafetyGuard.rules_version）写进 rag.db 的 guard_verdicts 表。
+
+- 键：内容指纹（sha256_fp，与 chunks.fingerprint 一致）；同一指纹的文本不变，判定也不变
+- 运行期按指纹读取；规则版本不一致（改了护栏规则还没重新 build）或查不到时，现场 check 并在进程内缓存
+- 审计脚本（auto_flag_unsafe_chunks）只重查版本不一致 / 缺失的指纹，结果写回本表
+
+说明
+----
+表不存在（旧库）时等价于“全部缺失”，行为与直接调用 SafetyGuard.check 一致。
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from monibox_kb.dedup import sha256_fp
+from monibox_kb.runtime.safety_guard import GuardResult, SafetyGuard
+
+
+GUARD_VERDICTS_DDL = """
+CREATE TABLE IF NOT EXISTS guard_verdicts (
+  fingerprint TEXT PRIMARY KEY,      -- sha256:...（chunks.fingerprint / 协议文本指纹）
+  source TEXT NOT NULL,              -- chunk / protocol
+  rules_version TEXT NOT NULL,       -- SafetyGuard.rules_version
+  level TEXT NOT NULL,               -- allow / rewrite / block
+  reasons TEXT NOT NULL,             -- JSON 数组
+  safe_text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_guard_verdicts_version ON guard_verdicts(rules_version);
+"""
+
+# (fingerprint, source, rules_version, level, reasons_json, safe_text)
+VerdictRow = Tuple[str, str, str, str, str, str]
+
+
+def ensure_table(conn: sqlite3.Connection) -> None:
+    conn.executescript(GUARD_VERDICTS_DDL)
+
+
+def protocol_tts_texts(protocols: Iterable[dict]) -> List[str]:
+    """协议里会过护栏的文本（tts 动作）。"""
+    out = []
+    for p in protocols:
+        for a in p.get("actions", []):
+            if isinstance(a, dict) and a.get("type") == "tts" and (a.get("text") or "").strip():
+                out.append(a["text"])
+    return out
+
+
+def compute_rows(guard: SafetyGuard,
+                 items: Sequence[Tuple[str, str]],
+                 source: str,
+                 workers: Optional[int] = None) -> List[VerdictRow]:
+    """items: [(fingerprint, text)]；同一指纹只判定一次。"""
+    uniq: Dict[str, str] = {}
+    for fp, text in items:
+        uniq.setdefault(fp, text)
+    fps = list(uniq)
+    results = guard.check_many([uniq[fp] for fp in fps], workers=workers)
+    return [
+        (fp, source, guard.rules_version, r.level, json.dumps(r.reasons, ensure_ascii=False), r.safe_text)
+        for fp, r in zip(fps, results)
+    ]
+
+
+def write_rows(conn: sqlite3.Connection, rows: Sequence[VerdictRow]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO guard_verdicts(fingerprint, source, rules_version, level, reasons, safe_text)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(fingerprint) DO UPDATE SET
+          source=excluded.source, rules_version=excluded.rules_version,
+          level=excluded.level, reasons=excluded.reasons, safe_text=excluded.safe_text
+        """,
+        rows,
+    )
+
+
+def row_to_result(level: str, reasons: str, safe_text: str) -> GuardResult:
+    return GuardResult(level=level, reasons=list(json.loads(reasons or "[]")), safe_text=safe_text)
+
+
+class GuardVerdicts:
+    """
+    运行期读取预计算判定（接口与 SafetyGuard.check 一致，可直接替换传给 EventFastPath 等）：
+    - check(text, fingerprint=None)：指纹缺省时按 sha256_fp(text) 计算
+    - 启动时预读 source=protocol 的判定（条数少，事件快速通道不碰数据库）
+    - chunk 判定按需读取，进程内缓存
+    """
+
+    def __init__(self, guard: SafetyGuard, db_path: Optional[str] = None):
+        self.guard = guard
+        self.db_path = db_path
+        self.block_fallback = guard.block_fallback
+        self._cache: Dict[str, GuardResult] = {}
+        self.hits = 0
+        self.misses = 0
+        self._has_table = self._load(source="protocol")
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path or not Path(self.db_path).exists():
+            return None
+        return sqlite3.connect(self.db_path)
+
+    def _load(self, source: Optional[str] = None, fingerprints: Optional[List[str]] = None) -> bool:
+        conn = self._connect()
+        if conn is None:
+            return False
+        try:
+            sql = "SELECT fingerprint, level, reasons, safe_text FROM guard_verdicts WHERE rules_version = ?"
+            params: list = [self.guard.rules_version]
+            if source:
+                sql += " AND source = ?"
+                params.append(source)
+            if fingerprints:
+                sql += f" AND fingerprint IN ({','.join('?' * len(fingerprints))})"
+                params.extend(fingerprints)
+            for fp, level, reasons, safe_text in conn.execute(sql, params):
+                self._cache[fp] = row_to_result(level, reasons, safe_text)
+            return True
+        except sqlite3.OperationalError:
+            # 旧库没有 guard_verdicts 表
+            return False
+        finally:
+            conn.close()
+
+    def prefetch(self, fingerprints: Iterable[str]) -> None:
+        """批量预读（如一次检索返回的多个 chunk），避免逐条查库。"""
+        if not self._has_table:
+            return
+        missing = [fp for fp in dict.fromkeys(fingerprints) if fp and fp not in self._cache]
+        if missing:
+            self._load(fingerprints=missing)
+
+    def check(self, text: str, fingerprint: Optional[str] = None) -> GuardResult:
+        fp = fingerprint or sha256_fp(text or "")
+        res = self._cache.get(fp)
+        if res is not None:
+            self.hits += 1
+            return res
+        if self._has_table and fingerprint:
+            self._load(fingerprints=[fp])
+            res = self._cache.get(fp)
+            if res is not None:
+                self.hits += 1
+                return res
+
+        # 缺失或规则版本不一致：现场判定
+        self.misses += 1
+        res = self.guard.check(text)
+        self._cache[fp] = res
+        return res
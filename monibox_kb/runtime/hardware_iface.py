@@ -1,19 +1,124 @@
 from __future__ import annotations
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from monibox_kb.tts.service import PRIO_PROTOCOL, TTSService
 
 class HardwareIface:
-    """真实硬件接口：后续在 Radxa 上实现"""
+    """
+    真实硬件接口：后续在 Radxa 上实现
+    - tts 可以阻塞到播报结束；led/screen 只负责“开始显示”，持续时间由 ActionScheduler 控制
+    - led_off / screen_clear / stop_tts：时长到期或被更高优先级协议抢占时调用
+    """
     def tts(self, text: str, style: str | None = None): ...
     def led(self, pattern: Dict[str, Any]): ...
     def screen(self, text: str, ms: int = 2000): ...
+    def led_off(self): ...
+    def screen_clear(self): ...
+    def stop_tts(self): ...
 
 class MockHardware(HardwareIface):
-    """PC 上调试用：只打印"""
+    """
+    PC 上调试用：打印 + 记录时间线
+    timeline: [(perf_counter 时间戳, 动作类型, 内容)]，用于度量“事件 -> 第一个动作”的延迟、断言动作并发/时长
+    tts_ms_per_char > 0 时模拟播报耗时（tts 阻塞，可被 stop_tts 打断），结束时记录 tts_end
+    """
+    def __init__(self, quiet: bool = False, tts_ms_per_char: float = 0.0):
+        self.quiet = quiet
+        self.tts_ms_per_char = tts_ms_per_char
+        self.timeline: List[Tuple[float, str, Any]] = []
+        self._lock = threading.Lock()
+        self._tts_stop = threading.Event()
+
+    def _record(self, kind: str, payload: Any):
+        with self._lock:
+            self.timeline.append((time.perf_counter(), kind, payload))
+
+    def events(self, kind: str) -> List[Tuple[float, str, Any]]:
+        with self._lock:
+            return [x for x in self.timeline if x[1] == kind]
+
     def tts(self, text: str, style: str | None = None):
-        print(f"[TTS style={style}] {text}")
+        self._tts_stop.clear()
+        self._record("tts", text)
+        if not self.quiet:
+            print(f"[TTS style={style}] {text}")
+        if self.tts_ms_per_char > 0:
+            interrupted = self._tts_stop.wait(len(text or "") * self.tts_ms_per_char / 1000.0)
+            self._record("tts_stop" if interrupted else "tts_end", text)
+
+    def led(self, pattern: Dict[str, Any]):
+        self._record("led", pattern)
+        if not self.quiet:
+            print(f"[LED] {pattern}")
+
+    def screen(self, text: str, ms: int = 2000):
+        self._record("screen", text)
+        if not self.quiet:
+            print(f"[SCREEN {ms}ms] {text}")
+
+    def led_off(self):
+        self._record("led_off", None)
+        if not self.quiet:
+            print("[LED] off")
+
+    def screen_clear(self):
+        self._record("screen_clear", None)
+        if not self.quiet:
+            print("[SCREEN] clear")
+
+    def stop_tts(self):
+        self._tts_stop.set()
+
+class TTSHardware(HardwareIface):
+    """
+    只有扬声器的硬件（Windows 调试会话用）：tts 交给 TTS 引擎（需有 speak 方法），led/screen 只打印。
+    pyttsx3 不是线程安全的：事件线程与会话线程可能同时播报，这里串行化。
+    """
+    def __init__(self, engine, enabled: bool = True):
+        self.engine = engine
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def tts(self, text: str, style: str | None = None):
+        if not self.enabled or not text:
+            return
+        with self._lock:
+            self.engine.speak(text)
+
+    def led(self, pattern: Dict[str, Any]):
+        print(f"[LED] {pattern}")
+
+    def screen(self, text: str, ms: int = 2000):
+        print(f"[SCREEN {ms}ms] {text}")
+
+    def stop_tts(self):
+        stop = getattr(self.engine, "stop", None)
+        if callable(stop):
+            stop()
+
+
+class TTSServiceHardware(HardwareIface):
+    """
+    扬声器经 TTSService 播报：tts 以协议优先级入队（插到未播放的回复句子前面），阻塞到这一句播完或被丢弃；
+    stop_tts（协议被抢占）：丢弃所有未播放的句子并打断当前句，被抢占协议里还在排队的 tts 也随之返回。
+    led/screen 只打印。
+    """
+    def __init__(self, service: TTSService, enabled: bool = True):
+        self.service = service
+        self.enabled = enabled
+
+    def tts(self, text: str, style: str | None = None):
+        if not self.enabled or not text:
+            return
+        self.service.enqueue(text, priority=PRIO_PROTOCOL, style=style).wait()
 
     def led(self, pattern: Dict[str, Any]):
         print(f"[LED] {pattern}")
 
     def screen(self, text: str, ms: int = 2000):
-        print(f"[SCREEN {ms}ms] {text}")
\ No newline at end of file
+        print(f"[SCREEN {ms}ms] {text}")
+
+    def stop_tts(self):
+        self.service.interrupt()
@@ -4,8 +4,10 @@ import argparse
 from monibox_kb.config import settings
 from monibox_kb.runtime.rag_engine import RagEngine
 from monibox_kb.runtime.protocol_engine import ProtocolEngine
+from monibox_kb.runtime.action_scheduler import ActionScheduler
 from monibox_kb.runtime.hardware_iface import MockHardware
 from monibox_kb.runtime.safety_guard import SafetyGuard
+from monibox_kb.runtime.guard_verdicts import GuardVerdicts
 
 
 def main():
@@ -21,48 +23,50 @@ def main():
     hw = MockHardware()
     rag = RagEngine(settings.rag_db_path)
     prot = ProtocolEngine()
-    guard = SafetyGuard()
+    # 护栏判定优先读 build 期预计算结果（按内容指纹），规则版本不一致才现场 check
+    guard = GuardVerdicts(SafetyGuard(), settings.rag_db_path)
 
-    # 1) 路由得到 tags（用于协议触发，也用于RAG过滤）
-    rr = rag.router.route(args.q, top_tags=args.auto_top_tags)
+    # 1) 路由得到 tags（用于协议触发，也用于RAG过滤）；query 向量若已算出，检索时复用
+    rr, qvec = rag.route(args.q, top_tags=args.auto_top_tags)
 
     # 2) 协议优先
     hit = prot.match(args.q, rr.tags, events)
     if hit:
         print("\n[PROTOCOL HIT]", hit["protocol_id"], hit["name"])
-        for a in hit.get("actions", []):
-            t = a.get("type")
-
-            if t == "tts":
-                raw_text = a.get("text", "")
-                res = guard.check(raw_text)
 
-                if res.level == "allow":
-                    hw.tts(res.safe_text, style=a.get("style"))
-                elif res.level == "rewrite":
+        # tts 动作先过护栏，再交给调度器与 led/screen 并发执行
+        actions = []
+        for a in hit.get("actions", []):
+            if a.get("type") == "tts":
+                res = guard.check(a.get("text", ""))
+                if res.level == "rewrite":
                     print("[GUARD rewrite]", res.reasons)
-                    hw.tts(res.safe_text, style=a.get("style"))
-                else:
-                    # block
+                elif res.level == "block":
                     print("[GUARD block]", res.reasons)
-                    hw.tts(res.safe_text, style="urgent_calm")
+                style = "urgent_calm" if res.level == "block" else a.get("style")
+                actions.append(dict(a, text=res.safe_text, style=style))
+            else:
+                actions.append(a)
 
-            elif t == "led":
-                hw.led(a.get("pattern", {}))
-            elif t == "screen":
-                hw.screen(a.get("text", ""), ms=int(a.get("ms", 2000)))
+        scheduler = ActionScheduler(hw)
+        for r in scheduler.run(dict(hit, actions=actions)):
+            print(f"[ACTION] {r.type:<6} start_latency={r.start_latency_ms:.2f}ms duration={r.duration_ms:.0f}ms"
+                  + (" (preempted)" if r.cancelled else ""))
+        scheduler.close()
         return
 
     # 3) 未命中协议：RAG 兜底
     print("\n[NO PROTOCOL] fallback to RAG")
-    res_list = rag.auto_search(args.q, topk=args.topk, auto_top_tags=args.auto_top_tags)
+    dim = None if rr.cross_dimension else rr.dimension
+    res_list = rag.search(args.q, topk=args.topk, dimension=dim, tags=rr.tags, query_vec=qvec)
 
+    guard.prefetch(r.fingerprint for r in res_list)
     for i, r in enumerate(res_list, start=1):
         print(f"\n[{i}] {r.display_id} ({r.dimension}/{r.risk})")
         print(f"    dist={r.distance:.6f} final={r.final_distance:.6f}")
 
         # 每条输出也走护栏
-        res = guard.check(r.text)
+        res = guard.check(r.text, fingerprint=r.fingerprint)
         if res.level == "allow":
             hw.tts(res.safe_text, style="calm_clear")
         elif res.level == "rewrite":
@@ -72,6 +76,8 @@ def main():
             print("[GUARD block]", res.reasons)
             hw.tts(res.safe_text, style="urgent_calm")
 
+    print(f"\n[GUARD verdicts] precomputed={guard.hits} rechecked={guard.misses}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
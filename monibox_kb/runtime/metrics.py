@@ -0,0 +1,43 @@
+"""
+monibox_kb/runtime/metrics.py
+
+用途
+-----
+会话运行指标（进程内计数，线程安全）：轮数、协议 / LLM / 缓存命中 / 被打断次数，以及降级阶梯的每次降级。
+
+- count(name)：计数 +1
+- fallback(step, **info)：记录一次降级（按阶梯档位计数，保留最近 recent 条明细）
+- snapshot()：当前指标的 dict（守护进程 /health 输出）
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict
+
+
+class SessionMetrics:
+    def __init__(self, recent: int = 50):
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+        self.fallbacks: Counter = Counter()
+        self.recent_fallbacks: Deque[Dict[str, Any]] = deque(maxlen=recent)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def fallback(self, step: str, **info: Any):
+        with self._lock:
+            self.fallbacks[step] += 1
+            self.recent_fallbacks.append({"step": step, "at": round(time.time(), 3), **info})
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "fallbacks": dict(self.fallbacks),
+                "recent_fallbacks": list(self.recent_fallbacks),
+            }
@@ -1,44 +1,125 @@
 from __future__ import annotations
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from monibox_kb.paths import KNOWLEDGE_SRC
+from monibox_kb.text_match import TermMatcher
+
+# 编译后的单个条件：(kind, arg)
+#   ("event", str) / ("text", frozenset[str]) / ("tags_any", frozenset[str]) / ("tags_all", frozenset[str]) / ("never", None)
+Cond = Tuple[str, Any]
+
 
 class ProtocolEngine:
     """
     协议优先引擎（增强版）：
     - 支持 all_of / any_of / none_of 组合条件
     - 条件类型：events / text_contains_any / tags_any / tags_all
+
+    加载时编译（协议数量增长到上百条时，match 仍只看候选协议）：
+    - 倒排索引：event -> 协议、tag -> 协议、text 词 -> 协议
+    - 所有 text_contains_any 词合成一个 TermMatcher，一次扫描拿到全部命中词
+    - match 时只对候选协议按 priority 顺序做完整判定
     """
     def __init__(self, protocols_path: Optional[Path] = None):
         self.protocols_path = protocols_path or (KNOWLEDGE_SRC / "protocols.json")
         obj = json.loads(self.protocols_path.read_text(encoding="utf-8"))
         ps = obj.get("protocols", [])
         self.protocols = sorted(ps, key=lambda x: x.get("priority", 0), reverse=True)
+        self._compile()
+
+    # -----------------------------
+    # 编译
+    # -----------------------------
+    @staticmethod
+    def _compile_cond(cond: Dict[str, Any]) -> Cond:
+        # 与原判定顺序一致：event > text_contains_any > tags_any > tags_all
+        if "event" in cond:
+            return ("event", cond["event"])
+        if "text_contains_any" in cond:
+            return ("text", frozenset(w for w in cond["text_contains_any"] if w))
+        if "tags_any" in cond:
+            return ("tags_any", frozenset(cond["tags_any"]))
+        if "tags_all" in cond:
+            return ("tags_all", frozenset(cond["tags_all"]))
+        return ("never", None)
+
+    def _compile(self):
+        self._compiled: List[Dict[str, List[Cond]]] = []
+        self._by_event: Dict[Any, Set[int]] = {}
+        self._by_tag: Dict[str, Set[int]] = {}
+        self._by_term: Dict[str, Set[int]] = {}
+        self._always: Set[int] = set()    # 不依赖任何正向条件即可能触发的协议（如只有 none_of）
+
+        terms: List[str] = []
+        for i, p in enumerate(self.protocols):
+            trig = p.get("trigger", {})
+            ct = {k: [self._compile_cond(c) for c in trig.get(k, [])] for k in ("any_of", "all_of", "none_of")}
+            self._compiled.append(ct)
+
+            for kind, arg in ct["none_of"]:
+                if kind == "text":
+                    terms.extend(arg)
+
+            positive = ct["any_of"] + ct["all_of"]
+            if not positive:
+                if ct["none_of"]:
+                    self._always.add(i)
+                continue
+
+            for kind, arg in positive:
+                if kind == "event":
+                    self._by_event.setdefault(arg, set()).add(i)
+                elif kind == "text":
+                    for w in arg:
+                        self._by_term.setdefault(w, set()).add(i)
+                    terms.extend(arg)
+                elif kind == "tags_any":
+                    for t in arg:
+                        self._by_tag.setdefault(t, set()).add(i)
+                elif kind == "tags_all":
+                    if not arg:
+                        # tags_all: [] 恒为真
+                        self._always.add(i)
+                    for t in arg:
+                        self._by_tag.setdefault(t, set()).add(i)
+
+        self._matcher = TermMatcher(terms)
 
+    # -----------------------------
+    # 匹配
+    # -----------------------------
     def match(self, text: str, routed_tags: List[str], events: List[str]) -> Optional[Dict[str, Any]]:
         text = text or ""
-        routed_tags = routed_tags or []
-        events = events or []
+        tags = set(routed_tags or [])
+        evs = set(events or [])
+        found = self._matcher.find_all(text)
 
-        for p in self.protocols:
-            trig = p.get("trigger", {})
-            if self._eval_trigger(trig, text, routed_tags, events):
-                return p
+        cand: Set[int] = set(self._always)
+        for e in evs:
+            cand |= self._by_event.get(e, set())
+        for t in tags:
+            cand |= self._by_tag.get(t, set())
+        for w in found:
+            cand |= self._by_term.get(w, set())
+
+        for i in sorted(cand):
+            if self._eval_trigger(self._compiled[i], found, tags, evs):
+                return self.protocols[i]
         return None
 
-    def _eval_trigger(self, trig: Dict[str, Any], text: str, tags: List[str], events: List[str]) -> bool:
+    def _eval_trigger(self, ct: Dict[str, List[Cond]], found: Set[str], tags: Set[str], events: Set[str]) -> bool:
         # 默认：any_of 为空则视为 False（避免误触发）
-        any_of = trig.get("any_of", [])
-        all_of = trig.get("all_of", [])
-        none_of = trig.get("none_of", [])
+        any_of = ct["any_of"]
+        all_of = ct["all_of"]
+        none_of = ct["none_of"]
 
-        if all_of and not self._all(all_of, text, tags, events):
+        if all_of and not all(self._match_one(c, found, tags, events) for c in all_of):
             return False
-        if any_of and not self._any(any_of, text, tags, events):
+        if any_of and not any(self._match_one(c, found, tags, events) for c in any_of):
             return False
-        if none_of and self._any(none_of, text, tags, events):
+        if none_of and any(self._match_one(c, found, tags, events) for c in none_of):
             return False
 
         # 如果三者都为空，认为不触发
@@ -46,36 +127,15 @@ class ProtocolEngine:
             return False
         return True
 
-    def _any(self, conds: List[Dict[str, Any]], text: str, tags: List[str], events: List[str]) -> bool:
-        for c in conds:
-            if self._match_one(c, text, tags, events):
-                return True
+    @staticmethod
+    def _match_one(cond: Cond, found: Set[str], tags: Set[str], events: Set[str]) -> bool:
+        kind, arg = cond
+        if kind == "event":
+            return arg in events
+        if kind == "text":
+            return not arg.isdisjoint(found)
+        if kind == "tags_any":
+            return not arg.isdisjoint(tags)
+        if kind == "tags_all":
+            return arg <= tags
         return False
-
-    def _all(self, conds: List[Dict[str, Any]], text: str, tags: List[str], events: List[str]) -> bool:
-        for c in conds:
-            if not self._match_one(c, text, tags, events):
-                return False
-        return True
-
-    def _match_one(self, cond: Dict[str, Any], text: str, tags: List[str], events: List[str]) -> bool:
-        # event
-        if "event" in cond:
-            return cond["event"] in events
-
-        # text contains any
-        if "text_contains_any" in cond:
-            for w in cond["text_contains_any"]:
-                if w and w in text:
-                    return True
-            return False
-
-        # tags any
-        if "tags_any" in cond:
-            return any(t in tags for t in cond["tags_any"])
-
-        # tags all
-        if "tags_all" in cond:
-            return all(t in tags for t in cond["tags_all"])
-
-        return False
\ No newline at end of file
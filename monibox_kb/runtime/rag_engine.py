@@ -6,8 +6,6 @@ from dataclasses import dataclass
 from typing import List, Optional, Dict, Any
 from collections import Counter
 
-import sqlite_vec
-
 from monibox_kb.embedding import embed_texts
 from monibox_kb.scoring.rerank import RerankPolicy, final_distance
 from monibox_kb.routing.router import AutoRouter
@@ -32,6 +30,8 @@ class SearchResult:
     quality_score: float
     distance: float
     final_distance: float
+    fingerprint: Optional[str] = None
+    n_tokens: int = 0                   # 上下文行 token 数（RagEngine.tokenizer 对应的分词器；0=未知）
 
 
 class RagEngine:
@@ -39,8 +39,14 @@ class RagEngine:
         self.db_path = db_path
         self.policy = RerankPolicy.load_default()
         self.router = AutoRouter()
+        # 构建元数据：tokenizer（n_tokens 用的分词器）、pack_version（构建内容版本）；旧库没有时为空
+        self.has_n_tokens, self.meta = self._load_meta()
+        self.tokenizer = self.meta.get("tokenizer", "")
+        self.pack_version = self.meta.get("pack_version", "")
 
     def _open_db(self) -> sqlite3.Connection:
+        import sqlite_vec   # 第一次检索时才导入（会话启动只读 pack_meta，用不到向量扩展）
+
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         conn.enable_load_extension(True)
@@ -48,6 +54,36 @@ class RagEngine:
         conn.enable_load_extension(False)
         return conn
 
+    def _load_meta(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(chunks)")}
+            try:
+                meta = dict(conn.execute("SELECT key, value FROM pack_meta").fetchall())
+            except sqlite3.OperationalError:
+                meta = {}
+        finally:
+            conn.close()
+        return "n_tokens" in cols, meta
+
+    @staticmethod
+    def embed_query(query: str) -> List[float]:
+        return embed_texts([query])[0]
+
+    def route(self, query: str, top_tags: int = 2, query_vec: Optional[List[float]] = None):
+        """
+        路由（向量按需计算）：
+        - 召回词/规则命中：直接返回，不算向量
+        - 全部未命中且有标签质心：算一次 query 向量做质心兜底
+
+        返回 (RouteResult, query_vec)；query_vec 可能为 None，交给 search 时再算。
+        """
+        rr = self.router.route(query, top_tags=top_tags, query_vec=query_vec)
+        if rr.source == "default" and query_vec is None and self.router.has_centroids and (query or "").strip():
+            query_vec = self.embed_query(query)
+            rr = self.router.route(query, top_tags=top_tags, query_vec=query_vec)
+        return rr, query_vec
+
     def search(self,
                query: str,
                topk: int = 5,
@@ -55,9 +91,12 @@ class RagEngine:
                dimension: Optional[str] = None,
                tags: Optional[List[str]] = None,
                status_exclude: str = "停用",
-               max_per_group: int = 1) -> List[SearchResult]:
-
-        qvec = embed_texts([query])[0]
+               max_per_group: int = 1,
+               query_vec: Optional[List[float]] = None) -> List[SearchResult]:
+        """
+        query_vec：可选，调用方已算好的 query 向量（例如路由兜底时算过），避免重复跑 embedding。
+        """
+        qvec = query_vec if query_vec is not None else self.embed_query(query)
         qblob = vec_to_f32_blob(qvec)
 
         where = [f"c.status <> :ex_status"]
@@ -76,6 +115,7 @@ class RagEngine:
             where.append("(" + " OR ".join(ors) + ")")
 
         where_sql = " WHERE " + " AND ".join(where)
+        n_tokens_col = "c.n_tokens" if self.has_n_tokens else "0 AS n_tokens"
 
         k_pool = min(max(topk, topk * pool_mult), 300)
 
@@ -89,7 +129,7 @@ class RagEngine:
         SELECT
           c.chunk_id, c.display_id, c.group_id,
           c.text, c.dimension, c.risk, c.source_id, c.status, c.quality_score,
-          knn.distance
+          c.fingerprint, {n_tokens_col}, knn.distance
         FROM knn
         JOIN chunks c ON c.id = knn.rowid
         {where_sql}
@@ -149,11 +189,27 @@ class RagEngine:
                 quality_score=float(r["quality_score"]),
                 distance=float(r["distance"]),
                 final_distance=float(d_final),
+                fingerprint=r["fingerprint"],
+                n_tokens=int(r["n_tokens"] or 0),
             ))
         return out
 
+    def group_texts(self, group_id: str, status_exclude: str = "停用") -> List[str]:
+        """同一条 QA 切出的全部片段（按切分顺序）；抽取式回复从中找澄清问句。"""
+        if not group_id:
+            return []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                "SELECT text FROM chunks WHERE group_id = ? AND status <> ? AND tts_ok = 1 ORDER BY chunk_id",
+                (group_id, status_exclude),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [r[0] for r in rows]
+
     def auto_search(self, query: str, topk: int = 5, auto_top_tags: int = 2) -> List[SearchResult]:
-        rr = self.router.route(query, top_tags=auto_top_tags)
+        rr, qvec = self.route(query, top_tags=auto_top_tags)
         # 跨维度：不锁 dimension，只用 tags
         dim = None if rr.cross_dimension else rr.dimension
-        return self.search(query, topk=topk, dimension=dim, tags=rr.tags)
\ No newline at end of file
+        return self.search(query, topk=topk, dimension=dim, tags=rr.tags, query_vec=qvec)
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+monibox_kb/runtime/reply_stream.py
+
+用途
+-----
+LLM JSON 回复边生成边播报：
+  token 流 -> StreamGuard（增量解出 text 字段 + block 级提前终止）-> 按句切分 -> 逐句过护栏 -> SpeechQueue / TTSService
+
+- 只流式播报 text 字段；ask 在生成结束后（parse_llm_payload 解析出来）接在后面播
+- 60 字上限增量执行：已播字数 + 本句超出时截断本句，之后不再播
+- 逐句 SafetyGuard.check：rewrite 播改写后的句子；block 则清空队列、打断播报、改播 block_fallback
+- 跨句规则（如“剂量单位 + 用药语境”分在两句里）：入队前再对“已播文本 + 本句”整体查一次，
+  整体判定为 block 或会改动文本的 rewrite 时，按 block 处理（清空队列，改播整体判定的 safe_text）
+- on_sentence(句子)：每播一句（含 block 替代文本）回调一次，守护进程据此把句子流式推给客户端
+- 第一个 '{' 之前的内容（模型没按 JSON 输出）不流式播报，生成结束后按原流程整段处理
+
+用户感知延迟 ≈ 生成第一句的时间，而不是整段生成时间。
+"""
+
+from __future__ import annotations
+
+from typing import Callable, List, Optional, Union
+
+from monibox_kb.runtime.safety_guard import GuardResult, SafetyGuard
+from monibox_kb.runtime.speech_queue import SpeechQueue
+from monibox_kb.runtime.stream_guard import StreamGuard
+from monibox_kb.tts.service import TTSService
+from monibox_kb.text_clean import SentenceSplitter, limit_chars, normalize_for_tts
+
+
+class ReplyStreamer:
+    def __init__(self, guard: SafetyGuard, speech: Optional[Union[SpeechQueue, TTSService]], max_chars: int = 60,
+                 on_sentence: Optional[Callable[[str], None]] = None):
+        self.guard = guard
+        self.speech = speech
+        self.on_sentence = on_sentence
+        self.max_chars = max_chars
+        self.stream_guard = StreamGuard(guard, max_chars=max_chars)
+        self.splitter = SentenceSplitter(max_len=max_chars)
+        self.spoken = ""                  # 已入队播报的文本（<= max_chars）
+        self.sentences: List[str] = []
+        self.reasons: List[str] = []      # 逐句护栏的 rewrite 原因
+        self.result: Optional[GuardResult] = None   # block 时的结果
+        self._text_consumed = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.max_chars - len(self.spoken)
+
+    @property
+    def blocked(self) -> bool:
+        return self.result is not None
+
+    def _block(self, res: GuardResult):
+        self.result = res
+        final = limit_chars(normalize_for_tts(res.safe_text.strip()), self.max_chars)
+        if self.speech is not None:
+            self.speech.clear()
+            self.speech.put(final)
+        self.spoken = final
+        if self.on_sentence is not None:
+            self.on_sentence(final)
+
+    def _emit(self, sentence: str, sep: str = ""):
+        s = normalize_for_tts(sentence)
+        if not self.spoken:
+            sep = ""
+        if not s or self.remaining - len(sep) <= 0:
+            return
+
+        gr = self.guard.check(s)
+        if gr.level == "block":
+            self._block(gr)
+            return
+        if gr.level == "rewrite":
+            self.reasons.extend(gr.reasons)
+
+        safe = normalize_for_tts(gr.safe_text)[:max(0, self.remaining - len(sep))].strip()
+        if not safe:
+            return
+        if self.spoken:
+            whole = self.spoken + sep + safe
+            gw = self.guard.check(whole)
+            if gw.level == "block" or (gw.level == "rewrite" and normalize_for_tts(gw.safe_text) != whole):
+                self._block(gw)
+                return
+        self.spoken += sep + safe
+        self.sentences.append(safe)
+        if self.speech is not None:
+            self.speech.put(safe)
+        if self.on_sentence is not None:
+            self.on_sentence(safe)
+
+    def feed(self, tok: str) -> Optional[GuardResult]:
+        """喂入一个 token；block 时返回 block 结果（调用方停止生成）。"""
+        if self.result is not None:
+            return self.result
+
+        res = self.stream_guard.feed(tok)
+        if res is not None:
+            self._block(res)
+            return self.result
+
+        fields = self.stream_guard.fields
+        if not fields.started:
+            return None
+
+        text = fields.values["text"]
+        piece = text[self._text_consumed:]
+        self._text_consumed = len(text)
+        self.splitter.max_len = max(1, self.remaining)
+        for sentence in self.splitter.feed(piece):
+            self._emit(sentence)
+            if self.result is not None:
+                return self.result
+        return None
+
+    def finish(self, ask: str = "") -> Optional[GuardResult]:
+        """生成结束：播报 text 的剩余部分，再接上 ask。"""
+        if self.result is not None:
+            return self.result
+        self._emit(self.splitter.flush())
+        if ask and self.result is None:
+            self._emit(ask, sep=" ")
+        return self.result
+
+    @property
+    def streamed(self) -> bool:
+        """是否已经按流式播报过（否则调用方走整段处理的原流程）。"""
+        return bool(self.sentences) or self.result is not None
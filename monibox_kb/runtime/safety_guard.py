@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 
+# check_many 开进程池的最少条数：单进程约 9~10 万条/秒，进程池要把文本和 GuardResult 来回 pickle，
+# 实测 workers=2 在 1 万 / 10 万条时只有约 5 万条/秒（比单进程慢）；只有百万条级、4 核以上才可能划算
+POOL_MIN_TEXTS = 1_000_000
+
 @dataclass
 class GuardResult:
     level: str              # "allow" | "rewrite" | "block"
@@ -21,6 +29,12 @@ class SafetyGuard:
     - 不再因为“静脉出血”这类描述误触发输液/注射拦截
     - 修正 mg/ml 的误伤：使用更严格的边界匹配
     - “检查口鼻异物”改为 rewrite（保留头偏向一侧的安全动作）
+
+    编译（构造时一次）：
+    - 规则仍以正则书写；只由字面量、|、分组、? 组成的规则展开成全部字面量，
+      合成一个字面量正则（长词在前），一遍扫描拿到所有规则的命中（含重叠词，见 _scan_terms）
+    - 展开不了的规则（如 mg/ml 的字母边界）保留为残余正则，先用规则里必需的字面量做门控
+    - check 与逐条 re.search 的参考实现 check_regex 判定完全一致
     """
 
     def __init__(self):
@@ -65,11 +79,178 @@ class SafetyGuard:
             "如果你愿意，告诉我：你现在呼吸更像‘喘不上气’，还是‘胸口很闷’？"
         )
 
+        self.dosage_fallback = "我不能提供药物剂量建议。请优先保持呼吸顺畅、减少活动、等待专业救援。"
+
+        self._compile()
+
+    # -----------------------------
+    # 编译
+    # -----------------------------
+    def _compile(self):
+        # 规则组：block / dosage / context（用药语境）/ rewrite
+        self._context_pattern = r"药|服用|吃药|用药|喷雾|吸入"
+        groups = [
+            ("block", self.block_patterns, 0),
+            ("dosage", self.dosage_unit_patterns, re.IGNORECASE),
+            ("context", [(self._context_pattern, "med_context")], 0),
+            ("rewrite", self.rewrite_patterns, 0),
+        ]
+
+        self._rules: Dict[str, List[Tuple[str, str]]] = {}
+        self._term_rules: Dict[str, List[Tuple[str, int]]] = {}      # 字面量 -> [(规则组, 规则序号)]
+        # 残余正则：(规则组, 规则序号, 正则, 门控字面量, 门控是否忽略大小写)
+        self._residual: List[Tuple[str, int, "re.Pattern[str]", str, bool]] = []
+
+        for gname, rules, flags in groups:
+            self._rules[gname] = list(rules)
+            for ri, (pat, _code) in enumerate(rules):
+                lits = _expand_literals(pat)
+                if lits and flags & re.IGNORECASE and any(x.lower() != x.upper() for x in lits):
+                    lits = None    # 含大小写字母的忽略大小写规则留给正则
+                if lits is None:
+                    gate = _required_literal(pat)
+                    icase = bool(flags & re.IGNORECASE)
+                    self._residual.append((gname, ri, re.compile(pat, flags), gate.lower() if icase else gate, icase))
+                    continue
+                for lit in lits:
+                    self._term_rules.setdefault(lit, []).append((gname, ri))
+
+        # 长词在前：同一位置上正则交替取第一个能匹配的，即最长词
+        terms = sorted(self._term_rules, key=len, reverse=True)
+        self._terms_rx = re.compile("|".join(re.escape(x) for x in terms)) if terms else None
+        # 最长词 -> 它的所有前缀词（同一位置上更短的命中都是最长词的前缀）
+        self._prefix_terms: Dict[str, List[str]] = {
+            t: [x for x in terms if t.startswith(x)] for t in terms
+        }
+        self._icase_gates = any(icase for *_, icase in self._residual)
+
+        # 改写用的固定替换（原实现的 re.sub 模式都是字面量）
+        self._replacements: List[Tuple[str, str]] = [
+            ("如果身边有药物，请按常规剂量使用。", "如果你有医生长期让你随身携带的急救药物，请按你最熟悉且安全的方式使用。"),
+            ("按说明书", "按你最熟悉且安全的方式"),
+            ("按医嘱", "按你最熟悉且安全的方式"),
+            ("情况危急。请立即检查其口鼻是否有明显异物，并小心将其头部偏向一侧，保持气道尽可能通畅。",
+             "情况紧急。请尽量让对方头部偏向一侧，保持呼吸尽可能通畅。避免进行可能导致误吸或误伤的操作，等待专业救援。"),
+        ]
+
+        self.rules_version = self._rules_version()
+
+    def _rules_version(self) -> str:
+        """规则指纹：任何规则/替换/兜底文本变化都会改变；预计算的判定只在版本一致时复用。"""
+        blob = json.dumps({
+            "block": self.block_patterns,
+            "rewrite": self.rewrite_patterns,
+            "dosage": self.dosage_unit_patterns,
+            "context": self._context_pattern,
+            "replacements": self._replacements,
+            "block_fallback": self.block_fallback,
+            "dosage_fallback": self.dosage_fallback,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+    def _scan_terms(self, t: str) -> List[str]:
+        """
+        一遍扫描拿到全部命中的字面量（含重叠）：
+        每次从上一个命中的起点 +1 继续搜，得到每个起点上的最长词，再补上它的前缀词。
+        """
+        rx = self._terms_rx
+        if rx is None:
+            return []
+        out: List[str] = []
+        pos = 0
+        m = rx.search(t)
+        while m is not None:
+            out.extend(self._prefix_terms[m.group()])
+            pos = m.start() + 1
+            m = rx.search(t, pos)
+        return out
+
+    def _hits(self, t: str) -> Dict[str, List[int]]:
+        """返回 {规则组: 命中的规则序号（升序）}；没有任何命中时为空 dict。"""
+        found: Dict[str, set] = {}
+        for term in self._scan_terms(t):
+            for gname, ri in self._term_rules[term]:
+                found.setdefault(gname, set()).add(ri)
+
+        if self._residual:
+            lowered = t.lower() if self._icase_gates else t
+            for gname, ri, rx, gate, icase in self._residual:
+                if gate and gate not in (lowered if icase else t):
+                    continue
+                if rx.search(t):
+                    found.setdefault(gname, set()).add(ri)
+        return {g: sorted(v) for g, v in found.items()}
+
+    # -----------------------------
+    # 判定
+    # -----------------------------
     def check(self, text: str) -> GuardResult:
         t = (text or "").strip()
         if not t:
             return GuardResult(level="allow", reasons=[], safe_text=t)
 
+        hits = self._hits(t)
+        if not hits:
+            return GuardResult(level="allow", reasons=[], safe_text=t)
+
+        # 1) block
+        block = hits.get("block")
+        if block:
+            reasons = [self._rules["block"][i][1] for i in block]
+            return GuardResult(level="block", reasons=reasons, safe_text=self.block_fallback)
+
+        # 2) dosage unit：只有当文本同时出现“药/用药/服用/喷雾/吸入”等语境才改写；否则忽略
+        dosage = hits.get("dosage")
+        if dosage and hits.get("context"):
+            reasons = [self._rules["dosage"][i][1] for i in dosage]
+            return GuardResult(level="rewrite", reasons=reasons, safe_text=self.dosage_fallback)
+
+        # 3) rewrite
+        rewrite = hits.get("rewrite")
+        if rewrite:
+            rw = [self._rules["rewrite"][i][1] for i in rewrite]
+            safe = t
+            for old, new in self._replacements:
+                safe = safe.replace(old, new)
+            return GuardResult(level="rewrite", reasons=rw, safe_text=safe)
+
+        return GuardResult(level="allow", reasons=[], safe_text=t)
+
+    def check_block(self, text: str) -> List[str]:
+        """只看 block 级规则：返回命中的 block 原因（空列表表示不会被 block）。流式护栏逐 token 调用。"""
+        t = (text or "").strip()
+        if not t:
+            return []
+        block = self._hits(t).get("block")
+        return [self._rules["block"][i][1] for i in block] if block else []
+
+    def check_many(self,
+                   texts: Iterable[str],
+                   workers: Optional[int] = None,
+                   chunksize: int = 2000) -> List[GuardResult]:
+        """
+        批量判定（语料审计用），结果顺序与输入一致。
+        workers：进程数；缺省读 GUARD_WORKERS（默认 1，即当前进程内顺序执行）。
+        文本量小于 POOL_MIN_TEXTS 时不开进程池（进程启动 + 序列化开销比判定本身还大）。
+        """
+        texts = list(texts)
+        workers = int(workers if workers is not None else os.getenv("GUARD_WORKERS", "1"))
+        if workers <= 1 or len(texts) < max(POOL_MIN_TEXTS, 2 * chunksize):
+            return [self.check(t) for t in texts]
+
+        batches = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+        out: List[GuardResult] = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as ex:
+            for part in ex.map(_check_batch, batches):
+                out.extend(part)
+        return out
+
+    def check_regex(self, text: str) -> GuardResult:
+        """参考实现：逐条 re.search（编译前的原始逻辑），用于核对 check 的判定一致性。"""
+        t = (text or "").strip()
+        if not t:
+            return GuardResult(level="allow", reasons=[], safe_text=t)
+
         # 1) block
         reasons = []
         for pat, code in self.block_patterns:
@@ -78,8 +259,7 @@ class SafetyGuard:
         if reasons:
             return GuardResult(level="block", reasons=reasons, safe_text=self.block_fallback)
 
-        # 2) dosage unit：只有当文本同时出现“药/用药/服用/喷雾/吸入”等语境才触发 rewrite/block
-        # 避免“少量水”这种误伤
+        # 2) dosage unit
         dosage_unit_hit = False
         for pat, code in self.dosage_unit_patterns:
             if re.search(pat, t, flags=re.IGNORECASE):
@@ -87,13 +267,9 @@ class SafetyGuard:
                 reasons.append(code)
 
         if dosage_unit_hit:
-            # 如果在用药语境中，改写
-            if re.search(r"药|服用|吃药|用药|喷雾|吸入", t):
-                safe = "我不能提供药物剂量建议。请优先保持呼吸顺畅、减少活动、等待专业救援。"
-                return GuardResult(level="rewrite", reasons=reasons, safe_text=safe)
-            # 否则忽略（allow）
-            reasons = []  # 清空原因
-            # 继续走 rewrite_patterns/allow
+            if re.search(self._context_pattern, t):
+                return GuardResult(level="rewrite", reasons=reasons, safe_text=self.dosage_fallback)
+            reasons = []
 
         # 3) rewrite
         rw = []
@@ -103,16 +279,123 @@ class SafetyGuard:
 
         if rw:
             safe = t
+            for old, new in self._replacements:
+                safe = re.sub(re.escape(old), new, safe)
+            return GuardResult(level="rewrite", reasons=rw, safe_text=safe)
 
-            # 用药/剂量统一改写
-            safe = re.sub(r"如果身边有药物，请按常规剂量使用。", "如果你有医生长期让你随身携带的急救药物，请按你最熟悉且安全的方式使用。", safe)
-            safe = re.sub(r"按说明书", "按你最熟悉且安全的方式", safe)
-            safe = re.sub(r"按医嘱", "按你最熟悉且安全的方式", safe)
+        return GuardResult(level="allow", reasons=[], safe_text=t)
 
-            # 口鼻异物检查改写：删掉检查异物，保留安全的头偏一侧提示
-            safe = re.sub(r"情况危急。请立即检查其口鼻是否有明显异物，并小心将其头部偏向一侧，保持气道尽可能通畅。",
-                          "情况紧急。请尽量让对方头部偏向一侧，保持呼吸尽可能通畅。避免进行可能导致误吸或误伤的操作，等待专业救援。", safe)
 
-            return GuardResult(level="rewrite", reasons=rw, safe_text=safe)
+# -----------------------------
+# 进程池 worker（每个进程只反序列化一次 guard）
+# -----------------------------
+_WORKER_GUARD: Optional[SafetyGuard] = None
+
+
+def _init_worker(guard: SafetyGuard):
+    global _WORKER_GUARD
+    _WORKER_GUARD = guard
+
 
-        return GuardResult(level="allow", reasons=[], safe_text=t)
\ No newline at end of file
+def _check_batch(texts: Sequence[str]) -> List[GuardResult]:
+    return [_WORKER_GUARD.check(t) for t in texts]
+
+
+# -----------------------------
+# 规则展开
+# -----------------------------
+_MAX_EXPANSION = 256
+
+
+def _expand_literals(pat: str) -> Optional[List[str]]:
+    """
+    把只含字面量、|、(...)、(?:...)、? 的正则展开成它能匹配的全部字面量。
+    出现其它元字符（字符类、量词、断言、转义等）或展开过多时返回 None（保留为正则）。
+    """
+    pos = 0
+
+    def parse_alt() -> List[str]:
+        nonlocal pos
+        out = parse_seq()
+        while pos < len(pat) and pat[pos] == "|":
+            pos += 1
+            out = out + parse_seq()
+        return out
+
+    def parse_seq() -> List[str]:
+        nonlocal pos
+        acc = [""]
+        while pos < len(pat) and pat[pos] not in "|)":
+            ch = pat[pos]
+            if ch == "(":
+                pos += 1
+                if pat.startswith("?:", pos):
+                    pos += 2
+                elif pat.startswith("?", pos):
+                    raise ValueError("group extension")
+                atom = parse_alt()
+                if pos >= len(pat) or pat[pos] != ")":
+                    raise ValueError("unbalanced")
+                pos += 1
+            elif ch in ".^$*+?[]{}\\":
+                raise ValueError("metachar")
+            else:
+                atom = [ch]
+                pos += 1
+            if pos < len(pat) and pat[pos] == "?":
+                pos += 1
+                atom = atom + [""]
+            acc = [a + b for a in acc for b in atom]
+            if len(acc) > _MAX_EXPANSION:
+                raise ValueError("too many")
+        return acc
+
+    try:
+        out = parse_alt()
+    except ValueError:
+        return None
+    if pos != len(pat) or any(not x for x in out):
+        # 能匹配空串的规则对任何文本都成立，不适合字面量化
+        return None
+    return list(dict.fromkeys(out))
+
+
+def _required_literal(pat: str) -> str:
+    """
+    残余正则的门控：顶层（不在分组/字符类里）最长的一段连续字面量，文本里没有它则规则必不命中。
+    顶层有 | 或找不到字面量时返回空串（不门控）。
+    """
+    best = cur = ""
+    depth = 0
+    i = 0
+    while i < len(pat):
+        ch = pat[i]
+        if ch == "\\":
+            cur = ""
+            i += 2
+            continue
+        if ch == "[":
+            cur = ""
+            j = pat.find("]", i + 2)
+            i = len(pat) if j < 0 else j + 1
+            continue
+        if ch == "(":
+            depth += 1
+            cur = ""
+        elif ch == ")":
+            depth -= 1
+            cur = ""
+        elif ch == "|" and depth == 0:
+            return ""
+        elif depth == 0 and ch not in ".^$*+?{}|":
+            nxt = pat[i + 1] if i + 1 < len(pat) else ""
+            if nxt in "?*{":
+                cur = ""      # 可选字符不是必需的
+            else:
+                cur += ch
+                if len(cur) > len(best):
+                    best = cur
+        else:
+            cur = ""
+        i += 1
+    return best
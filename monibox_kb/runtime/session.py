@@ -20,20 +20,72 @@ MoniSession：Windows/Radxa 通用会话编排层（端到端链路核心）
 ------------
 - 对 LLM stream 增加 stop：阻止输出第二个 JSON（常见模式是 \n{ 开始第二个对象）
 - 使用 extract_first_json：即使模型输出多个 JSON，也能解析第一个完整对象
+- 语法约束解码（LLM_GRAMMAR=1，默认）：GBNF 固定 text/used_ids/ask 结构，used_ids 只能取本轮检索到的 id，
+  对象闭合即结束生成；上面两条退化为兜底
+- 预算终止（LLM_BUDGET_STOP=1，默认）：text/ask 合计达到 60 字即停止解码，自行补齐 JSON 收尾
 - 60字硬限制：不要指望模型自觉，必须后处理强制截断
+- 流式护栏：生成中 text/ask 一旦命中 block 级规则，立即停止生成并播放安全替代文本
+- 流式播报：text 字段按句切分、逐句过护栏后进入播报队列，生成还在继续时第一句就开始播
+- TTSService：合成与播放分线程，播当前句时合成下一句；协议播报优先级高于回复句子。
+  TTS_BACKEND=null 用无声后端（只记录时间线），Linux 无头环境也能跑通整条链路
+- 预渲染音频（TTS_AUDIO_CACHE 目录）：固定文本命中直接播放 wav，只有未命中才现场合成
+- Prompt-lookup 解码（LLM_PROMPT_LOOKUP=草稿 token 数，默认 0 关闭）：从检索要点里按 n-gram 猜后续 token
+- 录制（LLM_RECORD_PATH，默认不录）：每轮 prompt/输出追加到 JSONL，供 scripts/bench_llm_prompt_lookup 回放
+- 上下文按 token 预算装填（pack_context）：n_ctx 扣掉 system 前缀、模板、用户话语和生成预留（max_tokens）后，
+  按 rerank 顺序贪心放入检索要点；token 数用 build 期按同一 GGUF 分词器算好的 chunks.n_tokens，
+  分词器不一致（换了模型没重新 build）时退回保守估算。prefill 成本可预期，n_ctx=2048 不会悄悄溢出
+- 生成缓存（LLM_CACHE=1，默认）：同一句话 + 同一组检索要点 + 同样采样参数直接回放缓存的 payload，
+  按播报速度流式吐出，照常逐句过护栏；模型或构建版本变化自动失效
+- 流式 ASR（handle_asr）：每解出一段识别结果就先跑协议匹配，命中立即下发（不等整段识别完）；
+  整段文本照常走路由 / 协议 / RAG，已提前下发的同一协议不重复播报
+- handle_async：与 handle 同样的阶段与输出，query 向量与路由 / 协议并行计算，阻塞步骤放线程池，
+  LLM token 经 asyncio.Queue 流入护栏 / 切句 / 播报（播第 N 句时合成第 N+1 句、生成不停）
+- 抽取式模式（ANSWER_MODE=extractive 或 SessionConfig.extractive）：不加载 GGUF，
+  直接用“最佳 chunk + 同组 QA 的澄清问句”播报（runtime/extractive.py），省下 LLM 的内存与 CPU
+- 降级阶梯（TURN_BUDGET_MS，默认 8000；0 关闭）：第一句迟迟出不来 / 生成拖太久时，在预算到期前放弃 LLM，
+  改播检索要点拼成的抽取式回复（见 runtime/deadline.py）；每次降级记入 metrics
+- 输出监听（listen）：协议命中、逐句回复以 dict 回调给当前线程登记的监听者，
+  守护进程（runtime/daemon.py）据此把结果流式推给客户端；不登记时无开销
+- LLM 独立进程（LLM_WORKER=1，默认）：生成期间到达的协议事件 / 新话语调用 interrupt()，
+  旧生成在下一个 token 边界取消、未播的句子丢弃，不必等它生成完
+- 冷启动：llama_cpp / sentence_transformers（torch）/ sqlite_vec / pyttsx3 都在第一次使用时才导入，
+  import 本模块只付编排代码本身的开销（预算见 scripts/bench_import_time）；构造时各阶段耗时记在 self.startup
 """
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import json
 import os
-from dataclasses import dataclass
-from typing import List, Optional, Any, Dict
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Any, Dict, Sequence, Tuple
 
-from monibox_kb.runtime.rag_engine import RagEngine
+from monibox_kb.runtime.rag_engine import RagEngine, SearchResult
 from monibox_kb.runtime.protocol_engine import ProtocolEngine
 from monibox_kb.runtime.safety_guard import SafetyGuard
+from monibox_kb.runtime.reply_stream import ReplyStreamer
+from monibox_kb.runtime.speech_queue import SpeechQueue
+from monibox_kb.runtime.guard_verdicts import GuardVerdicts
+from monibox_kb.runtime.event_path import EventFastPath, FastPathHit
+from monibox_kb.runtime.deadline import STEP_TTFT, DeadlineLadder
+from monibox_kb.runtime.extractive import GENERIC_REPLY, compose_reply
+from monibox_kb.runtime.metrics import SessionMetrics
+from monibox_kb.runtime.hardware_iface import HardwareIface, TTSServiceHardware
+from monibox_kb.llm.gen_cache import GenerationCache, replay_tokens
+from monibox_kb.llm.grammar import build_reply_grammar
+from monibox_kb.llm.json_stream import BudgetTerminator
 from monibox_kb.llm.llama_cpp_chat import LLMConfig, LlamaCppChat
-from monibox_kb.tts.pyttsx3_tts import Pyttsx3TTS
+from monibox_kb.llm.llm_worker import LLMWorker
+from monibox_kb.llm.recorder import LLMRecorder
+from monibox_kb.llm.tokens import context_line, estimate_tokens, model_fingerprint
+from monibox_kb.tts.audio_cache import AudioCache, CachedTTS
+from monibox_kb.tts.service import TTSService, make_backend
+from monibox_kb.text_clean import normalize_for_tts, limit_chars
 from monibox_kb.utils_json import extract_first_json
 
 
@@ -75,7 +127,7 @@ def build_user_prompt(user_text: str, retrieved_items: List[Dict[str, str]]) ->
         cid = (it.get("id") or "").strip()
         txt = (it.get("text") or "").strip()
         if txt:
-            lines.append(f'- id="{cid}" text="{txt}"')
+            lines.append(context_line(cid, txt))
 
     ctx = "\n".join(lines) if lines else "(无)"
 
@@ -85,33 +137,40 @@ def build_user_prompt(user_text: str, retrieved_items: List[Dict[str, str]]) ->
     )
 
 
-# -----------------------------
-# 文本后处理（TTS友好）
-# -----------------------------
-def normalize_for_tts(text: str) -> str:
-    """清理换行/多空格，让 TTS 更稳定。"""
-    t = (text or "").strip()
-    t = t.replace("\r", " ").replace("\n", " ")
-    while "  " in t:
-        t = t.replace("  ", " ")
-    return t.strip()
+# chat 模板里 system/user 之外的固定 token（im_start/im_end/角色名/assistant 起始）与余量
+CTX_TEMPLATE_MARGIN = 16
 
 
-def limit_chars(text: str, max_chars: int = 60) -> str:
+def pack_context(results: Sequence[SearchResult],
+                 budget_tokens: int,
+                 cost: Callable[[SearchResult], int],
+                 max_items: int = 6) -> Tuple[List[Dict[str, str]], int]:
     """
-    限制最大字符数（中文按 len 计即可）。
-    这里硬截断，不加省略号，避免 TTS 读“省略号”影响节奏。
+    按 rerank 分数（final_distance 升序）贪心装填检索要点：放得下就放，放不下跳过看下一条（更短的可能还放得下），
+    最多 max_items 条。返回 ([{"id", "text"}], 已用 token 数)。
+    cost(r)：该条上下文行的 token 数（含换行）。
     """
-    t = normalize_for_tts(text)
-    if len(t) <= max_chars:
-        return t
-    return t[:max_chars].strip()
+    items: List[Dict[str, str]] = []
+    used = 0
+    for r in sorted(results, key=lambda x: x.final_distance):
+        if len(items) >= max_items:
+            break
+        if not (r.text or "").strip():
+            continue
+        c = cost(r)
+        if used + c > budget_tokens:
+            continue
+        cid = getattr(r, "display_id", None) or getattr(r, "chunk_id", None) or ""
+        items.append({"id": str(cid), "text": r.text})
+        used += c
+    return items, used
 
 
 def parse_llm_payload(raw: str) -> Dict[str, Any]:
     """
     将 LLM 输出解析为 payload dict：
-    - 优先用 extract_first_json（支持多 JSON 连续输出）
+    - 语法约束解码时输出就是严格 JSON：直接 json.loads
+    - 否则用 extract_first_json（支持多 JSON 连续输出）
     - 失败则降级为 {"text": raw, "used_ids": [], "ask": ""}
 
     返回字段保证存在：text(str), used_ids(list[str]), ask(str)
@@ -121,7 +180,10 @@ def parse_llm_payload(raw: str) -> Dict[str, Any]:
         return {"text": "", "used_ids": [], "ask": ""}
 
     try:
-        obj = extract_first_json(raw)
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            obj = extract_first_json(raw)
         if not isinstance(obj, dict):
             return {"text": raw, "used_ids": [], "ask": ""}
 
@@ -146,6 +208,30 @@ class SessionConfig:
     llm_threads: int = 6
     llm_gpu_layers: int = 0
     tts_enabled: bool = True
+    extractive: bool = False        # 不加载 LLM，抽取式回复（ANSWER_MODE=extractive 同效）
+
+
+@dataclass
+class _LLMTurn:
+    """一轮 LLM 生成的状态（_start_llm 建立，_feed_token 逐 token 推进，_finish_llm 收尾）。"""
+    turn: int
+    rs: ReplyStreamer
+    budget: Optional[BudgetTerminator]
+    grammar: Optional[str]
+    system: str
+    user: str
+    temperature: float
+    cache_key: Optional[str]
+    cached: Optional[Dict[str, Any]]
+    stream: Iterator[str]
+    results: List[SearchResult]
+    t0: float
+    buf: str = ""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    timers: List[threading.Timer] = field(default_factory=list)
+    fallback: str = ""              # 降级阶梯触发的档位（空 = 未降级）
+    fallback_text: str = ""
+    finished: bool = False          # 已进入收尾（_finish_llm），降级不再介入
 
 
 class MoniSession:
@@ -155,95 +241,477 @@ class MoniSession:
     - 未命中协议：RAG + LLM（流式）生成最终回复
     - 安全护栏：协议与LLM输出都过滤
     - TTS：Windows 用 pyttsx3（Radxa 后续可替换）
+    - 事件快速通道：无文本事件 / ASR、LLM 运行中到达的事件直接走协议引擎（handle_event）
     """
 
-    def __init__(self, rag_db_path: str, cfg: SessionConfig):
+    def __init__(self, rag_db_path: str, cfg: SessionConfig, hw: Optional[HardwareIface] = None,
+                 llm: Optional[Any] = None):
+        """llm：外部注入的 LLM 后端（测试 / 基准用，如 llm.scripted_llm.ScriptedLLM）；不传时按配置加载 GGUF。"""
+        # 冷启动各阶段耗时（ms），守护进程 /health 里上报
+        self.startup: Dict[str, float] = {}
+        t = time.perf_counter()
+
+        def lap(name: str):
+            nonlocal t
+            now = time.perf_counter()
+            self.startup[name] = round((now - t) * 1000.0, 1)
+            t = now
+
         self.rag = RagEngine(rag_db_path)
+        lap("rag_ms")
         self.prot = ProtocolEngine()
         self.guard = SafetyGuard()
+        # build 期预计算的判定（协议 tts 文本）；规则版本变了会自动现场重判
+        self.verdicts = GuardVerdicts(self.guard, rag_db_path)
+        lap("guard_ms")
 
         self.tts_enabled = cfg.tts_enabled
-        self.tts = Pyttsx3TTS(
-            rate=int(os.getenv("TTS_RATE", "180")),
-            volume=float(os.getenv("TTS_VOLUME", "1.0")),
-        )
+        self.tts = make_backend()
+        # 预渲染音频缓存（scripts/render_audio_cache）：协议 / 高分 chunk 文本命中直接播 wav，不等引擎合成
+        audio_cache = AudioCache(os.getenv("TTS_AUDIO_CACHE", "build/audio"))
+        if len(audio_cache):
+            self.tts = CachedTTS(self.tts, audio_cache)
+            print(f"[TTS] audio cache: {len(audio_cache)} pre-rendered clips")
+        # 合成 / 播放分线程的播报服务：协议与 LLM 回复共用，协议优先
+        self.tts_service = TTSService(self.tts)
+        # 动作统一经 HardwareIface 下发；未传入时只接扬声器
+        self.hw = hw or TTSServiceHardware(self.tts_service, enabled=cfg.tts_enabled)
+        self.fast = EventFastPath(self.prot, self.verdicts, self.hw)
+        # LLM 回复按句流式播报：自带扬声器时直接进 TTSService，外接硬件时经 hw.tts 排队
+        self.speech = self.tts_service if hw is None else SpeechQueue(self.hw)
+        lap("tts_ms")
 
         llm_cfg = LLMConfig(
             gguf_path=cfg.llm_path,
             n_ctx=cfg.llm_ctx,
             n_threads=cfg.llm_threads,
             n_gpu_layers=cfg.llm_gpu_layers,
+            prompt_lookup=int(os.getenv("LLM_PROMPT_LOOKUP", "0")),
+            prompt_lookup_ngram=int(os.getenv("LLM_PROMPT_LOOKUP_NGRAM", "2")),
         )
-        self.llm = LlamaCppChat(llm_cfg)
+        # 抽取式模式完全不加载 LLM；默认放到子进程：生成中途可被事件 / 新话语取消
+        self.extractive = cfg.extractive or os.getenv("ANSWER_MODE", "llm").strip().lower() == "extractive"
+        self.llm: Optional[Any] = None
+        if llm is not None:
+            self.llm = llm
+        elif self.extractive:
+            print("[ANSWER] extractive mode: LLM not loaded")
+        elif os.getenv("LLM_WORKER", "1") != "0":
+            self.llm = LLMWorker(llm_cfg)
+        else:
+            self.llm = LlamaCppChat(llm_cfg)
+        lap("llm_ms")
+
+        # 上下文 token 预算：build 期计数的分词器与当前模型一致时用精确值，否则估算
+        self.llm_ctx = cfg.llm_ctx
+        self.llm_max_tokens = 220
+        model_fp = model_fingerprint(cfg.llm_path)
+        self.exact_tokens = bool(self.rag.tokenizer) and self.rag.tokenizer == model_fp
+        self.system_tokens = estimate_tokens(build_system_prompt())
+
+        # 每轮延迟预算的降级阶梯 + 运行指标
+        self.ladder = DeadlineLadder.from_env()
+        self.metrics = SessionMetrics()
+
+        # 轮次：interrupt() 使正在进行的 LLM 轮次作废
+        self._turn = 0
+        self._llm_active = False
+        self._turn_lock = threading.Lock()
+        # 输出监听者按上下文登记（线程各自独立，asyncio.to_thread 会带上调用方的）：守护进程里不同客户端的请求各收各的
+        self._listener: contextvars.ContextVar = contextvars.ContextVar(f"moni_listener_{id(self)}", default=None)
+
+        # system prompt 每轮不变：启动时预填充一次并保存 KV 快照，之后每轮只 prefill 检索要点 + 用户话语
+        if self.llm is not None and os.getenv("LLM_PREFIX_CACHE", "1") != "0":
+            ms = self.llm.warmup_prefix(build_system_prompt())
+            if ms is not None:
+                print(f"[LLM] system prefix cached: {self.llm.prefix_len} tokens in {ms:.0f}ms")
+                self.system_tokens = self.llm.prefix_len
+        lap("prefix_ms")
 
         # stop：防止模型输出第二个 JSON（经验上最常见的第二个对象起始是换行 + '{'）
         self.llm_stop = ["\n{", "\r\n{", "</s>", "<|endoftext|>"]
+        # 语法约束：回复结构由 GBNF 保证（stop / extract_first_json 只作兜底）
+        self.llm_grammar = os.getenv("LLM_GRAMMAR", "1") != "0"
+        # 播报字数预算用完即终止生成
+        self.llm_budget_stop = os.getenv("LLM_BUDGET_STOP", "1") != "0"
+        # 录制每轮 LLM 调用（离线基准回放用）
+        record_path = (os.getenv("LLM_RECORD_PATH") or "").strip()
+        self.recorder = LLMRecorder(record_path) if record_path else None
+
+        # 生成缓存：键里带 prompt 模板哈希（改了 system prompt / 上下文格式 / 结构约束即不再命中）
+        self.cache: Optional[GenerationCache] = None
+        if not self.extractive and os.getenv("LLM_CACHE", "1") != "0":
+            self.cache = GenerationCache(
+                os.getenv("LLM_CACHE_PATH", "build/llm_cache.db"),
+                model=model_fp,
+                pack_version=self.rag.pack_version,
+                max_rows=int(os.getenv("LLM_CACHE_MAX", "2000")),
+            )
+            if self.cache.purged:
+                print(f"[LLM CACHE] purged {self.cache.purged} stale entries (model/pack changed)")
+        lap("cache_ms")
+        # 回放速度（字/秒）：句子大约在上一句播完时到达；不播报时不等待
+        self.cache_cps = float(os.getenv("LLM_CACHE_REPLAY_CPS", "5")) if cfg.tts_enabled else 0.0
+        self.prompt_hash = hashlib.sha256(json.dumps([
+            build_system_prompt(),
+            build_user_prompt("{user}", [{"id": "{id}", "text": "{text}"}]),
+            self.llm_stop, self.llm_grammar, self.llm_budget_stop,
+        ], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    @contextlib.contextmanager
+    def listen(self, fn: Callable[[Dict[str, Any]], None]) -> Iterator[None]:
+        """在当前线程 / 协程登记输出监听者：{"type": "protocol" | "sentence", ...}。"""
+        token = self._listener.set(fn)
+        try:
+            yield
+        finally:
+            self._listener.reset(token)
+
+    def _emit(self, kind: str, **fields: Any):
+        fn = self._listener.get()
+        if fn is not None:
+            fn({"type": kind, **fields})
 
     def _speak(self, text: str):
         if self.tts_enabled and text:
-            self.tts.speak(text)
-
-    def handle(self, user_text: str, events: Optional[List[str]] = None, auto_top_tags: int = 2) -> str:
-        events = events or []
-        user_text = (user_text or "").strip()
-        if not user_text:
-            return ""
-
-        # 1) 路由标签（用于协议触发 + RAG过滤）
+            self.speech.put(text)
+            self.speech.join()
+
+    def _wait_speech(self, t0: float, t_gen: float):
+        """等流式播报队列播完，并打印首句延迟（用户感知）与整段生成耗时。"""
+        if not self.tts_enabled:
+            return
+        self.speech.join()
+        if self.speech.first_audio_at is not None:
+            print(f"[LATENCY] first_audio={(self.speech.first_audio_at - t0) * 1000:.0f}ms "
+                  f"generation={(t_gen - t0) * 1000:.0f}ms")
+
+    def interrupt(self) -> bool:
+        """
+        作废正在进行的 LLM 轮次（任意线程可调用）：取消生成、丢弃未播的句子并打断当前播报。
+        没有进行中的 LLM 轮次时什么也不做，返回 False。
+        """
+        with self._turn_lock:
+            if not self._llm_active:
+                return False
+            self._turn += 1
+            self._llm_active = False
+        cancel = getattr(self.llm, "cancel", None)
+        if callable(cancel):
+            cancel()
+        self.speech.clear()
+        return True
+
+    def close(self):
+        """释放常驻资源：LLM 子进程、协议动作调度（收尾仍在执行的 led / screen）、播报线程、生成缓存（守护进程退出时调用）。"""
+        self.interrupt()
+        close = getattr(self.llm, "close", None)
+        if callable(close):
+            close()
+        self.fast.scheduler.close()
+        self.tts_service.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _stale(self, turn: int) -> bool:
+        return turn != self._turn
+
+    def _end_turn(self, turn: int):
+        with self._turn_lock:
+            if turn == self._turn:
+                self._llm_active = False
+
+    def _chunk_tokens(self, r: SearchResult) -> int:
+        if self.exact_tokens and r.n_tokens > 0:
+            return r.n_tokens + 1
+        cid = r.display_id or r.chunk_id or ""
+        return estimate_tokens(context_line(cid, r.text.strip())) + 1
+
+    def context_budget(self, user_text: str) -> int:
+        """本轮可用于检索要点的 token 数：n_ctx - system - 模板与用户话语 - 生成预留。"""
+        fixed = self.system_tokens + estimate_tokens(build_user_prompt(user_text, [])) + CTX_TEMPLATE_MARGIN
+        return self.llm_ctx - self.llm_max_tokens - fixed
+
+    def _report_protocol(self, res: FastPathHit, via: str):
+        print(f"\n[PROTOCOL HIT/{via}]", res.protocol_id, res.name,
+              f"first_action={res.first_action_ms:.1f}ms" + (" (OVER BUDGET)" if res.over_budget else ""))
+        print(res.text)
+        self._emit("protocol", via=via, protocol_id=res.protocol_id, name=res.name, text=res.text,
+                   first_action_ms=round(res.first_action_ms, 2), over_budget=res.over_budget)
+
+    def handle_event(self, events: List[str], t0: Optional[float] = None) -> str:
+        """
+        事件快速通道（线程安全，可在 ASR/LLM 运行中由传感器线程调用）：
+        不路由、不检索，直接 ProtocolEngine -> 动作下发。未命中返回空串。
+        """
+        res = self.fire_event(events, t0=t0)
+        return res.text if res else ""
+
+    def fire_event(self, events: List[str], t0: Optional[float] = None) -> Optional[FastPathHit]:
+        """同 handle_event，但返回下发结果（未命中为 None）：调用方可把它作为 fired 传给 handle_asr，避免重复下发。"""
+        t0 = time.perf_counter() if t0 is None else t0
+        hit = self.prot.match("", [], events or [])
+        if not hit:
+            return None
+        # 协议优先：打断正在生成 / 播报的 LLM 回复，再下发协议动作
+        if self.interrupt():
+            print("\n[LLM] interrupted by event")
+        res = self.fast.run(hit, t0)
+        self._report_protocol(res, "event")
+        self.metrics.count("event_protocol")
+        return res
+
+    def _early_protocol(self, partial: str, t0: float, auto_top_tags: int = 2) -> Optional[FastPathHit]:
+        """对 ASR 部分结果跑协议匹配（只用召回词路由，微秒级）；命中即下发，不等播报结束。"""
+        rr = self.rag.router.route(partial, top_tags=auto_top_tags)
+        hit = self.prot.match(partial, rr.tags, [])
+        if not hit:
+            return None
+        if self.interrupt():
+            print("\n[LLM] interrupted by early protocol")
+        res = self.fast.run(hit, t0, wait=False)
+        self._report_protocol(res, "asr-early")
+        return res
+
+    def handle_asr(self, segments: Iterable[Any], events: Optional[List[str]] = None,
+                   auto_top_tags: int = 2, t0: Optional[float] = None,
+                   fired: Optional[FastPathHit] = None) -> str:
+        """
+        流式识别结果入口：segments 为 FasterWhisperASR.transcribe_stream 的输出（有 .text / .partial）或纯字符串。
+        - 每来一段：对“已确定文本”（partial 时对临时假设）跑协议匹配，第一次命中立即下发
+        - 识别结束：整段文本连同 events 交给 handle（路由 / 协议 / RAG）；提前下发过的同一协议不再重复
+        t0：话语结束时刻（perf_counter），缺省为调用时刻
+        fired：录音前已按 events 下发的协议（fire_event 的返回值）；识别阶段没有提前命中时，收尾同样不重复下发
+        """
+        t0 = time.perf_counter() if t0 is None else t0
+        text = ""
+        early: Optional[FastPathHit] = None
+        for seg in segments:
+            piece = getattr(seg, "text", seg) or ""
+            partial = bool(getattr(seg, "partial", False))
+            if not partial:
+                text += piece
+            if early is None:
+                early = self._early_protocol(piece.strip() if partial else text.strip(), t0, auto_top_tags)
+        text = text.strip()
+        print("[ASR]", text)
+        fired = early or fired
+        if not text:
+            return fired.text if fired else (self.handle_event(events or [], t0=t0) if events else "")
+        return self.handle(text, events=events, auto_top_tags=auto_top_tags, fired=fired)
+
+    # -----------------------------
+    # 话语处理的各个阶段（handle / handle_async 共用，保证两条路径输出一致）
+    # -----------------------------
+    def _match_protocol(self, user_text: str, events: List[str], auto_top_tags: int):
+        """路由标签（召回词，微秒级）+ 协议匹配：不让协议等 embedding。"""
         rr = self.rag.router.route(user_text, top_tags=auto_top_tags)
-
-        # 2) 协议优先
-        hit = self.prot.match(user_text, rr.tags, events)
-        if hit:
-            out_lines = []
-            for a in hit.get("actions", []):
-                if a.get("type") == "tts":
-                    gr = self.guard.check(a.get("text", ""))
-                    out_lines.append(gr.safe_text)
-
-            final = normalize_for_tts("\n".join([x for x in out_lines if x]).strip())
-            final = limit_chars(final, 60)
-
-            print("\n[PROTOCOL HIT]", hit.get("protocol_id"), hit.get("name"))
-            print(final)
-            self._speak(final)
-            return final
-
-        # 3) RAG 检索
+        return rr, self.prot.match(user_text, rr.tags, events)
+
+    def _fallback_route(self, user_text: str, events: List[str], auto_top_tags: int, qvec=None):
+        """召回词全部未命中：用 query 向量做质心兜底，再看协议 tag 触发。返回 (rr, hit, qvec)。"""
+        rr, qvec = self.rag.route(user_text, top_tags=auto_top_tags, query_vec=qvec)
+        hit = self.prot.match(user_text, rr.tags, events) if rr.tags else None
+        return rr, hit, qvec
+
+    def _fire_protocol(self, hit: Dict[str, Any], t0: float, fired: Optional[FastPathHit]) -> str:
+        if fired is not None and str(hit.get("protocol_id", "")) == fired.protocol_id:
+            return fired.text
+        res = self.fast.run(hit, t0)
+        self._report_protocol(res, "text")
+        self.metrics.count("protocol")
+        return res.text
+
+    def _search(self, user_text: str, rr, qvec=None) -> List[SearchResult]:
+        """RAG 检索（rerank 后按 QA 组去重）。"""
         dim = None if rr.cross_dimension else rr.dimension
-        results = self.rag.search(
+        return self.rag.search(
             user_text,
             topk=6,
             pool_mult=8,
             dimension=dim,
             tags=rr.tags,
             max_per_group=1,
+            query_vec=qvec,
         )
 
-        # 给 LLM 的上下文：带 id + text（用于“引用不编造”与评分闭环）
-        retrieved_items: List[Dict[str, str]] = []
-        for r in results:
-            cid = getattr(r, "display_id", None) or getattr(r, "chunk_id", None) or ""
-            retrieved_items.append({"id": str(cid), "text": r.text})
-
+    def _pack(self, user_text: str, results: List[SearchResult]) -> List[Dict[str, str]]:
+        """按 token 预算装填 LLM 上下文（带 id + text，用于“引用不编造”与评分闭环）。"""
+        ctx_budget = self.context_budget(user_text)
+        retrieved_items, ctx_tokens = pack_context(results, ctx_budget, self._chunk_tokens)
+        print(f"[CTX] packed {len(retrieved_items)}/{len(results)} chunks, {ctx_tokens}/{ctx_budget} tokens"
+              f" ({'exact' if self.exact_tokens else 'estimate'})")
+        return retrieved_items
+
+    def _compose_extractive(self, results: List[SearchResult]) -> Tuple[str, str]:
+        return compose_reply(results, self.guard, self.rag.group_texts)
+
+    def _answer_extractive(self, results: List[SearchResult], t0: float) -> str:
+        """抽取式模式：最佳 chunk + 澄清问句，过护栏、<= 60 字，直接播报。"""
+        final, ask = self._compose_extractive(results)
+        t_gen = time.perf_counter()
+        print(f"\n[EXTRACTIVE] {final}" + (f"  (ask from QA group: {ask})" if ask else "")
+              + f"  compose={(t_gen - t0) * 1000:.0f}ms")
+        self.metrics.count("extractive")
+        self._emit("sentence", text=final)
+        if self.tts_enabled and final:
+            self.speech.reset_turn()
+            self.speech.put(final)
+        self._wait_speech(t0, t_gen)
+        return final
+
+    def _start_llm(self, user_text: str, results: List[SearchResult], t0: float,
+                   budget_ms: Optional[float] = None) -> _LLMTurn:
+        """
+        开始一轮 LLM 流式生成（要求输出 JSON）：登记轮次、查生成缓存、建立 token 流（惰性，尚未解码），
+        并按本轮预算布置降级阶梯的定时器。
+        """
+        retrieved_items = self._pack(user_text, results)
         # 如果 RAG 完全没命中，也允许 LLM 做“通用安全动作 + 澄清问题”
         system = build_system_prompt()
         user = build_user_prompt(user_text, retrieved_items)
 
-        # 4) LLM 流式生成（要求输出 JSON）
         print("\n[NO PROTOCOL] RAG+LLM streaming(JSON)...")
-        buf = ""
-        for tok in self.llm.stream_chat(
-            system,
-            user,
-            max_tokens=220,
-            temperature=float(os.getenv("LLM_TEMPERATURE", "0.3")),
-            top_p=float(os.getenv("LLM_TOP_P", "0.9")),
-            stop=self.llm_stop,
-        ):
-            buf += tok
+        with self._turn_lock:
+            self._turn += 1
+            turn = self._turn
+            self._llm_active = True
+        speech = self.speech if self.tts_enabled else None
+        if speech is not None:
+            speech.reset_turn()
+        # text 字段边生成边按句过护栏、入播报队列
+        rs = ReplyStreamer(self.guard, speech, max_chars=60, on_sentence=lambda s: self._emit("sentence", text=s))
+        # 播报字数（60）用完即停止生成并补齐 JSON：后面的 token 反正会被截掉
+        budget = BudgetTerminator(max_chars=60) if self.llm_budget_stop else None
+        grammar = build_reply_grammar(it["id"] for it in retrieved_items) if self.llm_grammar else None
+        temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+        top_p = float(os.getenv("LLM_TOP_P", "0.9"))
+
+        cache_key = None
+        cached = None
+        if self.cache is not None:
+            cache_key = self.cache.key(
+                self.prompt_hash, user_text,
+                [(it["id"], it["text"]) for it in retrieved_items],
+                {"temperature": temperature, "top_p": top_p, "max_tokens": self.llm_max_tokens},
+            )
+            cached = self.cache.get(cache_key)
+
+        if cached is not None:
+            # 命中缓存：按生成时的 JSON 形式回放，走同一条流式播报 / 护栏路径
+            print("[LLM CACHE HIT]")
+            self.metrics.count("llm_cache_hit")
+            budget = None
+            stream = replay_tokens(cached, cps=self.cache_cps)
+        else:
+            stream = self.llm.stream_chat(
+                system,
+                user,
+                max_tokens=self.llm_max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stop=self.llm_stop,
+                grammar=grammar,
+                controller=budget,
+            )
+        self.metrics.count("llm_turns")
+        st = _LLMTurn(turn=turn, rs=rs, budget=budget, grammar=grammar, system=system, user=user,
+                      temperature=temperature, cache_key=cache_key, cached=cached, stream=stream,
+                      results=results, t0=t0)
+        if cached is not None:
+            # 缓存回放按播报速度放出句子，耗时是播报时长而不是生成时长：不上降级阶梯
+            return st
+        # 定时器线程带上当前上下文：降级回复也推给本轮的输出监听者
+        ctx = contextvars.copy_context()
+        for step, at_s in self.ladder.steps(budget_ms):
+            timer = threading.Timer(max(0.0, t0 + at_s - time.perf_counter()), ctx.run,
+                                    (self._ladder_fire, st, step, budget_ms))
+            timer.daemon = True
+            st.timers.append(timer)
+            timer.start()
+        return st
+
+    def _ladder_fire(self, st: _LLMTurn, step: str, budget_ms: Optional[float]):
+        """
+        降级阶梯到点（定时器线程）：
+        - ttft 档：还没播出第一句 -> 作废本轮 LLM，改播抽取式回复
+        - total 档：还在生成 -> 停止生成；已播过句子就到此为止，否则改播抽取式回复
+        """
+        with st.lock:
+            with self._turn_lock:
+                if st.finished or st.turn != self._turn or not self._llm_active:
+                    return      # 本轮已结束 / 已被打断
+                if step == STEP_TTFT and (st.rs.sentences or st.rs.blocked):
+                    return
+                self._turn += 1
+                self._llm_active = False
+            st.fallback = step
+            cancel = getattr(self.llm, "cancel", None)
+            if callable(cancel):
+                cancel()
+            if st.rs.sentences or st.rs.blocked:
+                st.fallback_text = st.rs.spoken
+            else:
+                try:
+                    st.fallback_text = self._compose_extractive(st.results)[0]
+                except Exception as e:      # 兜底本身不能再失败：退回通用安全动作
+                    print(f"[LADDER] extractive failed: {type(e).__name__}: {e}")
+                    st.fallback_text = GENERIC_REPLY
+                if self.tts_enabled:
+                    self.speech.clear()
+                    self.speech.put(st.fallback_text)
+                self._emit("sentence", text=st.fallback_text)
+        at_ms = (time.perf_counter() - st.t0) * 1000.0
+        self.metrics.fallback(step, at_ms=round(at_ms, 1),
+                              budget_ms=self.ladder.budget_ms if budget_ms is None else budget_ms,
+                              spoken_llm=bool(st.rs.sentences), tokens=len(st.buf))
+        self._emit("fallback", step=step, at_ms=round(at_ms, 1))
+        print(f"\n[LADDER] {step} deadline hit at {at_ms:.0f}ms -> "
+              + ("keep spoken LLM sentences" if st.rs.sentences else f"extractive: {st.fallback_text}"))
+
+    def _feed_token(self, st: _LLMTurn, tok: str) -> bool:
+        """喂入一个 token；返回 True 表示停止生成（轮次作废 / 降级 / 流式护栏 block）。"""
+        with st.lock:
+            if self._stale(st.turn):
+                return True
+            st.buf += tok
             print(tok, end="", flush=True)
+            return bool(st.rs.feed(tok))
+
+    def _finish_llm(self, st: _LLMTurn, t0: float) -> str:
+        """生成结束：解析 JSON、写缓存 / 录制、补播剩余半句与 ask，等播报结束。"""
         print("\n")
+        t_gen = time.perf_counter()
+        for timer in st.timers:
+            timer.cancel()
+        rs, budget, buf, turn = st.rs, st.budget, st.buf, st.turn
+        with st.lock:
+            fallback = st.fallback
+            st.finished = True
+        if fallback:
+            # 降级阶梯已接管：播完抽取式回复（或已播的 LLM 句子）即结束
+            self._wait_speech(t0, t_gen)
+            return st.fallback_text
+        if self._stale(turn):
+            # 已被事件 / 新话语打断：不再播报本轮剩余内容
+            print(f"[LLM] turn cancelled after {(t_gen - t0) * 1000:.0f}ms")
+            self.metrics.count("llm_cancelled")
+            return rs.spoken
+        if budget is not None and budget.stopped:
+            print(f"[LLM] char budget reached: stopped after {budget.tokens} tokens, closed with {budget.closing()!r}")
+        if self.recorder is not None and st.cached is None:
+            self.recorder.write(
+                system=st.system, user=st.user, grammar=st.grammar, max_tokens=self.llm_max_tokens,
+                stop=self.llm_stop, temperature=st.temperature, budget_stop=budget is not None,
+                output=buf, gen_ms=round((t_gen - t0) * 1000.0, 1),
+            )
+
+        if rs.blocked:
+            print(f"[GUARD stream-block] {rs.result.reasons} after {rs.stream_guard.tokens} tokens "
+                  f"({(t_gen - t0) * 1000:.0f}ms)")
+            self._wait_speech(t0, t_gen)
+            self._end_turn(turn)
+            return rs.spoken
 
         # 5) 解析 JSON（失败则降级）
         payload = parse_llm_payload(buf)
@@ -252,21 +720,150 @@ class MoniSession:
         ask = (payload.get("ask") or "").strip()
         used_ids = payload.get("used_ids") or []
 
-        # 6) 合成最终给 TTS 的文本（<=60字）
+        # 6) 打印调试信息（不播报）：used_ids 便于评分闭环/命中追溯
+        if used_ids:
+            print("[LLM USED_IDS]", used_ids)
+
+        # 按 JSON 解析成功的回复写入缓存（护栏之前的原始 payload；回放时照常过护栏）
+        if st.cache_key is not None and st.cached is None and rs.streamed and text:
+            self.cache.put(st.cache_key, payload)
+
+        # 7) 已经流式播报了 text：补上剩余半句与 ask（逐句护栏 + 60 字预算已在 ReplyStreamer 内执行）
+        if rs.streamed:
+            if rs.finish(ask):
+                print("[GUARD block]", rs.result.reasons)
+            elif rs.reasons:
+                print("[GUARD rewrite]", rs.reasons)
+            self._wait_speech(t0, t_gen)
+            self._end_turn(turn)
+            return rs.spoken
+
+        # 8) 没能流式解析（模型没按 JSON 输出等）：整段合成最终给 TTS 的文本（<=60字）
         merged = text
         if ask:
             merged = (merged + " " + ask).strip()
 
         merged = limit_chars(merged, 60)
 
-        # 7) 安全护栏（最终回复）
+        # 9) 安全护栏（最终回复）
         gr = self.guard.check(merged)
         final = normalize_for_tts(gr.safe_text.strip())
         final = limit_chars(final, 60)
 
-        # 8) 打印调试信息（不播报）：used_ids 便于评分闭环/命中追溯
-        if used_ids:
-            print("[LLM USED_IDS]", used_ids)
-
+        self._end_turn(turn)
+        if final:
+            self._emit("sentence", text=final)
         self._speak(final)
-        return final
\ No newline at end of file
+        return final
+
+    def handle(self, user_text: str, events: Optional[List[str]] = None, auto_top_tags: int = 2,
+               fired: Optional[FastPathHit] = None, budget_ms: Optional[float] = None) -> str:
+        """
+        fired：本句话在流式识别阶段已提前下发的协议（handle_asr 传入），命中同一协议时不重复下发。
+        budget_ms：本轮延迟预算（覆盖 TURN_BUDGET_MS；<= 0 不降级）。
+        """
+        t0 = time.perf_counter()
+        events = events or []
+        user_text = (user_text or "").strip()
+        if not user_text:
+            # 没有文本：事件直接走快速通道
+            return self.handle_event(events, t0=t0) if events else ""
+
+        self.metrics.count("turns")
+        # 新话语到达：上一轮还没生成 / 播完的 LLM 回复作废
+        if self.interrupt():
+            print("\n[LLM] interrupted by new input")
+
+        # 1) 路由标签 + 2) 协议优先
+        rr, hit = self._match_protocol(user_text, events, auto_top_tags)
+
+        # 召回词全部未命中：质心兜底（向量算一次，后面检索直接复用）
+        qvec = None
+        if not hit and rr.source == "default":
+            rr, hit, qvec = self._fallback_route(user_text, events, auto_top_tags)
+
+        if hit:
+            return self._fire_protocol(hit, t0, fired)
+
+        # 3) RAG 检索
+        results = self._search(user_text, rr, qvec)
+        if self.extractive:
+            return self._answer_extractive(results, t0)
+
+        # 4) LLM 流式生成
+        st = self._start_llm(user_text, results, t0, budget_ms)
+        try:
+            for tok in st.stream:
+                if self._feed_token(st, tok):
+                    break
+        finally:
+            # 提前 break 时关闭生成器，llama.cpp 不再继续解码
+            st.stream.close()
+        return self._finish_llm(st, t0)
+
+    async def handle_async(self, user_text: str, events: Optional[List[str]] = None, auto_top_tags: int = 2,
+                           fired: Optional[FastPathHit] = None, budget_ms: Optional[float] = None) -> str:
+        """
+        asyncio 版 handle：阶段相同、输出相同，但互不依赖的工作重叠执行。
+        - query 向量一开始就在线程池里算，与路由 / 协议匹配并行；协议命中时不等它
+        - KNN、协议动作下发、等播报结束等阻塞步骤放到线程池，事件循环不被卡住
+        - LLM 解码在线程里生产 token，经 asyncio.Queue 交给本协程逐个过流式护栏、切句入播报队列；
+          播报服务（TTSService）在第 N 句播放的同时合成第 N+1 句，生成也不停
+        同一会话一次只跑一轮（与 handle 相同）；事件可随时从其它线程 / 协程调用 handle_event 打断。
+        """
+        t0 = time.perf_counter()
+        events = events or []
+        user_text = (user_text or "").strip()
+        if not user_text:
+            return await asyncio.to_thread(self.handle_event, events, t0) if events else ""
+
+        self.metrics.count("turns")
+        if self.interrupt():
+            print("\n[LLM] interrupted by new input")
+
+        # 1) query 向量先算起来（检索 / 质心兜底都要用），同时跑路由 + 协议匹配
+        qvec_task = asyncio.ensure_future(asyncio.to_thread(self.rag.embed_query, user_text))
+        rr, hit = self._match_protocol(user_text, events, auto_top_tags)
+        if not hit and rr.source == "default":
+            rr, hit, _ = self._fallback_route(user_text, events, auto_top_tags, await qvec_task)
+
+        if hit:
+            # 2) 协议优先：向量结果不再需要（线程里算完即丢弃）
+            qvec_task.add_done_callback(lambda t: t.exception())
+            return await asyncio.to_thread(self._fire_protocol, hit, t0, fired)
+
+        # 3) RAG 检索（KNN 在线程池）
+        results = await asyncio.to_thread(self._search, user_text, rr, await qvec_task)
+        if self.extractive:
+            return await asyncio.to_thread(self._answer_extractive, results, t0)
+
+        # 4) LLM：解码线程 -> 队列 -> 护栏 / 切句 / 入播报队列
+        st = self._start_llm(user_text, results, t0, budget_ms)
+        loop = asyncio.get_running_loop()
+        tokens: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for tok in st.stream:
+                    loop.call_soon_threadsafe(tokens.put_nowait, tok)
+                    if stop.is_set():
+                        break
+            finally:
+                # 生成器只能在迭代它的线程里关闭
+                st.stream.close()
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while True:
+                tok = await tokens.get()
+                if tok is None:
+                    break
+                if self._feed_token(st, tok):
+                    stop.set()
+                    break
+        finally:
+            stop.set()
+            await producer
+        return await asyncio.to_thread(self._finish_llm, st, t0)
@@ -0,0 +1,68 @@
+"""
+monibox_kb/runtime/speech_queue.py
+
+用途
+-----
+TTS 播报队列：一个后台线程按顺序调用 hw.tts，调用方 put() 立即返回。
+LLM 还在生成时，已经完整的句子就可以先播出去（见 reply_stream.ReplyStreamer）。
+
+- put(text)：入队（空文本忽略）
+- join()：等待队列里的句子全部播完
+- clear()：丢弃未播的句子并打断当前播报（流式护栏命中 block 时用）
+- first_audio_at：本轮第一句开始播报的时刻（perf_counter），用于度量“用户感知延迟”
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Optional
+
+from monibox_kb.runtime.hardware_iface import HardwareIface
+
+
+class SpeechQueue:
+    def __init__(self, hw: HardwareIface, style: Optional[str] = None):
+        self.hw = hw
+        self.style = style
+        self.first_audio_at: Optional[float] = None
+        self._q: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="speech-queue", daemon=True)
+        self._thread.start()
+
+    def _worker(self):
+        while True:
+            text = self._q.get()
+            try:
+                if text is None:
+                    return
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+                self.hw.tts(text, style=self.style)
+            finally:
+                self._q.task_done()
+
+    def reset_turn(self):
+        """新一轮开始：清掉上一轮的首播时刻。"""
+        self.first_audio_at = None
+
+    def put(self, text: str):
+        if text:
+            self._q.put(text)
+
+    def join(self):
+        self._q.join()
+
+    def clear(self):
+        while True:
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                break
+            self._q.task_done()
+        self.hw.stop_tts()
+
+    def close(self):
+        self._q.put(None)
+        self._thread.join(timeout=2.0)
@@ -0,0 +1,57 @@
+"""
+monibox_kb/runtime/stream_guard.py
+
+用途
+-----
+流式安全护栏：边消费 LLM token 流边检查，一旦将要播报的内容命中 block 级规则（注射、止血带……），
+立即返回 block 结果，调用方停止生成（关闭 stream_chat 生成器）并马上播放 block_fallback。
+
+- 只看会被播报的部分：JSON 的 text / ask 字段（增量解码，token 可能切在转义或词语中间），
+  按会话的合成方式拼成 "text ask"，只检查前 max_chars 个字符
+- 模型没按 JSON 输出时，检查第一个 '{' 之前的原文（与 parse_llm_payload 的降级一致）
+- 每个 token 对累积文本（<= max_chars）整体重查，跨 token 的词自然能命中
+- 只提前终止 block；rewrite / allow 仍在生成结束后由 SafetyGuard.check 对最终文本判定
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from monibox_kb.llm.json_stream import JsonFieldStream
+from monibox_kb.runtime.safety_guard import GuardResult, SafetyGuard
+
+
+class StreamGuard:
+    def __init__(self, guard: SafetyGuard, max_chars: int = 60):
+        self.guard = guard
+        self.max_chars = max_chars
+        self.fields = JsonFieldStream(("text", "ask"))
+        self.tokens = 0
+        self.result: Optional[GuardResult] = None
+        self._checked = ""
+
+    def spoken(self) -> str:
+        """到目前为止会被播报的文本（未截断到 max_chars 前的拼接结果）。"""
+        if not self.fields.started:
+            return self.fields.prelude_text()
+        text = self.fields.values["text"].strip()
+        ask = self.fields.values["ask"].strip()
+        return (text + " " + ask).strip() if ask else text
+
+    def feed(self, tok: str) -> Optional[GuardResult]:
+        """喂入一个 token；命中 block 时返回 block 结果（之后的 feed 直接返回同一结果）。"""
+        if self.result is not None:
+            return self.result
+        self.tokens += 1
+        self.fields.feed(tok)
+
+        cand = self.spoken()[:self.max_chars]
+        if cand == self._checked:
+            # 本 token 没改变会被播报的内容（如正在输出 used_ids）
+            return None
+        self._checked = cand
+
+        reasons: List[str] = self.guard.check_block(cand)
+        if reasons:
+            self.result = GuardResult(level="block", reasons=reasons, safe_text=self.guard.block_fallback)
+        return self.result
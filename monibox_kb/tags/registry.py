@@ -86,6 +86,21 @@ class TagRegistry:
 
         return TagRegistry(allowed_ids=allowed, name_to_id=name_to_id, alias_map=alias_map)
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "allowed_ids": sorted(self.allowed_ids),
+            "name_to_id": dict(self.name_to_id),
+            "alias_map": {k: list(v) for k, v in self.alias_map.items()},
+        }
+
+    @staticmethod
+    def from_dict(obj: Dict[str, Any]) -> "TagRegistry":
+        return TagRegistry(
+            allowed_ids=set(obj.get("allowed_ids", [])),
+            name_to_id=dict(obj.get("name_to_id", {})),
+            alias_map={k: list(v) for k, v in (obj.get("alias_map") or {}).items()},
+        )
+
     def _resolve_alias(self, tag_id: str) -> Optional[str]:
         """
         给一个 tag_id（已 slugify）尝试走 alias。
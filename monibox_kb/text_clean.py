@@ -1,4 +1,5 @@
 import re
+from typing import List
 
 def clean_text(s: str) -> str:
     """
@@ -6,4 +7,53 @@ def clean_text(s: str) -> str:
     你后续可以加入：全角半角统一、敏感信息剔除等。
     """
     s = re.sub(r"\s+", " ", s).strip()
-    return s
\ No newline at end of file
+    return s
+
+
+# TTS 友好的后处理（会话层与事件快速通道共用）
+def normalize_for_tts(text: str) -> str:
+    """清理换行/多空格，让 TTS 更稳定。"""
+    t = (text or "").strip()
+    t = t.replace("\r", " ").replace("\n", " ")
+    while "  " in t:
+        t = t.replace("  ", " ")
+    return t.strip()
+
+
+def limit_chars(text: str, max_chars: int = 60) -> str:
+    """
+    限制最大字符数（中文按 len 计即可）。
+    这里硬截断，不加省略号，避免 TTS 读“省略号”影响节奏。
+    """
+    t = normalize_for_tts(text)
+    if len(t) <= max_chars:
+        return t
+    return t[:max_chars].strip()
+
+
+# 句末标点：流式播报时按句切分
+SENTENCE_END = "。！？!?；;\n"
+
+
+class SentenceSplitter:
+    """
+    流式切句：feed(piece) 返回已完整的句子（含句末标点），flush() 返回剩余部分。
+    max_len > 0 时，缓冲超过 max_len 也直接切出（调用方反正要截断，不必等标点）。
+    """
+
+    def __init__(self, max_len: int = 0):
+        self.max_len = max_len
+        self._buf = ""
+
+    def feed(self, piece: str) -> List[str]:
+        out: List[str] = []
+        for ch in piece or "":
+            self._buf += ch
+            if ch in SENTENCE_END or (self.max_len and len(self._buf) >= self.max_len):
+                out.append(self._buf)
+                self._buf = ""
+        return out
+
+    def flush(self) -> str:
+        rest, self._buf = self._buf, ""
+        return rest
@@ -0,0 +1,133 @@
+"""
+monibox_kb/text_match.py
+
+用途
+-----
+多模式子串匹配（Aho-Corasick）：一次扫描文本，找出所有命中的词。
+
+端侧的路由召回词、协议 text_contains_any、安全护栏关键词，本质都是
+“很多个固定词，判断哪些出现在文本里”。逐词 `term in text` 的开销随词表线性增长，
+这里把词表编译成一个自动机，扫描一遍文本即可拿到全部命中（包括互相重叠的词，如“咳”与“咳嗽”）。
+
+说明
+----
+- 只用 dict/list 存储，可直接 pickle 进编译产物（build/router_pack.bin）
+- 支持流式喂入（feed），用于 token 流上的跨边界匹配
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class TermMatcher:
+    """
+    Aho-Corasick 自动机：
+    - terms: 需要匹配的词（空串自动忽略，重复词只保留一次）
+    - find_all(text): 返回命中的词集合
+    - scan(text): 返回 [(end_pos, term), ...]，end_pos 为命中词最后一个字符之后的位置
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        seen: Set[str] = set()
+        for t in terms:
+            t = str(t or "")
+            if not t or t in seen:
+                continue
+            seen.add(t)
+            self._add(t, len(self.terms))
+            self.terms.append(t)
+        self._build()
+
+    def _add(self, term: str, idx: int):
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(idx)
+
+    def _build(self):
+        # BFS 构建 fail 指针，并把 fail 链上的输出合并到当前节点（查询时不必再沿链回溯）
+        queue: List[int] = []
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def step(self, state: int, ch: str) -> int:
+        """自动机单步转移（流式匹配用）。"""
+        goto = self._goto
+        fail = self._fail
+        while state and ch not in goto[state]:
+            state = fail[state]
+        return goto[state].get(ch, 0)
+
+    def outputs(self, state: int) -> List[str]:
+        """当前状态命中的词（可能为空）。"""
+        return [self.terms[i] for i in self._out[state]]
+
+    def scan(self, text: str) -> List[Tuple[int, str]]:
+        hits: List[Tuple[int, str]] = []
+        if not text or not self.terms:
+            return hits
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        terms = self.terms
+
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for idx in out[state]:
+                    hits.append((i + 1, terms[idx]))
+        return hits
+
+    def find_all(self, text: str) -> Set[str]:
+        return {t for _, t in self.scan(text)}
+
+    def contains_any(self, text: str) -> bool:
+        if not text or not self.terms:
+            return False
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
@@ -0,0 +1,102 @@
+"""
+monibox_kb/tts/audio_cache.py
+
+用途
+-----
+预渲染音频缓存：协议 tts 文本、高分 chunk 的固定文本在构建期合成成 wav，运行期命中直接播放，
+不用等 TTS 引擎现场合成（余震等协议第一句立即开播）。
+
+- 键：sha256(引擎名 | 音色参数 | normalize_for_tts(文本))[:20]；换了引擎 / 语速 / 音量自动不命中
+- 目录：<cache_dir>/index.json + <key>.wav；index.json 记录 key -> {file, text, engine, voice}
+- CachedTTS(backend, cache)：包一层 TTS 后端，synthesize 先查缓存，未命中才交给后端合成
+
+构建：python -m scripts.render_audio_cache（默认输出 build/audio）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from monibox_kb.paths import PROJECT_ROOT
+from monibox_kb.text_clean import normalize_for_tts
+from monibox_kb.tts.service import Audio
+
+
+INDEX_NAME = "index.json"
+
+
+def audio_key(engine: str, voice: str, text: str) -> str:
+    raw = f"{engine}|{voice}|{normalize_for_tts(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _resolve(path: str) -> Path:
+    p = Path(path)
+    return p if p.is_absolute() else (PROJECT_ROOT / p).resolve()
+
+
+class AudioCache:
+    def __init__(self, cache_dir: str):
+        self.dir = _resolve(cache_dir)
+        self.index: Dict[str, Dict[str, Any]] = {}
+        idx = self.dir / INDEX_NAME
+        if idx.exists():
+            self.index = json.loads(idx.read_text(encoding="utf-8")).get("entries", {})
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def lookup(self, engine: str, voice: str, text: str) -> Optional[Path]:
+        ent = self.index.get(audio_key(engine, voice, text))
+        if not ent:
+            return None
+        p = self.dir / ent["file"]
+        return p if p.exists() else None
+
+    def add(self, engine: str, voice: str, text: str) -> Path:
+        """登记一条（调用方负责把音频写到返回的路径）。"""
+        key = audio_key(engine, voice, text)
+        self.index[key] = {"file": f"{key}.wav", "text": normalize_for_tts(text), "engine": engine, "voice": voice}
+        return self.dir / f"{key}.wav"
+
+    def save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / INDEX_NAME).write_text(
+            json.dumps({"entries": self.index}, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+class CachedTTS:
+    """TTS 后端包装：命中预渲染缓存时直接给出 wav，未命中交给原后端合成。"""
+
+    def __init__(self, backend: Any, cache: AudioCache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+        self.hits = 0
+        self.misses = 0
+
+    def voice_key(self) -> str:
+        return self.backend.voice_key()
+
+    def synthesize(self, text: str, style: Optional[str] = None) -> Audio:
+        path = self.cache.lookup(self.name, self.voice_key(), text)
+        if path is not None:
+            self.hits += 1
+            return Audio(text=text, path=path, cached=True)
+        self.misses += 1
+        return self.backend.synthesize(text, style)
+
+    def play(self, audio: Audio):
+        self.backend.play(audio)
+
+    def speak(self, text: str):
+        self.play(self.synthesize(text))
+
+    def stop(self):
+        self.backend.stop()
+
+    def reset_stop(self):
+        self.backend.reset_stop()
@@ -0,0 +1,80 @@
+"""
+monibox_kb/tts/null_tts.py
+
+用途
+-----
+无声 TTS 后端：不出声，只按字数模拟合成 / 播放耗时并记录时间线，
+用于在 Linux 无头环境里测 TTSService 流水线（合成与播放是否重叠、打断是否及时、首句延迟）。
+
+timeline: [(perf_counter 时间戳, 事件, 文本)]
+  事件：synth_start / synth_end / play_start / play_end / play_stop
+设置 TTS_BACKEND=null 时 MoniSession 用它代替 pyttsx3。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from monibox_kb.tts.service import Audio
+
+
+class NullTTS:
+    name = "null"
+
+    def __init__(self, synth_ms_per_char: float = 0.0, play_ms_per_char: float = 0.0, quiet: bool = True):
+        self.synth_ms_per_char = synth_ms_per_char
+        self.play_ms_per_char = play_ms_per_char
+        self.quiet = quiet
+        self.timeline: List[Tuple[float, str, str]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _record(self, kind: str, text: str):
+        with self._lock:
+            self.timeline.append((time.perf_counter(), kind, text))
+
+    def events(self, kind: str) -> List[Tuple[float, str, str]]:
+        with self._lock:
+            return [x for x in self.timeline if x[1] == kind]
+
+    def voice_key(self) -> str:
+        return "null"
+
+    def synthesize(self, text: str, style: Optional[str] = None) -> Audio:
+        self._record("synth_start", text)
+        if self.synth_ms_per_char > 0:
+            time.sleep(len(text) * self.synth_ms_per_char / 1000.0)
+        self._record("synth_end", text)
+        return Audio(text=text)
+
+    def play(self, audio: Audio):
+        self._record("play_start", audio.text)
+        if not self.quiet:
+            print(f"[TTS] {audio.text}")
+        stopped = False
+        if self.play_ms_per_char > 0:
+            stopped = self._stop.wait(len(audio.text) * self.play_ms_per_char / 1000.0)
+        self._record("play_stop" if stopped else "play_end", audio.text)
+
+    def render_to_file(self, text: str, path: Path, sample_rate: int = 16000):
+        """写一段与播放时长相同的静音 wav（预渲染缓存的无头构建 / 测试用）。"""
+        seconds = max(0.1, len(text) * self.play_ms_per_char / 1000.0)
+        with wave.open(str(path), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sample_rate)
+            w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+    def speak(self, text: str):
+        self.reset_stop()
+        self.play(self.synthesize(text))
+
+    def stop(self):
+        self._stop.set()
+
+    def reset_stop(self):
+        self._stop.clear()
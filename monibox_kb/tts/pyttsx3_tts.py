@@ -1,14 +1,74 @@
 from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
 import pyttsx3
 
+from monibox_kb.tts.service import Audio, can_play_wav, play_wav
+
+
 class Pyttsx3TTS:
+    """
+    pyttsx3 后端：
+    - speak(text)：直接朗读（阻塞到播完）
+    - synthesize / play / stop：给 TTSService 用。本机能播 wav（Windows winsound / Linux aplay）时
+      先 save_to_file 合成到临时 wav，播放与下一句的合成可以重叠；否则 synthesize 只包文本，play 时直接朗读
+    """
+
+    name = "pyttsx3"
+
     def __init__(self, rate: int = 180, volume: float = 1.0):
         self.engine = pyttsx3.init()
         self.engine.setProperty("rate", rate)
         self.engine.setProperty("volume", volume)
+        self.rate = rate
+        self.volume = volume
+        self.file_mode = can_play_wav()
+        self._voice = f"{self.engine.getProperty('voice') or ''}|rate={rate}|volume={volume}"
+        # pyttsx3 引擎不是线程安全的：合成线程与直接朗读不能同时用
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def voice_key(self) -> str:
+        """音色参数（预渲染音频缓存的键的一部分）。"""
+        return self._voice
 
     def speak(self, text: str):
         if not text:
             return
-        self.engine.say(text)
-        self.engine.runAndWait()
\ No newline at end of file
+        with self._lock:
+            self.engine.say(text)
+            self.engine.runAndWait()
+
+    def render_to_file(self, text: str, path: Path):
+        with self._lock:
+            self.engine.save_to_file(text, str(path))
+            self.engine.runAndWait()
+
+    def synthesize(self, text: str, style: Optional[str] = None) -> Audio:
+        if not self.file_mode:
+            return Audio(text=text)
+        fd, path = tempfile.mkstemp(prefix="monibox_tts_", suffix=".wav")
+        os.close(fd)
+        self.render_to_file(text, Path(path))
+        return Audio(text=text, path=Path(path), temp=True)
+
+    def play(self, audio: Audio):
+        if audio.path is not None and play_wav(audio.path, self._stop):
+            return
+        self.speak(audio.text)
+
+    def stop(self):
+        """打断当前播报（协议抢占时调用）。"""
+        self._stop.set()
+        if not self.file_mode:
+            # 文件模式下引擎可能正在合成下一句，不能停
+            self.engine.stop()
+
+    def reset_stop(self):
+        """清除打断标记（TTSService 播放线程在开播前调用）。"""
+        self._stop.clear()
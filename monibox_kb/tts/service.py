@@ -0,0 +1,284 @@
+"""
+monibox_kb/tts/service.py
+
+用途
+-----
+句子级流式 TTS 服务：合成与播放拆成两个线程，中间是带优先级的队列。
+  enqueue(句子) -> [待合成（优先级堆）] -> 合成线程 -> [已合成（优先级堆，最多 lookahead 条）] -> 播放线程
+
+- 播放当前句的同时合成下一句（pyttsx3 的 runAndWait 不再阻塞会话，也不再串行“合成 + 播放”）
+- 优先级：数字越小越先播（PRIO_PROTOCOL < PRIO_REPLY）；协议播报插到尚未播放的回复句子前面
+- flush()：丢弃所有未播放的句子；interrupt()：flush + 打断当前播放
+- join()：等全部播完；first_audio_at：reset_turn() 之后第一句开始播放的时刻（perf_counter）
+- 与 runtime.speech_queue.SpeechQueue 接口兼容（put / join / clear / close / reset_turn / first_audio_at），
+  ReplyStreamer 可直接把句子送进来
+
+后端（duck typing）：
+- synthesize(text, style) -> Audio     合成（可以只是包一下文本，由 play 直接朗读）
+- play(audio)                          阻塞到播完或被 stop() 打断
+- stop()                               打断当前播放（置位后 play 立即返回，直到 reset_stop）
+- reset_stop()                         清除打断标记：由播放线程在开播前、持锁核对 epoch 时调用，
+                                       play 自己不清（否则 interrupt 落在出队与开播之间时会被吞掉）
+见 pyttsx3_tts.Pyttsx3TTS（实机）与 null_tts.NullTTS（无声，记录时间线，Linux 无头测试用）。
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+try:
+    import winsound
+except ImportError:     # 非 Windows
+    winsound = None
+
+
+PRIO_PROTOCOL = 0
+PRIO_REPLY = 10
+
+
+@dataclass
+class Audio:
+    """合成结果：path 为 wav 文件（temp=True 时播完删除）；path 为空时由后端直接朗读 text。"""
+    text: str
+    path: Optional[Path] = None
+    temp: bool = False
+    cached: bool = False
+
+
+@dataclass
+class SpeechItem:
+    text: str
+    priority: int = PRIO_REPLY
+    style: Optional[str] = None
+    epoch: int = 0
+    done: threading.Event = field(default_factory=threading.Event)
+    dropped: bool = False
+    audio: Optional[Audio] = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+
+# -----------------------------
+# wav 播放（合成到文件 / 预渲染缓存共用）
+# -----------------------------
+def wav_duration_s(path: Path) -> float:
+    with wave.open(str(path), "rb") as w:
+        return w.getnframes() / float(w.getframerate() or 1)
+
+
+def can_play_wav() -> bool:
+    return winsound is not None or shutil.which("aplay") is not None
+
+
+def play_wav(path: Path, stop: threading.Event) -> bool:
+    """
+    播放 wav，阻塞到播完或 stop 被置位（置位时立即停止）。
+    返回 False 表示本机没有可用的播放方式（调用方改为直接朗读）。
+    """
+    if winsound is not None:
+        winsound.PlaySound(str(path), winsound.SND_FILENAME | winsound.SND_ASYNC)
+        if stop.wait(wav_duration_s(path)):
+            winsound.PlaySound(None, 0)
+        return True
+    aplay = shutil.which("aplay")
+    if aplay:
+        proc = subprocess.Popen([aplay, "-q", str(path)])
+        while proc.poll() is None:
+            if stop.wait(0.02):
+                proc.terminate()
+                proc.wait()
+                break
+        return True
+    return False
+
+
+def make_backend(name: Optional[str] = None) -> Any:
+    """按 TTS_BACKEND（pyttsx3 / null）创建后端；pyttsx3 只在用到时才导入。"""
+    name = (name or os.getenv("TTS_BACKEND", "pyttsx3")).strip().lower()
+    if name == "null":
+        from monibox_kb.tts.null_tts import NullTTS
+        return NullTTS(play_ms_per_char=float(os.getenv("NULL_TTS_MS_PER_CHAR", "0")))
+    from monibox_kb.tts.pyttsx3_tts import Pyttsx3TTS
+    return Pyttsx3TTS(
+        rate=int(os.getenv("TTS_RATE", "180")),
+        volume=float(os.getenv("TTS_VOLUME", "1.0")),
+    )
+
+
+def discard_audio(audio: Optional[Audio]):
+    if audio is not None and audio.temp and audio.path is not None:
+        try:
+            os.unlink(audio.path)
+        except OSError:
+            pass
+
+
+class TTSService:
+    def __init__(self, backend: Any, lookahead: int = 1, style: Optional[str] = None):
+        self.backend = backend
+        self.lookahead = max(1, lookahead)
+        self.style = style
+        self.first_audio_at: Optional[float] = None
+        self.errors: List[str] = []
+
+        self._cv = threading.Condition()
+        self._seq = itertools.count()
+        self._epoch = 0
+        self._pending: List[Tuple[int, int, SpeechItem]] = []
+        self._ready: List[Tuple[int, int, SpeechItem]] = []
+        self._synthesizing = 0
+        self._playing: Optional[SpeechItem] = None
+        self._closed = False
+
+        self._synth_thread = threading.Thread(target=self._synth_loop, name="tts-synth", daemon=True)
+        self._play_thread = threading.Thread(target=self._play_loop, name="tts-play", daemon=True)
+        self._synth_thread.start()
+        self._play_thread.start()
+
+    # -----------------------------
+    # 对外接口
+    # -----------------------------
+    def enqueue(self, text: str, priority: int = PRIO_REPLY, style: Optional[str] = None) -> SpeechItem:
+        item = SpeechItem(text=text or "", priority=priority, style=style or self.style)
+        if not item.text.strip():
+            item.dropped = True
+            item.done.set()
+            return item
+        with self._cv:
+            item.epoch = self._epoch
+            heapq.heappush(self._pending, (priority, next(self._seq), item))
+            self._cv.notify_all()
+        return item
+
+    def put(self, text: str):
+        """SpeechQueue 兼容：回复句子按默认优先级入队。"""
+        if text:
+            self.enqueue(text)
+
+    def flush(self) -> int:
+        """丢弃所有未播放的句子（正在合成的结果也作废），返回丢弃条数。"""
+        with self._cv:
+            self._epoch += 1
+            dropped = self._pending + self._ready
+            self._pending, self._ready = [], []
+            self._cv.notify_all()
+        for _, _, item in dropped:
+            discard_audio(item.audio)
+            item.dropped = True
+            item.done.set()
+        return len(dropped)
+
+    def interrupt(self) -> int:
+        n = self.flush()
+        self.backend.stop()
+        return n
+
+    def clear(self):
+        """SpeechQueue 兼容：清空队列并打断当前播报。"""
+        self.interrupt()
+
+    def stop_current(self):
+        """只打断当前这一句，队列继续。"""
+        self.backend.stop()
+
+    def idle(self) -> bool:
+        with self._cv:
+            return not (self._pending or self._ready or self._synthesizing or self._playing)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cv:
+            while self._pending or self._ready or self._synthesizing or self._playing:
+                left = None if deadline is None else deadline - time.perf_counter()
+                if left is not None and left <= 0:
+                    return False
+                self._cv.wait(left)
+        return True
+
+    def reset_turn(self):
+        self.first_audio_at = None
+
+    def close(self):
+        self.flush()
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        self.backend.stop()
+        self._synth_thread.join(timeout=2.0)
+        self._play_thread.join(timeout=2.0)
+
+    # -----------------------------
+    # 工作线程
+    # -----------------------------
+    def _can_synth(self) -> bool:
+        """已合成的不足 lookahead 条，或待合成里有比已合成更高优先级的（协议插队）。"""
+        if not self._pending:
+            return False
+        return len(self._ready) < self.lookahead or self._pending[0][0] < self._ready[0][0]
+
+    def _synth_loop(self):
+        while True:
+            with self._cv:
+                while not self._closed and not self._can_synth():
+                    self._cv.wait()
+                if self._closed:
+                    return
+                _, seq, item = heapq.heappop(self._pending)
+                self._synthesizing += 1
+            audio = None
+            try:
+                audio = self.backend.synthesize(item.text, item.style)
+            except Exception as e:
+                self.errors.append(f"synthesize: {type(e).__name__}: {e}")
+                audio = Audio(text=item.text)
+            with self._cv:
+                self._synthesizing -= 1
+                if item.epoch == self._epoch and not self._closed:
+                    item.audio = audio
+                    heapq.heappush(self._ready, (item.priority, seq, item))
+                    audio = None
+                self._cv.notify_all()
+            if audio is not None:       # flush 期间合成完的：作废
+                discard_audio(audio)
+                item.dropped = True
+                item.done.set()
+
+    def _play_loop(self):
+        while True:
+            with self._cv:
+                while not self._closed and not self._ready:
+                    self._cv.wait()
+                if self._closed:
+                    return
+                _, _, item = heapq.heappop(self._ready)
+                self._playing = item
+                self._cv.notify_all()
+                # 与 flush 同一把锁：这里之后的 interrupt 一定作用在本句上（stop 标记留到 play 里）
+                self.backend.reset_stop()
+                stale = item.epoch != self._epoch
+            try:
+                if stale:     # 出队后、开播前被 flush
+                    item.dropped = True
+                    continue
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+                self.backend.play(item.audio)
+            except Exception as e:
+                self.errors.append(f"play: {type(e).__name__}: {e}")
+            finally:
+                discard_audio(item.audio)
+                with self._cv:
+                    self._playing = None
+                    self._cv.notify_all()
+                item.done.set()
@@ -22,7 +22,6 @@ utils_json.py
 import json
 import re
 from typing import Any, Optional
-import json5
 
 
 def strip_fences(text: str) -> str:
@@ -91,13 +90,19 @@ def repair_unclosed_brackets(s: str) -> str:
     return s + "".join(closing)
 
 
+def _json5_loads(block: str) -> Any:
+    """json5 只在 strict json 失败时才用到：首次用到时再导入（正常输出不付它的导入开销）。"""
+    import json5
+    return json5.loads(block)
+
+
 def _try_parse_json(block: str) -> Any:
     """strict json + json5 两段兜底解析。"""
     try:
         return json.loads(block)
     except Exception:
         pass
-    return json5.loads(block)
+    return _json5_loads(block)
 
 
 def _find_first_balanced_json_block(t: str) -> Optional[str]:
@@ -205,7 +210,7 @@ def extract_json(text: str) -> Any:
 
     # 5) json5 兜底（允许单引号/尾逗号/未加引号 key）
     try:
-        return json5.loads(block2)
+        return _json5_loads(block2)
     except Exception as e:
         raise ValueError(
             "JSON解析失败（strict json 与 json5 都失败）。\n"
@@ -3,6 +3,7 @@ auto_flag_unsafe_chunks.py (v2)
 用途：
 - 扫描 rag.db chunks.text
 - 用 SafetyGuard 判断：allow / rewrite / block
+  增量：guard_verdicts 表里规则版本一致的指纹直接复用判定，只重查缺失/版本变化的，并写回该表
 - 输出审计报告
 - 可选对：
   - block：停用（status='停用'）
@@ -20,6 +21,12 @@ auto_flag_unsafe_chunks.py (v2)
 
 4) 实际执行（block停用 + rewrite也停用，最保守）：
    python -m scripts.auto_flag_unsafe_chunks --rewrite_action disable
+
+5) 大库审计：多进程判定
+   python -m scripts.auto_flag_unsafe_chunks --dry_run --workers 4
+
+6) 忽略已存判定，全部重查：
+   python -m scripts.auto_flag_unsafe_chunks --dry_run --full
 """
 
 import argparse
@@ -30,6 +37,7 @@ from typing import List, Dict, Any
 
 from monibox_kb.config import settings
 from monibox_kb.paths import GENERATED_DIR as GEN
+from monibox_kb.runtime.guard_verdicts import compute_rows, ensure_table, row_to_result, write_rows
 from monibox_kb.runtime.safety_guard import SafetyGuard
 
 
@@ -46,6 +54,10 @@ def main():
     ap.add_argument("--rewrite_penalty", type=float, default=-1.0,
                     help="rewrite_action=penalize 时，将 quality_score 降到该值（默认 -1）")
 
+    ap.add_argument("--workers", type=int, default=1,
+                    help="SafetyGuard.check_many 的进程数（全库审计时可设为 CPU 核数）")
+    ap.add_argument("--full", action="store_true", help="忽略 guard_verdicts 中已存判定，全部重查")
+
     args = ap.parse_args()
 
     db_path = settings.rag_db_path
@@ -55,14 +67,36 @@ def main():
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
+    ensure_table(conn)
     rows = cur.execute("""
-        SELECT id, chunk_id, display_id, group_id, text, status, source_id, dimension, risk, quality_score
-        FROM chunks
+        SELECT c.id, c.chunk_id, c.display_id, c.group_id, c.text, c.status, c.source_id, c.dimension, c.risk,
+               c.quality_score, c.fingerprint,
+               v.rules_version AS v_version, v.level AS v_level, v.reasons AS v_reasons, v.safe_text AS v_safe_text
+        FROM chunks c
+        LEFT JOIN guard_verdicts v ON v.fingerprint = c.fingerprint
     """).fetchall()
 
     if args.limit and args.limit > 0:
         rows = rows[:args.limit]
 
+    # 增量：规则版本一致的直接复用，其余（缺失/规则变了/--full）重查并写回
+    results: Dict[str, Any] = {}
+    stale = []
+    for r in rows:
+        if not args.full and r["v_version"] == guard.rules_version:
+            results[r["fingerprint"]] = row_to_result(r["v_level"], r["v_reasons"], r["v_safe_text"])
+        else:
+            stale.append((r["fingerprint"], r["text"] or ""))
+    reused = len(rows) - len(stale)
+
+    new_rows = compute_rows(guard, stale, source="chunk", workers=args.workers)
+    for fp, _src, _ver, level, reasons, safe_text in new_rows:
+        results[fp] = row_to_result(level, reasons, safe_text)
+    if new_rows:
+        # 判定缓存与 dry_run 无关：只记录规则结论，不改 chunks
+        write_rows(conn, new_rows)
+        conn.commit()
+
     block_items: List[Dict[str, Any]] = []
     rewrite_items: List[Dict[str, Any]] = []
     allow_count = 0
@@ -73,7 +107,7 @@ def main():
 
     for r in rows:
         text = r["text"] or ""
-        res = guard.check(text)
+        res = results[r["fingerprint"]]
 
         base = {
             "id": int(r["id"]),
@@ -114,6 +148,9 @@ def main():
     REPORT_PATH.write_text(json.dumps({
         "db": db_path,
         "scanned": len(rows),
+        "rules_version": guard.rules_version,
+        "verdicts_reused": reused,
+        "verdicts_rechecked": len(new_rows),
         "allow": allow_count,
         "rewrite": len(rewrite_items),
         "block": len(block_items),
@@ -128,6 +165,7 @@ def main():
     print("==== auto_flag_unsafe_chunks (v2) ====")
     print("db:", db_path)
     print("scanned:", len(rows))
+    print(f"verdicts: reused={reused} rechecked={len(new_rows)} rules_version={guard.rules_version}")
     print("allow:", allow_count)
     print("rewrite:", len(rewrite_items))
     print("block:", len(block_items))
@@ -0,0 +1,121 @@
+"""
+bench_asr_early.py
+用途：在录好的 wav 上量“流式识别 + 部分结果先跑协议匹配”比“整段识别完再匹配”提前多少下发协议。
+
+- 基线：transcribe(整段) -> 路由 -> 协议匹配，协议下发时刻 = 整段识别耗时 + 匹配耗时
+- 流式：transcribe_stream(probe_s) 每出一段就匹配（partial 段对临时假设、其余对已确定文本），
+  第一次命中的时刻即协议下发时刻
+- 只统计两边都命中同一协议的文件；没命中协议的文件照样列出（看识别文本是否正常）
+- 同时量完整文本的完成时刻：探测是整段识别之前多跑的一遍解码，每句话（包括不命中协议的）都要付；
+  输出 full（不探测）与 stream（带探测）识别完的耗时差，决定 ASR_PROBE_S 是否值得打开
+- wav 为 16-bit PCM（采样率不同时自动重采样）；每个文件先跑一遍预热，避免首次加载计入
+
+运行：
+  python -m scripts.bench_asr_early fixtures/asr/余震_01.wav fixtures/asr/*.wav
+  python -m scripts.bench_asr_early --probe 1.0 --repeat 3 fixtures/asr/*.wav
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from monibox_kb.asr.faster_whisper_asr import FasterWhisperASR, WhisperASRConfig
+from monibox_kb.audio.stream_capture import load_wav
+from monibox_kb.paths import PROJECT_ROOT
+from monibox_kb.routing.router import AutoRouter
+from monibox_kb.runtime.protocol_engine import ProtocolEngine
+
+
+def match(router: AutoRouter, prot: ProtocolEngine, text: str, top_tags: int):
+    rr = router.route(text, top_tags=top_tags)
+    return prot.match(text, rr.tags, [])
+
+
+def run_full(asr, router, prot, audio, top_tags):
+    t0 = time.perf_counter()
+    text = asr.transcribe(audio)
+    hit = match(router, prot, text, top_tags)
+    return text, hit, (time.perf_counter() - t0) * 1000.0
+
+
+def run_stream(asr, router, prot, audio, probe_s, top_tags):
+    t0 = time.perf_counter()
+    text, hit, hit_ms = "", None, None
+    for seg in asr.transcribe_stream(audio, probe_s=probe_s):
+        if not seg.partial:
+            text += seg.text
+        if hit is None:
+            hit = match(router, prot, seg.text.strip() if seg.partial else text.strip(), top_tags)
+            if hit:
+                hit_ms = (time.perf_counter() - t0) * 1000.0
+    return text.strip(), hit, hit_ms, (time.perf_counter() - t0) * 1000.0
+
+
+def main():
+    load_dotenv(PROJECT_ROOT / ".env")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("wavs", nargs="+")
+    ap.add_argument("--probe", type=float, default=1.5,
+                    help="开头贪心探测秒数（0 关闭，只靠分段；会话里由 ASR_PROBE_S 控制，默认关闭）")
+    ap.add_argument("--repeat", type=int, default=1, help="每个文件重复次数（取中位数）")
+    ap.add_argument("--top_tags", type=int, default=2)
+    args = ap.parse_args()
+
+    asr = FasterWhisperASR(WhisperASRConfig(
+        model_dir=os.getenv("WHISPER_MODEL_DIR", "models/asr/faster-whisper-small"),
+        device=os.getenv("WHISPER_DEVICE", "cpu"),
+        compute_type=os.getenv("WHISPER_COMPUTE_TYPE", "int8"),
+        language=os.getenv("WHISPER_LANGUAGE", "zh"),
+    ))
+    router = AutoRouter()
+    prot = ProtocolEngine()
+
+    saved = []
+    overhead = []
+    for path in args.wavs:
+        audio = load_wav(path, sample_rate=FasterWhisperASR.SAMPLE_RATE)
+        dur = len(audio) / float(FasterWhisperASR.SAMPLE_RATE)
+        asr.transcribe(audio[: FasterWhisperASR.SAMPLE_RATE])    # 预热
+
+        full_ms, early_ms, done_ms = [], [], []
+        text = stext = ""
+        hit = shit = None
+        for _ in range(max(1, args.repeat)):
+            text, hit, ms = run_full(asr, router, prot, audio, args.top_tags)
+            full_ms.append(ms)
+            stext, shit, hit_ms, total_ms = run_stream(asr, router, prot, audio, args.probe, args.top_tags)
+            done_ms.append(total_ms)
+            if hit_ms is not None:
+                early_ms.append(hit_ms)
+
+        name = os.path.basename(path)
+        pid = str(hit.get("protocol_id", "")) if hit else ""
+        spid = str(shit.get("protocol_id", "")) if shit else ""
+        f_done, s_done = statistics.median(full_ms), statistics.median(done_ms)
+        overhead.append(s_done - f_done)
+        print(f"\n[{name}] {dur:.1f}s  text={text!r}")
+        print(f"  full text: no_probe={f_done:.0f}ms  probe={s_done:.0f}ms  cost={s_done - f_done:+.0f}ms")
+        if not pid:
+            print("  无协议命中")
+            continue
+        if pid != spid or not early_ms:
+            print(f"  协议不一致：full={pid} stream={spid or '-'}  stream_text={stext!r}")
+            continue
+        f, e = statistics.median(full_ms), statistics.median(early_ms)
+        saved.append(f - e)
+        print(f"  protocol={pid}  full={f:.0f}ms  early={e:.0f}ms  saved={f - e:.0f}ms")
+
+    if saved:
+        print(f"\n命中协议 {len(saved)}/{len(args.wavs)} 个文件：平均提前 {statistics.mean(saved):.0f}ms，"
+              f"中位数 {statistics.median(saved):.0f}ms，合计 {sum(saved):.0f}ms")
+    else:
+        print("\n没有可比较的协议命中")
+    print(f"完整文本完成时刻（probe={args.probe}s）：平均 {statistics.mean(overhead):+.0f}ms，"
+          f"中位数 {statistics.median(overhead):+.0f}ms（每句话都要付）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+bench_capture_headless.py
+用途：不需要麦克风，用合成音频（底噪 + 正弦“语音”段）检查 StreamCapture 的断句，ArraySource / WavSource 各跑一遍。
+
+检查项（任一不满足退出码为 1）：
+1) 断句：每段语音切出一个 Utterance，起点 ≈ 语音开始 - pre_roll，终点 ≈ 语音结束 + tail（误差 <= 1 帧）
+2) 截断：超过 max_utterance_s 的长段被强制结束（truncated=True，长度不超过上限）
+3) WavSource（16-bit wav 文件）与 ArraySource 的切分结果一致（量化误差之内）
+4) 实时推送（speed=1）：语音结束 -> 交出本段的延迟 ≈ end_silence_ms（不超过 end_silence_ms + --slack_ms）
+
+运行：
+  python -m scripts.bench_capture_headless
+  python -m scripts.bench_capture_headless --end_silence_ms 300 --no_realtime
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+from typing import List, Tuple
+
+import numpy as np
+
+from monibox_kb.audio.stream_capture import ArraySource, StreamCapture, Utterance, WavSource
+
+
+SR = 16000
+FRAME_MS = 30
+
+# (开始秒, 结束秒)：两句正常长度的话 + 一段超过 max_utterance_s 的长段
+SPEECH = [(0.5, 1.7), (2.5, 3.1), (4.1, 8.1)]
+TOTAL_S = 9.5
+MAX_UTTERANCE_S = 2.0
+
+
+def synth_audio(speech: List[Tuple[float, float]], total_s: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0.0, 0.002, int(total_s * SR)).astype(np.float32)
+    t = np.arange(len(audio)) / SR
+    for a, b in speech:
+        i, j = int(a * SR), int(b * SR)
+        audio[i:j] += 0.2 * np.sin(2 * np.pi * 220.0 * t[i:j]).astype(np.float32)
+    return audio
+
+
+def write_wav(path: str, audio: np.ndarray):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SR)
+        w.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+
+
+def capture(source, end_silence_ms: int) -> List[Utterance]:
+    cap = StreamCapture(source, sample_rate=SR, frame_ms=FRAME_MS, end_silence_ms=end_silence_ms,
+                        max_utterance_s=MAX_UTTERANCE_S)
+    cap.start()
+    out = []
+    try:
+        while True:
+            utt = cap.next_utterance(timeout=20.0)
+            if utt is None:
+                break
+            out.append(utt)
+    finally:
+        cap.stop()
+    return out
+
+
+def check_segments(name: str, utts: List[Utterance], pre_roll_s: float, tail_s: float) -> List[str]:
+    frame_s = FRAME_MS / 1000.0
+    print(f"[{name}] " + ", ".join(f"{u.start / SR:.2f}-{u.end / SR:.2f}s{'(T)' if u.truncated else ''}" for u in utts))
+    fails = []
+    for a, b in SPEECH[:2]:
+        exp_start, exp_end = max(0.0, a - pre_roll_s), b + tail_s
+        hit = [u for u in utts if abs(u.start / SR - exp_start) <= frame_s and abs(u.end / SR - exp_end) <= frame_s]
+        if not hit:
+            fails.append(f"{name}: 没有切出 {exp_start:.2f}-{exp_end:.2f}s 的一段（语音 {a}-{b}s）")
+        elif hit[0].truncated:
+            fails.append(f"{name}: {a}-{b}s 不该被截断")
+    long = [u for u in utts if u.start / SR >= SPEECH[2][0] - pre_roll_s - frame_s]
+    if not long or not long[0].truncated:
+        fails.append(f"{name}: {SPEECH[2][1] - SPEECH[2][0]:.0f}s 的长段没有在 {MAX_UTTERANCE_S}s 处截断")
+    elif long[0].seconds > MAX_UTTERANCE_S + frame_s:
+        fails.append(f"{name}: 截断段长 {long[0].seconds:.2f}s 超过上限 {MAX_UTTERANCE_S}s")
+    return fails
+
+
+def check_realtime(end_silence_ms: int, slack_ms: float) -> List[str]:
+    a, b = 0.3, 1.0
+    audio = synth_audio([(a, b)], 2.0, seed=1)
+    src = ArraySource(audio, sample_rate=SR, speed=1.0)
+    cap = StreamCapture(src, sample_rate=SR, frame_ms=FRAME_MS, end_silence_ms=end_silence_ms)
+    t0 = time.perf_counter()
+    cap.start()
+    try:
+        utt = cap.next_utterance(timeout=5.0)
+    finally:
+        cap.stop()
+    if utt is None:
+        return ["realtime: 没有切出语音段"]
+    delay = (utt.speech_end_at - (t0 + b)) * 1000.0
+    print(f"[realtime] speech end -> utterance {delay:.0f}ms (end_silence={end_silence_ms}ms)")
+    if delay > end_silence_ms + slack_ms:
+        return [f"realtime: 断句延迟 {delay:.0f}ms > end_silence {end_silence_ms}ms + {slack_ms:.0f}ms"]
+    return []
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--end_silence_ms", type=int, default=500)
+    ap.add_argument("--slack_ms", type=float, default=120.0, help="实时断句延迟允许超出 end_silence 的余量")
+    ap.add_argument("--no_realtime", action="store_true", help="跳过按实时速度推送的检查（约 2 秒）")
+    args = ap.parse_args()
+
+    probe = StreamCapture(ArraySource(np.zeros(1, dtype=np.float32)), sample_rate=SR)
+    pre_roll_s, tail_s = probe.pre_roll / SR, probe.tail / SR
+
+    audio = synth_audio(SPEECH, TOTAL_S)
+    fails = []
+    array_utts = capture(ArraySource(audio, sample_rate=SR, speed=0), args.end_silence_ms)
+    fails += check_segments("array", array_utts, pre_roll_s, tail_s)
+
+    fd, path = tempfile.mkstemp(prefix="monibox_capture_", suffix=".wav")
+    os.close(fd)
+    try:
+        write_wav(path, audio)
+        wav_utts = capture(WavSource(path, sample_rate=SR, speed=0), args.end_silence_ms)
+    finally:
+        os.unlink(path)
+    fails += check_segments("wav", wav_utts, pre_roll_s, tail_s)
+    if [(u.start, u.end, u.truncated) for u in wav_utts] != [(u.start, u.end, u.truncated) for u in array_utts]:
+        fails.append("wav: WavSource 与 ArraySource 切分不一致")
+
+    if not args.no_realtime:
+        fails += check_realtime(args.end_silence_ms, args.slack_ms)
+
+    if fails:
+        for f in fails:
+            print("[FAIL]", f)
+        sys.exit(1)
+    print("[OK] StreamCapture: endpointing / truncation / wav source")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+bench_daemon_load.py
+用途：对常驻守护进程（python -m monibox_kb.runtime.daemon）做并发压测。
+
+- N 个客户端线程，每个依次发 M 轮 /handle（不带 interrupt，彼此不打断），可选混入 /event
+- 每轮记录：端到端（发请求 -> done）、排队（daemon 报告的 queue_ms）、处理（turn_ms）、首个输出（第一条 protocol / sentence）
+- 话语请求在守护进程里串行处理：并发时排队时间随客户端数增长，处理时间应保持不变（不含模型加载）
+
+运行（先另开终端启动守护进程，建议 --no_tts）：
+  python -m scripts.bench_daemon_load
+  python -m scripts.bench_daemon_load --clients 8 --turns 5 --event_every 3
+  python -m scripts.bench_daemon_load --texts my_queries.txt     # 每行一句
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from monibox_kb.runtime.daemon_client import DaemonClient
+
+
+DEFAULT_TEXTS = [
+    "我好害怕，喘不过气",
+    "腿被压住了，很疼",
+    "周围好黑，我不知道怎么办",
+    "又震了",
+    "好多灰，呛得难受",
+    "我口渴，能喝自己的尿吗",
+]
+
+
+def pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100.0 * (len(xs) - 1))))]
+
+
+def summarize(name: str, xs: List[float]):
+    if not xs:
+        print(f"{name:<12} n=0")
+        return
+    print(f"{name:<12} n={len(xs)} p50={statistics.median(xs):.0f}ms p95={pct(xs, 95):.0f}ms "
+          f"min={min(xs):.0f}ms max={max(xs):.0f}ms")
+
+
+def run_client(client: DaemonClient, idx: int, turns: int, texts: List[str], event_every: int,
+               out: Dict[str, List[float]], errors: List[str], lock: threading.Lock):
+    for k in range(turns):
+        is_event = event_every > 0 and (k + 1) % event_every == 0
+        t0 = time.perf_counter()
+        first = None
+        done = None
+        try:
+            stream = client.event(["imu_strong_shake"]) if is_event else \
+                client.handle(texts[(idx + k) % len(texts)])
+            for msg in stream:
+                kind = msg.get("type")
+                if kind in ("protocol", "sentence") and first is None:
+                    first = (time.perf_counter() - t0) * 1000.0
+                elif kind == "done":
+                    done = msg
+                elif kind == "error":
+                    errors.append(str(msg.get("error")))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            continue
+        total = (time.perf_counter() - t0) * 1000.0
+        if done is None:
+            errors.append("no done message")
+            continue
+        prefix = "event" if is_event else "turn"
+        with lock:
+            out[f"{prefix}_total"].append(total)
+            out[f"{prefix}_proc"].append(float(done.get("turn_ms", 0.0)))
+            if not is_event:
+                out["turn_queue"].append(float(done.get("queue_ms", 0.0)))
+            if first is not None:
+                out[f"{prefix}_first"].append(first)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--turns", type=int, default=3, help="每个客户端的请求数")
+    ap.add_argument("--event_every", type=int, default=0, help="每隔几轮发一次事件请求（0 不发）")
+    ap.add_argument("--texts", default="", help="话语文件（每行一句）；默认内置用例")
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--port", type=int, default=None)
+    args = ap.parse_args()
+
+    texts = DEFAULT_TEXTS
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [ln.strip() for ln in f if ln.strip()]
+
+    client = DaemonClient(args.host, args.port, timeout=600.0)
+    health = client.health()
+    print(f"daemon startup: {health.get('startup')}  turns so far: {health.get('turns')}")
+
+    keys = ["turn_total", "turn_queue", "turn_proc", "turn_first", "event_total", "event_proc", "event_first"]
+    out: Dict[str, List[float]] = {k: [] for k in keys}
+    errors: List[str] = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_client,
+                                args=(client, i, args.turns, texts, args.event_every, out, errors, lock))
+               for i in range(args.clients)]
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - t0
+
+    n = len(out["turn_total"]) + len(out["event_total"])
+    print(f"\nclients={args.clients} requests={n} wall={wall:.1f}s throughput={n / max(wall, 1e-9):.2f} req/s")
+    for k in keys:
+        summarize(k, out[k])
+    if errors:
+        print(f"\nerrors={len(errors)}: {errors[:5]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+bench_deadline_ladder.py
+用途：用假的慢 LLM（ScriptedLLM）验证降级阶梯：不同的首 token / 每 token 延迟下，哪一档触发、何时出声、是否在预算内。
+
+- 会话照常加载 rag.db / embedding（检索是真的），LLM 换成 ScriptedLLM，不需要 GGUF
+- 默认 TTS_BACKEND=null（无声）、LLM_CACHE=0
+- 每个场景跑一遍同样的话语，输出：回复、降级档位、第一条输出时刻、整轮耗时、是否超预算
+- 最后检查缓存回放：一条超过 40 字的回复先生成一次写入缓存，再按 5 字/秒回放；
+  回放不受降级阶梯约束，必须不降级、播出 ask（不满足退出码为 1）
+
+运行：
+  python -m scripts.bench_deadline_ladder
+  python -m scripts.bench_deadline_ladder --budget 3000 --text "腿被压住了，很疼"
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("LLM_CACHE", "0")
+os.environ.setdefault("TTS_BACKEND", "null")
+
+from monibox_kb.config import settings
+from monibox_kb.llm.gen_cache import GenerationCache
+from monibox_kb.llm.scripted_llm import ScriptedLLM
+from monibox_kb.runtime.session import MoniSession, SessionConfig
+
+
+# (场景名, 首 token ms, 每 token ms)
+SCENARIOS = [
+    ("fast", 150, 25),
+    ("slow-prefill", 6000, 25),
+    ("slow-decode", 200, 250),
+    ("stalled", 60000, 25),
+]
+
+# 缓存回放用的回复：text 超过 40 字（按 5 字/秒回放要 8 秒以上，长于 total 档），text + ask 不超过 60 字
+CACHE_REPLY = {
+    "text": "先慢慢呼吸，节省体力。护住头部和颈部，尽量不要乱动。我会一直在这里陪着你，救援很快就到。",
+    "used_ids": [],
+    "ask": "你现在能动吗？",
+}
+CACHE_CPS = 5.0
+
+
+def check_cache_replay(sess: MoniSession, llm: ScriptedLLM, text: str, budget_ms: float) -> list:
+    """生成一次写入缓存，再命中回放：回放不能触发降级，ask 必须播出。"""
+    fd, path = tempfile.mkstemp(prefix="monibox_llm_cache_", suffix=".db")
+    os.close(fd)
+    saved = sess.cache, sess.cache_cps, llm.reply
+    sess.cache = GenerationCache(path, model="bench", pack_version=sess.rag.pack_version)
+    sess.cache_cps = CACHE_CPS
+    llm.reply, llm.first_token_ms, llm.token_ms = CACHE_REPLY, 150, 25
+    fails = []
+    try:
+        sess.handle(text, budget_ms=0)
+        if not len(sess.cache):
+            return ["cache: 第一次生成没有写入缓存"]
+        outputs = []
+        t0 = time.perf_counter()
+        with sess.listen(outputs.append):
+            reply = sess.handle(text, budget_ms=budget_ms)
+        total = (time.perf_counter() - t0) * 1000.0
+        steps = [m["step"] for m in outputs if m["type"] == "fallback"]
+        print(f"\n[cache-replay] cps={CACHE_CPS:.0f} total={total:.0f}ms fallback={steps or '-'}")
+        print(f"  reply={reply}")
+        if steps:
+            fails.append(f"cache: 缓存回放触发了降级 {steps}")
+        if not reply.endswith(CACHE_REPLY["ask"]):
+            fails.append("cache: 缓存回放没有播出 ask")
+    finally:
+        sess.cache.close()
+        sess.cache, sess.cache_cps, llm.reply = saved
+        os.unlink(path)
+    return fails
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=float, default=float(os.getenv("TURN_BUDGET_MS", "4000")), help="每轮预算（ms）")
+    ap.add_argument("--text", default="我好害怕，喘不过气")
+    args = ap.parse_args()
+
+    llm = ScriptedLLM()
+    sess = MoniSession(settings.rag_db_path, SessionConfig(llm_path="", tts_enabled=True), llm=llm)
+    print(f"budget={args.budget:.0f}ms steps={sess.ladder.steps(args.budget)}")
+
+    try:
+        for name, first_ms, token_ms in SCENARIOS:
+            llm.first_token_ms, llm.token_ms = first_ms, token_ms
+            outputs = []
+            t0 = time.perf_counter()
+            with sess.listen(lambda m: outputs.append(((time.perf_counter() - t0) * 1000.0, m))):
+                reply = sess.handle(args.text, budget_ms=args.budget)
+            total = (time.perf_counter() - t0) * 1000.0
+            first = next((t for t, m in outputs if m["type"] in ("sentence", "protocol")), None)
+            step = next((m["step"] for _, m in outputs if m["type"] == "fallback"), "-")
+            over = first is None or first > args.budget
+            print(f"\n[{name}] first_token={first_ms}ms token={token_ms}ms -> fallback={step}")
+            print(f"  first_output={'-' if first is None else f'{first:.0f}ms'} total={total:.0f}ms"
+                  + ("  (OVER BUDGET)" if over else ""))
+            print(f"  reply={reply}")
+        fails = check_cache_replay(sess, llm, args.text, args.budget)
+    finally:
+        sess.close()
+
+    print("\nmetrics:", sess.metrics.snapshot())
+    if fails:
+        for f in fails:
+            print("[FAIL]", f)
+        sys.exit(1)
+    print("[OK] cache replay: no fallback, ask spoken")
+
+
+if __name__ == "__main__":
+    main()
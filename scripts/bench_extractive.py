@@ -0,0 +1,61 @@
+"""
+bench_extractive.py
+用途：抽取式模式（不加载 LLM）的端到端延迟下限：路由 -> 协议 -> embedding -> KNN -> 组合回复 -> 护栏。
+
+- 会话以 extractive=True 创建，不需要 GGUF；默认不播报（--tts 打开），只量编排与检索
+- 输出每句话的回复（含来自 QA 组的澄清问句）与耗时分布；与 LLM 模式的首句延迟对比即可看出 LLM 的代价
+
+运行：
+  python -m scripts.bench_extractive
+  python -m scripts.bench_extractive --rounds 5 --texts my_queries.txt
+"""
+
+import argparse
+import statistics
+import time
+
+from monibox_kb.config import settings
+from monibox_kb.runtime.session import MoniSession, SessionConfig
+from scripts.bench_daemon_load import DEFAULT_TEXTS
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--texts", default="", help="话语文件（每行一句）；默认内置用例")
+    ap.add_argument("--tts", action="store_true", help="同时播报（计入播报时间）")
+    args = ap.parse_args()
+
+    texts = DEFAULT_TEXTS
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [ln.strip() for ln in f if ln.strip()]
+
+    t = time.perf_counter()
+    sess = MoniSession(settings.rag_db_path, SessionConfig(llm_path="", tts_enabled=args.tts, extractive=True))
+    print(f"session ready in {(time.perf_counter() - t) * 1000:.0f}ms (no LLM)")
+
+    replies = {}
+    lat = []
+    try:
+        for r in range(args.rounds):
+            for text in texts:
+                t0 = time.perf_counter()
+                replies[text] = sess.handle(text)
+                ms = (time.perf_counter() - t0) * 1000.0
+                if r > 0:       # 第一轮含 embedding 预热
+                    lat.append(ms)
+    finally:
+        sess.close()
+
+    print("\n--- replies ---")
+    for text, reply in replies.items():
+        print(f"{text}\n  -> {reply} ({len(reply)} 字)")
+    if lat:
+        lat.sort()
+        print(f"\nturn latency n={len(lat)} p50={statistics.median(lat):.1f}ms "
+              f"p95={lat[int(0.95 * (len(lat) - 1))]:.1f}ms max={lat[-1]:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+bench_handle_async.py
+用途：同一批话语分别走 MoniSession.handle 与 handle_async，对比输出是否一致、端到端耗时与首句延迟。
+
+- 贪心解码（LLM_TEMPERATURE=0）、关闭生成缓存（LLM_CACHE=0）：两条路径的回复应逐字一致
+- 默认 TTS_BACKEND=null（无声，按字数模拟合成 / 播放耗时），只比较编排本身
+- 指标：total（调用 -> 返回，含等播报结束）、first（第一条协议 / 句子输出）
+
+运行：
+  python -m scripts.bench_handle_async
+  python -m scripts.bench_handle_async --rounds 3 --texts my_queries.txt
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_TEMPERATURE", "0")
+os.environ.setdefault("LLM_CACHE", "0")
+os.environ.setdefault("TTS_BACKEND", "null")
+os.environ.setdefault("NULL_TTS_MS_PER_CHAR", "30")
+
+from monibox_kb.config import settings
+from monibox_kb.runtime.session import MoniSession, SessionConfig
+from scripts.bench_daemon_load import DEFAULT_TEXTS
+
+
+def start_timer():
+    """返回 (t0, first, on_output)：on_output 作为会话监听者，记录第一条输出的时刻。"""
+    first = []
+    t0 = time.perf_counter()
+
+    def on_output(msg):
+        if not first:
+            first.append((time.perf_counter() - t0) * 1000.0)
+    return t0, first, on_output
+
+
+def run_sync(sess: MoniSession, text: str):
+    t0, first, on_output = start_timer()
+    with sess.listen(on_output):
+        reply = sess.handle(text)
+    return reply, (time.perf_counter() - t0) * 1000.0, (first or [None])[0]
+
+
+async def run_async(sess: MoniSession, text: str):
+    t0, first, on_output = start_timer()
+    with sess.listen(on_output):
+        reply = await sess.handle_async(text)
+    return reply, (time.perf_counter() - t0) * 1000.0, (first or [None])[0]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=2)
+    ap.add_argument("--texts", default="", help="话语文件（每行一句）；默认内置用例")
+    args = ap.parse_args()
+
+    texts = DEFAULT_TEXTS
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [ln.strip() for ln in f if ln.strip()]
+
+    llm_path = os.getenv("LLM_GGUF_PATH", "")
+    if not llm_path:
+        raise RuntimeError("请在 .env 中设置 LLM_GGUF_PATH")
+    sess = MoniSession(settings.rag_db_path, SessionConfig(
+        llm_path=llm_path,
+        llm_ctx=int(os.getenv("LLM_CTX", "2048")),
+        llm_threads=int(os.getenv("LLM_THREADS", "6")),
+        llm_gpu_layers=int(os.getenv("LLM_GPU_LAYERS", "0")),
+    ))
+
+    rows = {"sync": [], "async": []}
+    same = 0
+    n = 0
+    try:
+        for _ in range(args.rounds):
+            for text in texts:
+                r1, total1, first1 = run_sync(sess, text)
+                r2, total2, first2 = asyncio.run(run_async(sess, text))
+                rows["sync"].append((total1, first1))
+                rows["async"].append((total2, first2))
+                n += 1
+                same += int(r1 == r2)
+                if r1 != r2:
+                    print(f"[DIFF] {text}\n  sync : {r1}\n  async: {r2}")
+    finally:
+        sess.close()
+
+    print(f"\noutputs identical: {same}/{n}")
+    for name, xs in rows.items():
+        totals = [t for t, _ in xs]
+        firsts = [f for _, f in xs if f is not None]
+        print(f"{name:<6} total p50={statistics.median(totals):.0f}ms"
+              + (f"  first p50={statistics.median(firsts):.0f}ms" if firsts else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+bench_import_time.py
+用途：启动（import）耗时预算检查：每个入口在独立子进程里跑 python -X importtime -c "import <入口>"，
+取模块的累计导入耗时（不含解释器自身启动），和预算比较，并列出最重的直接依赖。
+
+- 每个入口还有一份“禁止导入”清单：重量级三方库（llama_cpp / sentence_transformers / torch / pyttsx3 /
+  faster_whisper / sqlite_vec ...）必须在第一次使用时才导入，出现在 import 阶段即判失败。
+  这一条与机器快慢无关，比耗时预算更稳定
+- 耗时取 --repeat 次的中位数（第一次可能包含写 .pyc，先跑一次不计）
+- 预算按开发 PC 定；慢板子（Radxa）用 --scale 放宽，例如 --scale 4
+- 有入口超预算或出现禁止导入时退出码为 1（可直接挂到 CI / 打包前检查）
+
+运行：
+  python -m scripts.bench_import_time
+  python -m scripts.bench_import_time --repeat 7 --top 8 --only monibox_kb.runtime.session
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from monibox_kb.paths import PROJECT_ROOT
+
+
+# 在第一次使用时才允许导入的三方库（按顶层包名匹配）
+HEAVY = ("llama_cpp", "sentence_transformers", "torch", "transformers", "numpy", "sqlite_vec",
+         "pyttsx3", "faster_whisper", "ctranslate2", "json5", "dotenv", "openai")
+
+# (入口模块, 预算 ms)
+ENTRY_POINTS = [
+    ("monibox_kb.config", 60),
+    ("scripts.rate_chunk", 80),
+    ("scripts.tag_coverage_report", 80),
+    ("monibox_kb.routing.router", 100),
+    ("monibox_kb.runtime.daemon_client", 100),
+    ("monibox_kb.runtime.session", 250),
+    ("monibox_kb.runtime.daemon", 250),
+]
+
+
+# 一行：import time: <self us> | <cumulative us> | <缩进><模块名>
+Row = Tuple[int, int, int, str]     # (self_us, cum_us, depth, name)
+
+
+def parse_importtime(stderr: str) -> List[Row]:
+    rows: List[Row] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue                                # 表头
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((int(parts[0]), int(parts[1]), depth, name.strip()))
+    return rows
+
+
+def run_once(module: str) -> List[Row]:
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       cwd=str(PROJECT_ROOT), capture_output=True, text=True)
+    if p.returncode != 0:
+        err = p.stderr.strip().splitlines()
+        raise RuntimeError(f"import {module} 失败：{err[-1] if err else p.returncode}")
+    return parse_importtime(p.stderr)
+
+
+def entry_stats(rows: List[Row], module: str) -> Tuple[int, List[Row]]:
+    """返回 (入口累计 us, 入口的直接依赖)。importtime 先打印子模块、后打印父模块。"""
+    end = max(i for i, r in enumerate(rows) if r[2] == 0 and r[3] == module)
+    start = end
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    children = [r for r in rows[start:end] if r[2] == 1]
+    return rows[end][1], children
+
+
+def check(module: str, budget_ms: float, repeat: int, top: int) -> Dict:
+    run_once(module)            # 预热：.pyc 落盘、文件系统缓存
+    totals: List[float] = []
+    rows: List[Row] = []
+    for _ in range(repeat):
+        rows = run_once(module)
+        us, _children = entry_stats(rows, module)
+        totals.append(us / 1000.0)
+    ms = statistics.median(totals)
+    _, children = entry_stats(rows, module)
+    heavy = sorted({r[3].split(".")[0] for r in rows} & set(HEAVY))
+    return {
+        "module": module, "ms": ms, "budget_ms": budget_ms,
+        "heavy": heavy, "ok": ms <= budget_ms and not heavy,
+        "top": sorted(children, key=lambda r: -r[1])[:top],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=5, help="每个入口列出最重的 N 个直接依赖")
+    ap.add_argument("--scale", type=float, default=1.0, help="预算倍数（慢板子放宽）")
+    ap.add_argument("--only", default="", help="只测这个入口")
+    args = ap.parse_args()
+
+    entries = [(m, b) for m, b in ENTRY_POINTS if not args.only or m == args.only] or [(args.only, 0)]
+    failed = 0
+    for module, budget in entries:
+        budget = budget * args.scale if budget else float("inf")
+        try:
+            r = check(module, budget, args.repeat, args.top)
+        except RuntimeError as e:
+            failed += 1
+            print(f"\n[FAIL] {module}: {e}")
+            continue
+        failed += not r["ok"]
+        status = "OK" if r["ok"] else "FAIL"
+        print(f"\n[{status}] {module}: {r['ms']:.1f}ms (budget {r['budget_ms']:.0f}ms)")
+        for self_us, cum_us, _depth, name in r["top"]:
+            print(f"    {cum_us / 1000.0:7.1f}ms  {name}")
+        if r["heavy"]:
+            print(f"    heavy imports at startup: {', '.join(r['heavy'])}")
+
+    print(f"\n{len(entries) - failed}/{len(entries)} entry points within budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
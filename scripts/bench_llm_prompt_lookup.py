@@ -0,0 +1,142 @@
+"""
+bench_llm_prompt_lookup.py
+用途：对比 prompt-lookup 解码与普通解码的生成速度与输出一致性（回放录制的会话）。
+
+- 会话来源：LLM_RECORD_PATH 录下的 JSONL（运行 demo 时设置 LLM_RECORD_PATH=build/llm_sessions.jsonl）；
+  文件不存在时退回 bench_llm_ttft 里的内置用例
+- 两种模式依次加载模型（不同时占两份内存），同一批 prompt、同样的 grammar / stop / max_tokens，
+  temperature=0（贪心）：此时投机解码的输出应与普通解码逐字一致
+- 指标：首 token 延迟、解码速度（首 token 之后 tokens/s）、整段耗时、输出是否一致
+- 不挂 BudgetTerminator：两边生成到自然结束，便于逐字比对
+
+运行：
+  python -m scripts.bench_llm_prompt_lookup
+  python -m scripts.bench_llm_prompt_lookup --sessions build/llm_sessions.jsonl --lookup 4 --ngram 2 --limit 50
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from monibox_kb.paths import PROJECT_ROOT
+from monibox_kb.llm.llama_cpp_chat import LLMConfig, LlamaCppChat
+from monibox_kb.llm.recorder import load_records
+from monibox_kb.runtime.session import build_system_prompt, build_user_prompt
+from scripts.bench_llm_ttft import USER_CASES
+
+
+def builtin_cases():
+    system = build_system_prompt()
+    return [{"system": system, "user": build_user_prompt(q, items), "grammar": None,
+             "max_tokens": 220, "stop": None} for q, items in USER_CASES]
+
+
+def run_case(llm: LlamaCppChat, rec) -> dict:
+    t0 = time.perf_counter()
+    t_first = None
+    n = 0
+    out = ""
+    for tok in llm.stream_chat(
+        rec.get("system") or build_system_prompt(),
+        rec["user"],
+        max_tokens=int(rec.get("max_tokens") or 220),
+        temperature=0.0,
+        stop=rec.get("stop"),
+        use_prefix=False,
+        grammar=rec.get("grammar"),
+    ):
+        if t_first is None:
+            t_first = time.perf_counter()
+        n += 1
+        out += tok
+    t_end = time.perf_counter()
+    t_first = t_first or t_end
+    decode_s = t_end - t_first
+    return {
+        "output": out,
+        "tokens": n,
+        "ttft_ms": (t_first - t0) * 1000.0,
+        "total_ms": (t_end - t0) * 1000.0,
+        "tps": (n - 1) / decode_s if n > 1 and decode_s > 0 else 0.0,
+    }
+
+
+def run_mode(name: str, cfg: LLMConfig, cases) -> list:
+    llm = LlamaCppChat(cfg)
+    run_case(llm, cases[0])     # 预热（mmap 页面、线程池），不计入
+    rows = []
+    for rec in cases:
+        llm.llm.reset()         # 每轮从空 KV 开始，两种模式条件一致
+        rows.append(run_case(llm, rec))
+    del llm
+    gc.collect()
+    return rows
+
+
+def summarize(name: str, rows) -> float:
+    tps = statistics.median(r["tps"] for r in rows)
+    ttft = statistics.median(r["ttft_ms"] for r in rows)
+    total = statistics.median(r["total_ms"] for r in rows)
+    toks = sum(r["tokens"] for r in rows)
+    print(f"{name:<7} n={len(rows)} tokens={toks} decode p50={tps:.1f} tok/s "
+          f"ttft p50={ttft:.0f}ms total p50={total:.0f}ms")
+    return tps
+
+
+def main():
+    env_path = PROJECT_ROOT / ".env"
+    if env_path.exists():
+        load_dotenv(env_path, override=False)
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", default=os.getenv("LLM_RECORD_PATH", "build/llm_sessions.jsonl"),
+                    help="录制的会话 JSONL")
+    ap.add_argument("--limit", type=int, default=0, help="最多回放几轮（0=全部）")
+    ap.add_argument("--lookup", type=int, default=int(os.getenv("LLM_PROMPT_LOOKUP", "0") or 0) or 4,
+                    help="草稿 token 数（num_pred_tokens）")
+    ap.add_argument("--ngram", type=int, default=int(os.getenv("LLM_PROMPT_LOOKUP_NGRAM", "2")),
+                    help="最大匹配 n-gram（max_ngram_size）")
+    ap.add_argument("--threads", type=int, default=int(os.getenv("LLM_THREADS", "4")))
+    args = ap.parse_args()
+
+    llm_path = (os.getenv("LLM_GGUF_PATH") or "").strip()
+    if not llm_path:
+        raise RuntimeError("未读取到环境变量 LLM_GGUF_PATH")
+
+    cases = load_records(args.sessions)
+    source = args.sessions
+    if not cases:
+        cases = builtin_cases()
+        source = "builtin"
+    if args.limit > 0:
+        cases = cases[:args.limit]
+
+    base = dict(
+        gguf_path=llm_path,
+        n_ctx=int(os.getenv("LLM_CTX", "2048")),
+        n_threads=args.threads,
+        n_gpu_layers=int(os.getenv("LLM_GPU_LAYERS", "0")),
+    )
+    plain = run_mode("plain", LLMConfig(**base), cases)
+    lookup = run_mode("lookup", LLMConfig(**base, prompt_lookup=args.lookup, prompt_lookup_ngram=args.ngram), cases)
+
+    print(f"model={llm_path} threads={args.threads} sessions={source} n={len(cases)} "
+          f"lookup num_pred={args.lookup} ngram={args.ngram}")
+    p_plain = summarize("plain", plain)
+    p_look = summarize("lookup", lookup)
+    print(f"decode tok/s p50: {p_plain:.1f} -> {p_look:.1f} ({p_look / max(p_plain, 1e-6):.2f}x)")
+
+    diff = [i for i, (a, b) in enumerate(zip(plain, lookup)) if a["output"] != b["output"]]
+    print(f"identical outputs: {len(cases) - len(diff)}/{len(cases)}")
+    for i in diff[:5]:
+        print(f"--- case {i}")
+        print(f"  plain : {plain[i]['output'][:120]!r}")
+        print(f"  lookup: {lookup[i]['output'][:120]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+bench_llm_ttft.py
+用途：度量 system prompt 前缀 KV 复用对首 token 延迟（TTFT）的影响。
+
+- cold  ：每轮 reset KV，整段 prompt（system + 检索要点 + 用户）重新 prefill（原行为）
+- prefix：启动时 warmup_prefix(system)，每轮只 prefill 检索要点 + 用户话语
+
+两种模式用同一组 user prompt，每轮只生成到第一个 token 为止（max_tokens 小，拿到首 token 即停）。
+
+运行：
+  python -m scripts.bench_llm_ttft
+  python -m scripts.bench_llm_ttft --rounds 10 --threads 4
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from monibox_kb.paths import PROJECT_ROOT
+from monibox_kb.llm.llama_cpp_chat import LLMConfig, LlamaCppChat
+from monibox_kb.runtime.session import build_system_prompt, build_user_prompt
+
+
+USER_CASES = [
+    ("我好害怕，喘不过气", [
+        {"id": "k_demo_1", "text": "先用4拍吸气、6拍呼气，重复3轮，帮助稳定呼吸。"},
+        {"id": "k_demo_2", "text": "如果有粉尘，尽量用衣物遮住口鼻，减少说话。"},
+    ]),
+    ("腿被压住了，很疼", [
+        {"id": "k_demo_3", "text": "不要强行抽出被压的肢体，尽量保持不动，等待救援。"},
+        {"id": "k_demo_4", "text": "可以轻敲身边的管道或墙面，让救援人员知道你的位置。"},
+    ]),
+    ("周围好黑，我不知道怎么办", [
+        {"id": "k_demo_5", "text": "先确认自己能正常呼吸，再慢慢观察周围是否有空隙。"},
+    ]),
+]
+
+
+def ttft_ms(llm: LlamaCppChat, system: str, user: str, use_prefix: bool) -> float:
+    t0 = time.perf_counter()
+    stream = llm.stream_chat(system, user, max_tokens=8, temperature=0.0, use_prefix=use_prefix)
+    try:
+        for _ in stream:
+            return (time.perf_counter() - t0) * 1000.0
+    finally:
+        stream.close()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def summarize(name: str, xs):
+    xs = sorted(xs)
+    p50 = statistics.median(xs)
+    print(f"{name:<7} n={len(xs)} p50={p50:.0f}ms min={xs[0]:.0f}ms max={xs[-1]:.0f}ms")
+    return p50
+
+
+def main():
+    env_path = PROJECT_ROOT / ".env"
+    if env_path.exists():
+        load_dotenv(env_path, override=False)
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=5, help="每个 user prompt 跑几轮")
+    ap.add_argument("--threads", type=int, default=int(os.getenv("LLM_THREADS", "4")))
+    args = ap.parse_args()
+
+    llm_path = (os.getenv("LLM_GGUF_PATH") or "").strip()
+    if not llm_path:
+        raise RuntimeError("未读取到环境变量 LLM_GGUF_PATH")
+
+    llm = LlamaCppChat(LLMConfig(
+        gguf_path=llm_path,
+        n_ctx=int(os.getenv("LLM_CTX", "2048")),
+        n_threads=args.threads,
+        n_gpu_layers=int(os.getenv("LLM_GPU_LAYERS", "0")),
+    ))
+    system = build_system_prompt()
+    users = [build_user_prompt(q, items) for q, items in USER_CASES]
+
+    # 预热一次（mmap 页面、线程池），不计入
+    ttft_ms(llm, system, users[0], use_prefix=False)
+
+    cold = []
+    for _ in range(args.rounds):
+        for u in users:
+            llm.llm.reset()     # 清空 KV，避免 llama.cpp 自带的前缀匹配让 cold 变“热”
+            cold.append(ttft_ms(llm, system, u, use_prefix=False))
+
+    warm_ms = llm.warmup_prefix(system)
+    if warm_ms is None:
+        print(f"[SKIP] chat_format={llm.chat_format} 不支持前缀复用")
+        summarize("cold", cold)
+        return
+
+    prefix = []
+    suffix_tokens = []
+    for _ in range(args.rounds):
+        for u in users:
+            prefix.append(ttft_ms(llm, system, u, use_prefix=True))
+            suffix_tokens.append(llm.last_prefill_tokens)
+
+    print(f"model={llm_path} threads={args.threads} chat_format={llm.chat_format}")
+    print(f"system prefix: {llm.prefix_len} tokens, warmup {warm_ms:.0f}ms (once at startup)")
+    print(f"per-turn prefill with prefix: ~{statistics.mean(suffix_tokens):.0f} tokens")
+    p_cold = summarize("cold", cold)
+    p_pref = summarize("prefix", prefix)
+    print(f"TTFT p50: {p_cold:.0f}ms -> {p_pref:.0f}ms ({p_cold / max(p_pref, 1e-6):.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
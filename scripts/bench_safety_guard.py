@@ -0,0 +1,127 @@
+"""
+bench_safety_guard.py
+用途：度量 SafetyGuard 的吞吐（条/秒），并核对编译版 check 与逐条正则的参考实现 check_regex 判定一致。
+
+语料：rag.db 的 chunks.text（存在时）；否则用协议文本 + 规则相关片段随机拼接的合成语料。
+按 --sizes 循环复制/抽样到目标条数。
+
+运行：
+  python -m scripts.bench_safety_guard
+  python -m scripts.bench_safety_guard --sizes 10000,100000,1000000 --workers 4
+  python -m scripts.bench_safety_guard --ref_max 0      # 不跑参考实现（1M 条时很慢）
+
+判定不一致时退出码为 1。
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from monibox_kb.config import settings
+from monibox_kb.paths import KNOWLEDGE_SRC
+from monibox_kb.runtime.safety_guard import SafetyGuard
+
+
+# 合成语料片段：覆盖 block / 剂量单位 / 用药语境 / rewrite / 普通文本
+FRAGMENTS = [
+    "请保持冷静，尽量减少活动，节省体力。", "用手按压伤口止血。", "不要尝试缝合伤口。", "静脉出血时先按压。",
+    "不要自行注射或输液。", "你一定是受伤了吗？", "救援人员正在赶来，马上就能获救。", "如果身边有药物，请按常规剂量使用。",
+    "按说明书服用。", "按医嘱用药。", "每次两片。", "10mg", "5 ml 喷雾", "少量喝水，每次一口。",
+    "情况危急。请立即检查其口鼻是否有明显异物，并小心将其头部偏向一侧，保持气道尽可能通畅。",
+    "敲击管道发出求救信号。", "用衣物捂住口鼻。", "保持呼吸顺畅。", "html 页面", "amgen", "吸入粉尘后咳嗽。",
+]
+
+
+def load_corpus() -> List[str]:
+    db = Path(settings.rag_db_path)
+    if db.exists():
+        try:
+            conn = sqlite3.connect(str(db))
+            rows = conn.execute("SELECT text FROM chunks").fetchall()
+            conn.close()
+            texts = [r[0] or "" for r in rows]
+            if texts:
+                print(f"[corpus] rag.db chunks: {len(texts)}")
+                return texts
+        except sqlite3.Error as e:
+            print(f"[corpus] rag.db 读取失败，改用合成语料：{e}")
+
+    frags = list(FRAGMENTS)
+    prot_path = KNOWLEDGE_SRC / "protocols.json"
+    if prot_path.exists():
+        obj = json.loads(prot_path.read_text(encoding="utf-8"))
+        for p in obj.get("protocols", []):
+            for a in p.get("actions", []):
+                if a.get("text"):
+                    frags.append(a["text"])
+
+    rnd = random.Random(0)
+    texts = ["".join(rnd.choice(frags) for _ in range(rnd.randint(1, 6))) for _ in range(5000)]
+    print(f"[corpus] synthetic: {len(texts)} (fragments={len(frags)})")
+    return texts
+
+
+def sized(base: List[str], n: int) -> List[str]:
+    if n <= len(base):
+        return base[:n]
+    reps = n // len(base) + 1
+    return (base * reps)[:n]
+
+
+def timed(fn, texts):
+    t0 = time.perf_counter()
+    out = fn(texts)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="check_many 的进程数（少于 POOL_MIN_TEXTS 条时不开进程池）")
+    ap.add_argument("--ref_max", type=int, default=100000, help="只在条数 <= ref_max 时跑参考实现并核对")
+    args = ap.parse_args()
+
+    guard = SafetyGuard()
+    base = load_corpus()
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+
+    ok = True
+    print(f"{'n':>9} {'regex/s':>12} {'check/s':>12} {'many/s':>12}  workers={args.workers}")
+    for n in sizes:
+        texts = sized(base, n)
+
+        ref = None
+        ref_rate = "-"
+        if n <= args.ref_max:
+            ref, dt = timed(lambda xs: [guard.check_regex(t) for t in xs], texts)
+            ref_rate = f"{n / dt:,.0f}"
+
+        single, dt = timed(lambda xs: [guard.check(t) for t in xs], texts)
+        single_rate = f"{n / dt:,.0f}"
+
+        many, dt = timed(lambda xs: guard.check_many(xs, workers=args.workers), texts)
+        many_rate = f"{n / dt:,.0f}"
+
+        print(f"{n:>9} {ref_rate:>12} {single_rate:>12} {many_rate:>12}")
+
+        if many != single:
+            ok = False
+            print("[FAIL] check_many != check")
+        if ref is not None and ref != single:
+            bad = sum(1 for a, b in zip(ref, single) if a != b)
+            ok = False
+            print(f"[FAIL] check != check_regex on {bad} texts")
+
+    if not ok:
+        sys.exit(1)
+    print("[OK] verdicts identical")
+
+
+if __name__ == "__main__":
+    main()
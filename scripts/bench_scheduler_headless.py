@@ -0,0 +1,112 @@
+"""
+bench_scheduler_headless.py
+用途：不需要硬件，用 MockHardware 检查 ActionScheduler 的抢占 / 排队。
+
+检查项（任一不满足退出码为 1）：
+1) 排队 + 抢占：低优先级协议排队时来了更高优先级协议并抢占当前协议，
+   排队的低优先级协议不能先抢到执行权（不能被取消），要等高优先级协议播完再完整执行
+2) 线程池里的迟到调用：协议被抢占时，线程已取走、还没调到 hw.tts 的任务不能在 stop_tts 之后再播
+
+运行：
+  python -m scripts.bench_scheduler_headless
+  python -m scripts.bench_scheduler_headless --tts_ms 10
+"""
+
+import argparse
+import sys
+import threading
+from typing import Any, Dict, List
+
+from monibox_kb.runtime.action_scheduler import ActionScheduler
+from monibox_kb.runtime.hardware_iface import MockHardware
+
+
+def protocol(pid: str, priority: float, *actions: Dict[str, Any]) -> Dict[str, Any]:
+    return {"protocol_id": pid, "priority": priority, "actions": list(actions)}
+
+
+def tts(text: str) -> Dict[str, Any]:
+    return {"type": "tts", "text": text}
+
+
+def check_queue_preempt(tts_ms: float) -> List[str]:
+    hw = MockHardware(quiet=True, tts_ms_per_char=tts_ms)
+    sched = ActionScheduler(hw)
+    try:
+        cur = sched.submit(protocol("current", 5, tts("当前协议正在播报，等待被抢占。")))
+        cur.started.wait(timeout=2.0)
+        low = sched.submit(protocol("low", 1, tts("低优先级排队。")))
+        low.decided.wait(timeout=2.0)
+        high = sched.submit(protocol("high", 9, tts("高优先级抢占。")))
+        for r in (cur, high, low):
+            r.wait(timeout=10.0)
+    finally:
+        sched.close()
+
+    order = [x for _, k, x in list(hw.timeline) if k == "tts"]
+    print(f"[queue-preempt] tts order={order} low.queued={low.queued}")
+    fails = []
+    if not low.queued:
+        fails.append("queue-preempt: 低优先级协议没有排队")
+    if any(r.cancelled for r in low.reports):
+        fails.append("queue-preempt: 排队的低优先级协议在高优先级协议之前醒来并被取消")
+    if order[1:] != ["高优先级抢占。", "低优先级排队。"]:
+        fails.append("queue-preempt: 抢占之后应先播高优先级协议，再播排队的低优先级协议")
+    return fails
+
+
+class GatedScheduler(ActionScheduler):
+    """第一个 tts 任务在线程里记完启动时刻后停住，等测试在“线程已取走、还没调 hw.tts”的窗口里抢占再继续。"""
+
+    def __init__(self, hw, **kwargs):
+        super().__init__(hw, **kwargs)
+        self.entered = threading.Event()
+        self.go = threading.Event()
+
+    def _mark_start(self, run, report, now):
+        super()._mark_start(run, report, now)
+        if report.type == "tts" and not self.entered.is_set():
+            self.entered.set()
+            self.go.wait(timeout=5.0)
+
+
+def check_late_tts(tts_ms: float) -> List[str]:
+    hw = MockHardware(quiet=True, tts_ms_per_char=tts_ms)
+    sched = GatedScheduler(hw)
+    try:
+        old = sched.submit(protocol("old", 5, tts("被抢占的旧协议。")))
+        sched.entered.wait(timeout=2.0)
+        new = sched.submit(protocol("new", 9, tts("新协议。")))
+        old.wait(timeout=5.0)
+        sched.go.set()
+        new.wait(timeout=10.0)
+    finally:
+        sched.close()
+
+    order = [x for _, k, x in list(hw.timeline) if k == "tts"]
+    print(f"[late-tts] tts order={order}")
+    if "被抢占的旧协议。" in order:
+        return ["late-tts: 被抢占协议里线程已取走的 tts 在 stop_tts 之后仍然执行"]
+    if order != ["新协议。"]:
+        return ["late-tts: 新协议没有播出"]
+    return []
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tts_ms", type=float, default=20.0, help="MockHardware 每字播报耗时")
+    args = ap.parse_args()
+
+    fails = []
+    fails += check_queue_preempt(args.tts_ms)
+    fails += check_late_tts(args.tts_ms)
+
+    if fails:
+        for f in fails:
+            print("[FAIL]", f)
+        sys.exit(1)
+    print("[OK] action scheduler: queued preemption / late executor calls")
+
+
+if __name__ == "__main__":
+    main()
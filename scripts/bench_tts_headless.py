@@ -0,0 +1,158 @@
+"""
+bench_tts_headless.py
+用途：不需要声卡，用 NullTTS（按字数模拟合成 / 播放耗时、记录时间线）检查 TTSService 流水线。
+
+检查项（任一不满足退出码为 1）：
+1) 重叠：播第 N 句时已经在合成第 N+1 句；整段耗时明显短于“合成 + 播放”串行之和
+2) 打断：interrupt() 到当前句 play_stop 的延迟 <= --budget_ms，排队未播的句子全部丢弃，
+   之后入队的新句子完整播完（打断标记不会残留，也不会被吞）
+3) 协议优先：回复播放中插入的协议句，在剩余回复句之前播
+4) 出队与开播之间的打断：播放线程取出句子、还没开始播时 interrupt，这句不能完整播完
+
+运行：
+  python -m scripts.bench_tts_headless
+  python -m scripts.bench_tts_headless --synth_ms 10 --play_ms 40 --budget_ms 30
+"""
+
+import argparse
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+from monibox_kb.tts.null_tts import NullTTS
+from monibox_kb.tts.service import PRIO_PROTOCOL, TTSService
+
+
+REPLY = ["先慢慢呼吸，节省体力。", "护住头部和颈部。", "我在这里陪你，等待救援。"]
+PROTOCOL = "有余震，护住头部。"
+
+
+def plays(backend: NullTTS) -> List[Tuple[float, str, str]]:
+    return [x for x in list(backend.timeline) if x[1].startswith("play")]
+
+
+def check_overlap(synth_ms: float, play_ms: float) -> List[str]:
+    backend = NullTTS(synth_ms_per_char=synth_ms, play_ms_per_char=play_ms)
+    svc = TTSService(backend)
+    t0 = time.perf_counter()
+    for s in REPLY:
+        svc.put(s)
+    svc.join(timeout=30.0)
+    total = (time.perf_counter() - t0) * 1000.0
+    svc.close()
+
+    serial = sum(len(s) for s in REPLY) * (synth_ms + play_ms)
+    fails = []
+    for cur, nxt in zip(REPLY, REPLY[1:]):
+        play_end = next(t for t, k, x in backend.timeline if k == "play_end" and x == cur)
+        synth_start = next(t for t, k, x in backend.timeline if k == "synth_start" and x == nxt)
+        if synth_start >= play_end:
+            fails.append(f"overlap: {nxt!r} 在上一句播完后才开始合成")
+    print(f"[overlap] total={total:.0f}ms serial={serial:.0f}ms saved={serial - total:.0f}ms")
+    if total >= serial:
+        fails.append(f"overlap: 整段 {total:.0f}ms 不短于串行 {serial:.0f}ms")
+    return fails
+
+
+def check_interrupt(play_ms: float, budget_ms: float) -> List[str]:
+    backend = NullTTS(play_ms_per_char=play_ms)
+    svc = TTSService(backend)
+    items = [svc.enqueue(s) for s in REPLY]
+    # 等第一句开始播，播到一半时打断
+    while not backend.events("play_start"):
+        time.sleep(0.001)
+    time.sleep(len(REPLY[0]) * play_ms / 2000.0)
+    t_int = time.perf_counter()
+    dropped = svc.interrupt()
+    while not backend.events("play_stop") and time.perf_counter() - t_int < 2.0:
+        time.sleep(0.001)
+    stops = backend.events("play_stop")
+    latency = (stops[0][0] - t_int) * 1000.0 if stops else float("inf")
+
+    after = svc.enqueue("新的一句。")
+    after.wait(timeout=10.0)
+    svc.join(timeout=10.0)
+    svc.close()
+
+    fails = []
+    print(f"[interrupt] stop latency={latency:.1f}ms dropped={dropped}")
+    if latency > budget_ms:
+        fails.append(f"interrupt: 打断延迟 {latency:.1f}ms > {budget_ms}ms")
+    if not all(it.dropped for it in items[1:]):
+        fails.append("interrupt: 排队未播的句子没有被丢弃")
+    if ("play_end", "新的一句。") not in [(k, x) for _, k, x in plays(backend)]:
+        fails.append("interrupt: 打断之后入队的句子没有完整播完")
+    return fails
+
+
+def check_priority(play_ms: float) -> List[str]:
+    backend = NullTTS(play_ms_per_char=play_ms)
+    svc = TTSService(backend)
+    for s in REPLY:
+        svc.put(s)
+    while not backend.events("play_start"):
+        time.sleep(0.001)
+    svc.enqueue(PROTOCOL, priority=PRIO_PROTOCOL)
+    svc.join(timeout=30.0)
+    svc.close()
+
+    order = [x for _, k, x in plays(backend) if k == "play_start"]
+    print(f"[priority] order={order}")
+    # 第一句已在播（或已合成好等播）不被插队；协议句必须排在最后一句回复之前
+    if PROTOCOL not in order or order.index(PROTOCOL) > order.index(REPLY[-1]):
+        return ["priority: 协议句没有插到剩余回复句子之前"]
+    return []
+
+
+class GatedTTS(NullTTS):
+    """play() 先停在入口，等测试在“已出队、未开播”的窗口里打断后再继续。"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.entered = threading.Event()
+        self.go = threading.Event()
+
+    def play(self, audio):
+        self.entered.set()
+        self.go.wait(timeout=5.0)
+        super().play(audio)
+
+
+def check_race(play_ms: float) -> List[str]:
+    """出队之后、play 开始之前打断：play() 自己清打断标记的话，这句会完整播完。"""
+    backend = GatedTTS(play_ms_per_char=play_ms)
+    svc = TTSService(backend)
+    item = svc.enqueue("这一句应该被打断。")
+    backend.entered.wait(timeout=5.0)
+    svc.interrupt()
+    backend.go.set()
+    item.wait(timeout=5.0)
+    svc.close()
+    stopped = bool(backend.events("play_stop")) and not backend.events("play_end")
+    print(f"[race] interrupt between dequeue and play: {'stopped' if stopped else 'played in full'}")
+    return [] if stopped else ["race: 出队与开播之间的打断被吞，句子完整播完"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synth_ms", type=float, default=10.0, help="NullTTS 每字合成耗时")
+    ap.add_argument("--play_ms", type=float, default=30.0, help="NullTTS 每字播放耗时")
+    ap.add_argument("--budget_ms", type=float, default=30.0, help="interrupt -> 当前句停止的预算")
+    args = ap.parse_args()
+
+    fails = []
+    fails += check_overlap(args.synth_ms, args.play_ms)
+    fails += check_interrupt(args.play_ms, args.budget_ms)
+    fails += check_priority(args.play_ms)
+    fails += check_race(args.play_ms)
+
+    if fails:
+        for f in fails:
+            print("[FAIL]", f)
+        sys.exit(1)
+    print("[OK] TTS pipeline: overlap / interrupt / priority / race")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,36 @@ build_pack.py（可视化增强版 v2）
 1) 每次构建前自动删除旧 rag.db（避免上次失败留下半成品导致 UNIQUE 冲突）
 2) 构建前检查 chunks 中片段ID是否重复（若重复会输出报告并直接停止）
 3) 日志更清晰：你知道它做到了哪一步
+4) 额外输出 router_pack.bin：路由/标签体系编译产物，端侧 AutoRouter（连同其 TagRegistry）一次读取即可启动
+   （含标签质心向量，用于召回词未命中时的 embedding 兜底路由）
+5) 预计算安全护栏判定：每个 chunk / 协议 tts 文本跑一次 SafetyGuard，按内容指纹写入 guard_verdicts 表
+   （带规则版本；运行期与审计脚本只在规则版本变化时重查）
+6) 按 LLM_GGUF_PATH 的分词器给每个 chunk 的上下文行计 token 数（chunks.n_tokens），
+   分词器指纹写入 pack_meta；会话按 token 预算装填上下文，不再每轮盲取前 6 条
+7) pack_meta.pack_version：chunks + 协议 + 护栏规则的内容哈希；LLM 生成缓存按它失效
 
 说明：
 - 你现在处于调试阶段，rag.db 本来就是可删可重建的构建产物
 - 所以这里采用“强制重建策略”：每次都删掉旧库重新建
 """
 
+import hashlib
 import json
 import os
+import sqlite3
 from pathlib import Path
 from typing import Any, Dict, List
 from collections import Counter
 
 from monibox_kb.config import settings
 from monibox_kb.paths import KNOWLEDGE_SRC as SRC, GENERATED_DIR as GEN, BUILD_DIR, PROJECT_ROOT
+from monibox_kb.compile_pack import compile_router_pack, compute_tag_centroids, save_router_pack
 from monibox_kb.db_sqlitevec import RagDB
+from monibox_kb.dedup import sha256_fp
 from monibox_kb.embedding import embed_texts, get_model
+from monibox_kb.llm.tokens import count_chunk_tokens
+from monibox_kb.runtime.guard_verdicts import compute_rows, ensure_table, protocol_tts_texts, write_rows
+from monibox_kb.runtime.safety_guard import SafetyGuard
 
 
 REQUIRED_FIELDS = ["片段ID", "文本", "维度", "风险等级", "来源ID", "状态", "内容指纹"]
@@ -85,12 +99,24 @@ def validate_chunks(chunks: List[Dict[str, Any]], dup_report_path: Path) -> None
             raise ValueError(f"chunks[{i}] 适用人群必须是数组 list。片段ID={c.get('片段ID')}")
 
 
+def pack_version(chunks: List[Dict[str, Any]], protocols: List[Dict[str, Any]], rules_version: str) -> str:
+    """构建内容版本：内容不变则重建后版本不变（LLM 生成缓存不会无谓失效）。"""
+    h = hashlib.sha256()
+    for c in chunks:
+        h.update(json.dumps([c["片段ID"], c.get("显示ID"), c["内容指纹"], c["状态"], c.get("人工评分", 0)],
+                            ensure_ascii=False).encode("utf-8"))
+    h.update(json.dumps(protocols, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    h.update(rules_version.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
 def main():
     print("==== MoniBox-KB build_pack.py ====")
     print("[info] project root:", PROJECT_ROOT)
     print("[info] python cwd:", os.getcwd())
     print("[info] rag db path:", settings.rag_db_path)
     print("[info] runtime pack path:", settings.runtime_pack_path)
+    print("[info] router pack path:", settings.router_pack_path)
     print()
 
 
@@ -100,11 +126,11 @@ def main():
             f"缺少 {chunks_path}\n请先运行：python scripts/qa_to_chunks.py"
         )
 
-    print("[1/8] 读取 chunks 文件:", chunks_path)
+    print("[1/10] 读取 chunks 文件:", chunks_path)
     chunks = load_json(chunks_path)
     print(f"      chunks loaded: {len(chunks)} 条")
 
-    print("[2/8] 校验 chunks（含重复片段ID检查）...")
+    print("[2/10] 校验 chunks（含重复片段ID检查）...")
     dup_report_path = GEN / "12_chunks_duplicate_report.json"
     validate_chunks(chunks, dup_report_path)
     print("      ok")
@@ -115,26 +141,43 @@ def main():
     # 关键：调试阶段强制删旧库，避免半成品导致 UNIQUE 冲突
     db_path = Path(settings.rag_db_path)
     if db_path.exists():
-        print("[3/8] 检测到旧 rag.db，删除以重建：", db_path)
+        print("[3/10] 检测到旧 rag.db，删除以重建：", db_path)
         db_path.unlink()
 
-    print("[4/8] 加载 embedding 模型（本地）...")
+    print("[4/10] 加载 embedding 模型（本地）...")
     model = get_model()  # embedding.py 会打印本地路径
     print("      embedding model loaded:", type(model))
 
     texts = [c["文本"] for c in chunks]
-    print("[5/8] 生成向量 embedding ...")
+    print("[5/10] 生成向量 embedding ...")
     vectors = embed_texts(texts)
     vec_dim = len(vectors[0]) if vectors else 0
     print(f"      embedding done. vectors={len(vectors)} dim={vec_dim}")
 
-    print("[6/8] 创建/初始化数据库并写入 ...")
+    print("[6/10] 统计 chunk token 数并写入数据库 ...")
+    n_tokens, tokenizer = count_chunk_tokens(chunks, (os.getenv("LLM_GGUF_PATH") or "").strip())
+    print(f"      tokenizer={tokenizer} total={sum(n_tokens)} max={max(n_tokens, default=0)}")
     db = RagDB(settings.rag_db_path)
     db.create_tables()
-    db.insert_chunks(chunks, vectors)
+    db.insert_chunks(chunks, vectors, n_tokens=n_tokens)
+    db.set_meta({"tokenizer": tokenizer})
     print("      db insert done.")
 
-    print("[7/8] 生成 runtime_pack.json ...")
+    print("[7/10] 预计算安全护栏判定（chunks + 协议 tts 文本）...")
+    guard = SafetyGuard()
+    protocols = load_json(SRC / "protocols.json").get("protocols", [])
+    chunk_rows = compute_rows(guard, [(c["内容指纹"], c["文本"]) for c in chunks], source="chunk")
+    prot_rows = compute_rows(guard, [(sha256_fp(t), t) for t in protocol_tts_texts(protocols)], source="protocol")
+    with sqlite3.connect(settings.rag_db_path) as conn:
+        ensure_table(conn)
+        write_rows(conn, chunk_rows + prot_rows)
+    version = pack_version(chunks, protocols, guard.rules_version)
+    db.set_meta({"pack_version": version})
+    levels = Counter(r[3] for r in chunk_rows)
+    print(f"      rules_version={guard.rules_version} pack_version={version} chunks={len(chunk_rows)} "
+          f"(allow={levels['allow']} rewrite={levels['rewrite']} block={levels['block']}) protocol_texts={len(prot_rows)}")
+
+    print("[8/10] 生成 runtime_pack.json ...")
     meta = load_json(SRC / "00_meta.json")
     sources = load_json(SRC / "01_sources.json")
     runtime_pack = {
@@ -142,14 +185,27 @@ def main():
         "嵌入模型": meta.get("嵌入模型"),
         "枚举": meta.get("枚举"),
         "标签体系": meta.get("标签体系"),
-        "来源注册表": sources
+        "来源注册表": sources,
+        "护栏规则版本": guard.rules_version,
+        "分词器": tokenizer,
+        "构建版本": version,
     }
     out_pack = Path(settings.runtime_pack_path)
     out_pack.parent.mkdir(parents=True, exist_ok=True)
     out_pack.write_text(json.dumps(runtime_pack, ensure_ascii=False, indent=2), encoding="utf-8")
     print("      runtime_pack saved:", out_pack)
 
-    print("[8/8] 数据库统计信息  ...")
+    print("[9/10] 编译路由产物 router_pack.bin（端侧启动用）...")
+    router_pack = compile_router_pack()
+    # 标签质心：复用上面算好的 chunk 向量，只额外 embed 每个标签的“名称+召回词”描述
+    router_pack["centroids"] = compute_tag_centroids(router_pack["tags"], chunks, vectors, embed_texts)
+    out_router = Path(settings.router_pack_path)
+    save_router_pack(router_pack, out_router)
+    print(f"      tags={len(router_pack['tags'])} terms={len(router_pack['matcher'])} "
+          f"overrides={len(router_pack['overrides'])} centroids={len(router_pack['centroids']['tag_ids'])} size={human_bytes(out_router.stat().st_size)}")
+    print("      router_pack saved:", out_router)
+
+    print("[10/10] 数据库统计信息  ...")
     size = db_path.stat().st_size if db_path.exists() else 0
     print("      rag.db:", db_path)
     print("      size:", human_bytes(size))
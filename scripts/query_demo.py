@@ -92,14 +92,18 @@ def main():
     print("[info] policy:", policy)
     print()
 
+    # query 向量只算一次：路由（召回词未命中时的质心兜底）与检索共用
+    qvec = embed_texts([args.q])[0]
+
     if args.auto_route and (args.tags is None or args.dimension is None):
         router = AutoRouter()
-        rr = router.route(args.q, top_tags=args.auto_top_tags)
+        rr = router.route(args.q, top_tags=args.auto_top_tags, query_vec=qvec)
 
         print("[route] predicted dimension:", rr.dimension)
         print("[route] predicted tags:", rr.tags)
         print("[route] tag_dims:", rr.tag_dims)
         print("[route] cross_dimension:", rr.cross_dimension)
+        print("[route] source:", rr.source)
         print("[route] evidence:", rr.evidence)
         print()
 
@@ -113,7 +117,6 @@ def main():
             else:
                 args.dimension = rr.dimension
 
-    qvec = embed_texts([args.q])[0]
     qblob = vec_to_f32_blob(qvec)
 
     conn = open_db(db_path)
@@ -0,0 +1,113 @@
+"""
+render_audio_cache.py
+用途：把固定文本预先合成为 wav，写入音频缓存目录（默认 build/audio），运行期 CachedTTS 命中直接播放。
+
+渲染哪些文本（与运行期实际播报的文本逐字一致，才能命中）：
+1) 协议：EventFastPath.compose_tts 合并 + 过护栏 + 截断后的那一句
+2) 高分 chunk（rag.db，quality_score >= --min_score，可直接播报，未停用）：
+   - 整段（过护栏、<=60 字）：LLM 未能流式解析时整段播报的形式
+   - 逐句（SentenceSplitter 切句、逐句过护栏）：流式播报时按句送 TTS 的形式
+
+键 = 引擎名 + 音色参数（语速 / 音量 / voice）+ 文本；已存在的文件跳过（增量）。
+
+运行：
+  python -m scripts.render_audio_cache
+  python -m scripts.render_audio_cache --min_score 4 --top 300
+  python -m scripts.render_audio_cache --engine null       # 无头环境：写静音 wav，验证流程
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import List
+
+from monibox_kb.config import settings
+from monibox_kb.runtime.event_path import EventFastPath
+from monibox_kb.runtime.hardware_iface import MockHardware
+from monibox_kb.runtime.protocol_engine import ProtocolEngine
+from monibox_kb.runtime.safety_guard import SafetyGuard
+from monibox_kb.text_clean import SentenceSplitter, limit_chars, normalize_for_tts
+from monibox_kb.tts.audio_cache import AudioCache
+from monibox_kb.tts.service import make_backend
+
+
+def protocol_texts(guard: SafetyGuard) -> List[str]:
+    prot = ProtocolEngine()
+    fast = EventFastPath(prot, guard, MockHardware(quiet=True))
+    return [t for t in (fast.compose_tts(p) for p in prot.protocols) if t]
+
+
+def chunk_texts(guard: SafetyGuard, db_path: str, min_score: float, top: int, max_chars: int = 60) -> List[str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT text FROM chunks
+            WHERE status <> '停用' AND tts_ok = 1 AND quality_score >= ?
+            ORDER BY quality_score DESC
+            LIMIT ?
+            """,
+            (min_score, top),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    out: List[str] = []
+    for (text,) in rows:
+        gr = guard.check(limit_chars(normalize_for_tts(text), max_chars))
+        if gr.level == "block":
+            continue
+        out.append(limit_chars(normalize_for_tts(gr.safe_text), max_chars))
+
+        sp = SentenceSplitter(max_len=max_chars)
+        for s in sp.feed(text) + [sp.flush()]:
+            s = normalize_for_tts(s)
+            if not s:
+                continue
+            gr = guard.check(s)
+            if gr.level != "block":
+                out.append(normalize_for_tts(gr.safe_text))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--engine", default=os.getenv("TTS_BACKEND", "pyttsx3"), help="pyttsx3 / null")
+    ap.add_argument("--out", default=os.getenv("TTS_AUDIO_CACHE", "build/audio"))
+    ap.add_argument("--db", default=settings.rag_db_path)
+    ap.add_argument("--min_score", type=float, default=4.0, help="chunk 人工评分下限")
+    ap.add_argument("--top", type=int, default=200, help="最多渲染多少条 chunk")
+    ap.add_argument("--no_chunks", action="store_true", help="只渲染协议文本")
+    args = ap.parse_args()
+
+    backend = make_backend(args.engine)
+    voice = backend.voice_key()
+    cache = AudioCache(args.out)
+    guard = SafetyGuard()
+
+    texts = protocol_texts(guard)
+    n_prot = len(texts)
+    if not args.no_chunks and os.path.exists(args.db):
+        texts += chunk_texts(guard, args.db, args.min_score, args.top)
+    texts = list(dict.fromkeys(texts))
+
+    cache.dir.mkdir(parents=True, exist_ok=True)
+    rendered = skipped = 0
+    t0 = time.perf_counter()
+    for text in texts:
+        if cache.lookup(backend.name, voice, text) is not None:
+            skipped += 1
+            continue
+        path = cache.add(backend.name, voice, text)
+        backend.render_to_file(normalize_for_tts(text), path)
+        rendered += 1
+    cache.save()
+
+    print(f"engine={backend.name} voice={voice}")
+    print(f"texts={len(texts)} (protocol={n_prot}) rendered={rendered} skipped={skipped} "
+          f"in {(time.perf_counter() - t0):.1f}s -> {cache.dir}")
+
+
+if __name__ == "__main__":
+    main()
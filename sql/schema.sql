@@ -20,7 +20,9 @@ CREATE TABLE IF NOT EXISTS chunks (
   tts_style TEXT,
 
   tags_flat TEXT NOT NULL,           -- |tag1|tag2|
-  populations_flat TEXT NOT NULL     -- |成人|哮喘|
+  populations_flat TEXT NOT NULL,    -- |成人|哮喘|
+
+  n_tokens INTEGER NOT NULL DEFAULT 0  -- 上下文行的 token 数（pack_meta.tokenizer 对应的分词器；0=未知）
 );
 
 CREATE INDEX IF NOT EXISTS idx_chunks_dimension ON chunks(dimension);
@@ -31,6 +33,12 @@ CREATE INDEX IF NOT EXISTS idx_chunks_fp ON chunks(fingerprint);
 CREATE INDEX IF NOT EXISTS idx_chunks_display_id ON chunks(display_id);
 CREATE INDEX IF NOT EXISTS idx_chunks_group_id ON chunks(group_id);
 
+-- 构建元数据（tokenizer 等）
+CREATE TABLE IF NOT EXISTS pack_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+
 -- 向量表（sqlite-vec）
 CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks USING vec0(
   embedding float[512]